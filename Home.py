@@ -1,19 +1,6 @@
 import streamlit as st
 from streamlit_lottie import st_lottie
-import requests
-import json
-
-def load_lottie(source):
-    if source.startswith('http'):
-        # If the source is a URL
-        r = requests.get(source)
-        if r.status_code != 200:
-            return None
-        return r.json()
-    else:
-        # If the source is a local file path
-        with open(source, 'r') as f:
-            return json.load(f)
+from btl_ui.assets import load_lottie
 
 # Load a relevant Lottie animation
 lottie_house = load_lottie("1725915498155.json")
@@ -0,0 +1 @@
+"""Microbenchmarks for the btl_model calculations."""
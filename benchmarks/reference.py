@@ -0,0 +1,130 @@
+"""Scalar reference implementations, as originally written in the pages.
+
+The benchmark equivalence check and the tests compare the vectorised
+btl_model functions against these one value at a time.
+"""
+
+import numpy as np
+import numpy_financial as npf
+
+
+def get_mortgage_details(mort_req, interest_rate, length_of_mortgage):
+    interest_rate_monthly = (interest_rate / 100) / 12
+    length_of_mortgage_monthly = length_of_mortgage * 12
+    mortgage_principle_sum = npf.ppmt(interest_rate_monthly, 1, length_of_mortgage_monthly, mort_req)
+    mortgage_interest = npf.ipmt(interest_rate_monthly, 1, length_of_mortgage_monthly, mort_req)
+    total_monthly_repay = npf.pmt(interest_rate_monthly, length_of_mortgage_monthly, mort_req)
+    return abs(mortgage_principle_sum), abs(mortgage_interest), abs(total_monthly_repay)
+
+
+def stamp_duty(houseprice):
+    if houseprice <= 250000:
+        return 0
+    elif 250000 < houseprice <= 925000:
+        return (houseprice - 250000) * 0.05
+    elif 925000 < houseprice <= 1500000:
+        return (houseprice - 925000) * 0.1 + 33750
+    else:
+        return (houseprice - 1500000) * 0.12 + 91250
+
+
+def stamp_duty_additional(houseprice):
+    if houseprice <= 250000:
+        return houseprice * 0.03
+    elif 250000 < houseprice <= 925000:
+        return (houseprice - 250000) * 0.08 + 7500
+    elif 925000 < houseprice <= 1500000:
+        return (houseprice - 925000) * 0.13 + 61500
+    else:
+        return (houseprice - 1500000) * 0.15 + 136250
+
+
+def stamp_duty_additional_minimum(houseprice, minimum=40000):
+    # Additional property rates do not apply below £40,000; the pages originally
+    # charged them on any price
+    if houseprice < minimum:
+        return stamp_duty(houseprice)
+    return stamp_duty_additional(houseprice)
+
+
+def total_costs(rent_val, management_charge_percent, fixed_costs):
+    return fixed_costs + (rent_val * (management_charge_percent / 100))
+
+
+def net_inc_per(rent_val, mortgage, incometax, management_charge_percent, fixed_costs):
+    mort_principle, mort_interest, mort_repay = mortgage
+    ebit = rent_val - total_costs(rent_val, management_charge_percent, fixed_costs)
+    nopat = (ebit - (ebit * incometax)) + float(mort_interest * 0.2)
+    return nopat - mort_repay
+
+
+def net_inc_ltd(rent_val, mortgage, corptax, management_charge_percent, fixed_costs):
+    mort_principle, mort_interest, mort_repay = mortgage
+    ebit = rent_val - (total_costs(rent_val, management_charge_percent, fixed_costs) + mort_interest)
+    nopat = (ebit - (ebit * (corptax / 100)))
+    return nopat - mort_principle
+
+
+def culm_growth_func(houseprice, annual_capital_growth, years):
+    capital_growth_float = (annual_capital_growth / 100)
+    return (houseprice * (pow(1 + capital_growth_float, years))) - houseprice
+
+
+def break_even_polyfit(net_income, rent):
+    x = np.linspace(rent * 0.5, rent * 1.5, 100)
+    y = [net_income(i) for i in x]
+    model = np.polyfit(x, y, 1)
+    return -model[1] / model[0]
+
+
+def amortization_schedule(mort_req, interest_rate, length_of_mortgage):
+    # One ppmt/ipmt call per month, as the pages did for month one
+    rate = (interest_rate / 100) / 12
+    nper = int(length_of_mortgage * 12)
+    capital = [abs(npf.ppmt(rate, month, nper, mort_req)) for month in range(1, nper + 1)]
+    interest = [abs(npf.ipmt(rate, month, nper, mort_req)) for month in range(1, nper + 1)]
+    balance = mort_req - np.cumsum(capital)
+    return np.array(capital), np.array(interest), balance, np.cumsum(interest)
+
+
+def remortgage_path(principal, interest_rate, length_of_mortgage, rent, rate_path, fixed_period_months,
+                    fixed_margin, svr_margin, arrangement_fee, arrangement_fee_percent, switch_rule,
+                    icr_threshold=1.25, icr_stress_rate=5.5):
+    # One loan along one path of reference rates, a month at a time, with fees added to the loan
+    months = int(length_of_mortgage * 12)
+    balance, rate, on_fix = principal, interest_rate, True
+    payments, interest, fees, refinances, svr_months = [], 0.0, 0.0, 0, 0
+    for month in range(months):
+        if month and month % fixed_period_months == 0:
+            fixed_rate = rate_path[month] + fixed_margin
+            svr = rate_path[month] + svr_margin
+            fee = arrangement_fee + arrangement_fee_percent / 100 * balance
+            if switch_rule == 'refix':
+                on_fix = balance > 0
+            elif switch_rule == 'svr':
+                on_fix = False
+            elif switch_rule == 'cheapest':
+                on_fix = balance > 0 and fixed_rate + 100 * fee / (balance * fixed_period_months / 12) < svr
+            else:
+                on_fix = balance > 0 and 12 * rent >= icr_threshold * balance * max(fixed_rate, icr_stress_rate) / 100
+            if on_fix:
+                fees += fee
+                balance += fee
+                rate = fixed_rate
+                refinances += 1
+        if month >= fixed_period_months and not on_fix:
+            rate = rate_path[month] + svr_margin
+            svr_months += 1
+        monthly_rate = rate / 1200
+        remaining = months - month
+        if monthly_rate == 0:
+            payment = balance / remaining
+        else:
+            payment = balance * monthly_rate / (1 - (1 + monthly_rate) ** -remaining)
+        payments.append(payment)
+        interest += balance * monthly_rate
+        balance = balance * (1 + monthly_rate) - payment
+    return {
+        'worst_payment': max(payments), 'total_interest': interest, 'total_fees': fees,
+        'refinances': refinances, 'svr_months': svr_months, 'end_balance': balance,
+    }
@@ -0,0 +1,225 @@
+"""Run the btl_model microbenchmarks.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --compare baseline.json --threshold 0.25
+
+Each case is timed at several scenario counts and the results are written as
+JSON so runs from different commits can be compared. Before timing, every
+vectorised path is checked against the scalar reference implementations;
+the run exits non-zero if a check fails or, with ``--compare``, if any case
+is slower than the baseline by more than ``--threshold``.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from btl_model import (
+    LIMITED_COMPANY,
+    PERSONAL,
+    break_even_rent,
+    culm_growth_func,
+    first_month_terms,
+    net_inc,
+    stamp_duty,
+    stamp_duty_additional,
+)
+from benchmarks import reference
+
+DEFAULT_SIZES = (1, 1_000, 100_000, 1_000_000)
+
+# Relative tolerance for the equivalence check
+RTOL = 1e-9
+ATOL = 1e-6
+
+# Prices either side of the bands' edges, including the £40,000 below which
+# additional property rates do not apply
+BOUNDARY_PRICES = (0, 1, 39_999.99, 40_000, 40_000.01, 250_000, 250_000.01, 925_000, 1_500_000)
+
+
+def _inputs(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        'houseprice': rng.uniform(1_000, 3_000_000, n),
+        'mort_req': rng.uniform(10_000, 1_000_000, n),
+        'interest_rate': rng.uniform(0.5, 9, n),
+        'length_of_mortgage': rng.integers(5, 36, n).astype(float),
+        'rent': rng.uniform(300, 6000, n),
+        'management_charge_percent': rng.uniform(0, 15, n),
+        'fixed_costs': rng.uniform(0, 500, n),
+        'incometax': rng.choice([0, 0.2, 0.4, 0.45], n),
+        'corptax': rng.uniform(19, 25, n),
+        'annual_capital_growth': rng.uniform(-2, 8, n),
+        'years': rng.integers(1, 31, n).astype(float),
+    }
+
+
+def _mortgage(d):
+    return first_month_terms(d['mort_req'], d['interest_rate'], d['length_of_mortgage'])
+
+
+def _net_inc_per(d, mortgage):
+    return net_inc(d['rent'], mortgage, PERSONAL, d['incometax'], d['management_charge_percent'], d['fixed_costs'])
+
+
+def _net_inc_ltd(d, mortgage):
+    return net_inc(d['rent'], mortgage, LIMITED_COMPANY, d['corptax'] / 100, d['management_charge_percent'],
+                   d['fixed_costs'])
+
+
+def _break_even(d, mortgage):
+    return break_even_rent(mortgage, PERSONAL, d['incometax'], d['management_charge_percent'], d['fixed_costs'])
+
+
+# name -> (setup(inputs) -> args, func(*args))
+CASES = {
+    'get_mortgage_details': (lambda d: (d,), _mortgage),
+    'stamp_duty': (lambda d: (d['houseprice'],), stamp_duty),
+    'stamp_duty_additional': (lambda d: (d['houseprice'],), stamp_duty_additional),
+    'net_inc_per': (lambda d: (d, _mortgage(d)), _net_inc_per),
+    'net_inc_ltd': (lambda d: (d, _mortgage(d)), _net_inc_ltd),
+    'culm_growth_func': (
+        lambda d: (d['houseprice'], d['annual_capital_growth'], d['years']),
+        culm_growth_func,
+    ),
+    'break_even': (lambda d: (d, _mortgage(d)), _break_even),
+}
+
+
+def check_equivalence(n=500, seed=1):
+    """Compare each vectorised path with the scalar reference; return failures."""
+    d = _inputs(n, seed)
+    d['houseprice'][:len(BOUNDARY_PRICES)] = BOUNDARY_PRICES
+    mortgage = _mortgage(d)
+    rows = [{name: values[i] for name, values in d.items()} for i in range(n)]
+    ref_mortgage = [reference.get_mortgage_details(r['mort_req'], r['interest_rate'], r['length_of_mortgage'])
+                    for r in rows]
+
+    def ref_per(r, m):
+        return reference.net_inc_per(r['rent'], m, r['incometax'], r['management_charge_percent'], r['fixed_costs'])
+
+    checks = {
+        'get_mortgage_details': (np.column_stack(mortgage), np.array(ref_mortgage)),
+        'stamp_duty': (stamp_duty(d['houseprice']), [reference.stamp_duty(r['houseprice']) for r in rows]),
+        'stamp_duty_additional': (
+            stamp_duty_additional(d['houseprice']),
+            [reference.stamp_duty_additional_minimum(r['houseprice']) for r in rows],
+        ),
+        'net_inc_per': (_net_inc_per(d, mortgage), [ref_per(r, m) for r, m in zip(rows, ref_mortgage)]),
+        'net_inc_ltd': (
+            _net_inc_ltd(d, mortgage),
+            [reference.net_inc_ltd(r['rent'], m, r['corptax'], r['management_charge_percent'], r['fixed_costs'])
+             for r, m in zip(rows, ref_mortgage)],
+        ),
+        'culm_growth_func': (
+            culm_growth_func(d['houseprice'], d['annual_capital_growth'], d['years']),
+            [reference.culm_growth_func(r['houseprice'], r['annual_capital_growth'], r['years']) for r in rows],
+        ),
+        # polyfit is itself approximate, so compare to the cent
+        'break_even': (
+            _break_even(d, mortgage),
+            [reference.break_even_polyfit(lambda rent, r=r, m=m: ref_per(dict(r, rent=rent), m), r['rent'])
+             for r, m in zip(rows, ref_mortgage)],
+            1e-6, 0.01,
+        ),
+    }
+    failures = []
+    for name, (fast, slow, *tolerance) in checks.items():
+        rtol, atol = tolerance or (RTOL, ATOL)
+        if not np.allclose(fast, slow, rtol=rtol, atol=atol):
+            worst = float(np.max(np.abs(np.asarray(fast) - np.asarray(slow))))
+            failures.append(f"{name}: max abs difference {worst:.3g}")
+    return failures
+
+
+def time_case(name, n, repeat=5):
+    setup, func = CASES[name]
+    args = setup(_inputs(n))
+    func(*args)
+    # Fewer repeats for the largest sizes keep a full run to a few seconds
+    repeat = max(1, min(repeat, int(5e6 // max(n, 1))))
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {
+        'case': name,
+        'n': n,
+        'repeat': repeat,
+        'best_s': best,
+        'median_s': float(np.median(timings)),
+        'per_scenario_ns': best / n * 1e9,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Cases slower than the baseline by more than ``threshold`` (a fraction)."""
+    previous = {(r['case'], r['n']): r['best_s'] for r in baseline['results']}
+    regressions = []
+    for r in results:
+        before = previous.get((r['case'], r['n']))
+        if before and r['best_s'] > before * (1 + threshold):
+            regressions.append(f"{r['case']} n={r['n']}: {before * 1e3:.3f} ms -> {r['best_s'] * 1e3:.3f} ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--output', help="Write results to this JSON file")
+    parser.add_argument('--compare', help="Baseline JSON file from an earlier run")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Allowed slowdown against the baseline, as a fraction (default 0.25)")
+    args = parser.parse_args(argv)
+
+    failures = check_equivalence()
+    for failure in failures:
+        print(f"EQUIVALENCE FAILED {failure}", file=sys.stderr)
+
+    results = []
+    for name in args.cases:
+        for n in args.sizes:
+            result = time_case(name, n)
+            results.append(result)
+            print(f"{name:<24}{n:>10,}  {result['best_s'] * 1e3:10.3f} ms  {result['per_scenario_ns']:10.1f} ns/scenario")
+
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'equivalence_failures': failures,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+
+    return 1 if failures or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""Calculation core for the Buy to Let model.
+
+Pure Python and NumPy: importable without Streamlit so batch jobs, benchmarks
+and worker processes can use the same calculations as the pages.
+"""
+
+from btl_model.breakeven import break_even_rent, solve_break_even
+from btl_model.growth import culm_growth_func
+from btl_model.income import (
+    EBIT,
+    LIMITED_COMPANY,
+    NOPAT,
+    PERSONAL,
+    TAX_TREATMENTS,
+    convert_cost_to_annual,
+    net_inc,
+    tax_credit,
+    total_costs,
+)
+from btl_model.mortgage import (
+    AmortizationSchedule,
+    MortgageTerms,
+    amortization_schedule,
+    first_month_terms,
+    ltv,
+    monthly_payment,
+    mortgage_terms,
+    outstanding_balance,
+)
+from btl_model.stamp_duty import (
+    DEFAULT_TABLE,
+    STAMP_DUTY_TABLES,
+    StampDutyTable,
+    sdlt,
+    stamp_duty,
+    stamp_duty_additional,
+    table_for,
+)
+from btl_model.returns import cash_on_cash, investment_cash_flows, irr, npv, payback_period, sale_proceeds
+from btl_model.sensitivity import SCENARIO_INPUTS, TornadoBar, scenario_metrics, sensitivity_grid, tornado
+from btl_model.simulation import SimulationSummary, simulate_growth
+from btl_model.stress import SWITCH_RULES, StressResult, random_rate_paths, rate_shock_paths, stress_test
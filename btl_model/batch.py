@@ -0,0 +1,457 @@
+"""Stream scenarios through the models from the command line.
+
+    python -m btl_model.batch properties.csv --output results.jsonl
+    cat scenarios.jsonl | python -m btl_model.batch - --model tax_comparison --output results.parquet
+
+Input rows (JSON Lines or CSV, from a file or stdin) use the column names of
+``btl_model.portfolio`` (Buy to Let) or ``btl_model.comparison`` (Tax
+Comparison). They are read and evaluated in fixed-size chunks, optionally
+across a process pool, and each chunk's results are written as soon as they
+are ready, so memory use does not grow with the input. Every output row
+carries the input's line number (``row``) and ``id`` column, if it has one.
+
+Parquet, Arrow and NumPy inputs are evaluated out of core by
+``btl_model.columnar``, with progress reported as they go; results can also
+be written as Arrow or a directory of NumPy files.
+
+Malformed rows are skipped and written, with the reason, to a JSON Lines
+error file; the run then exits with status 1. Throughput is reported on
+stderr.
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from btl_model import comparison, portfolio
+from btl_model.income import TAX_TREATMENTS
+from btl_model.stamp_duty import DEFAULT_TABLE, STAMP_DUTY_TABLES
+
+Model = namedtuple('Model', ('evaluate', 'required', 'optional', 'outputs'))
+
+MODELS = {
+    'buy_to_let': Model(
+        portfolio.evaluate_columns, portfolio.REQUIRED_COLUMNS, portfolio.OPTIONAL_COLUMNS, portfolio.OUTPUT_COLUMNS,
+    ),
+    'tax_comparison': Model(
+        comparison.evaluate_comparison_columns, comparison.REQUIRED_COLUMNS, comparison.OPTIONAL_COLUMNS,
+        comparison.OUTPUT_COLUMNS,
+    ),
+}
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+_TRUE = {'1', 'true', 'yes', 'y'}
+_FALSE = {'0', 'false', 'no', 'n', ''}
+
+
+class RowError(ValueError):
+    pass
+
+
+def _number(column, value):
+    if isinstance(value, bool):
+        raise RowError(f"{column}: expected a number, got {value!r}")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise RowError(f"{column}: expected a number, got {value!r}") from None
+    if not math.isfinite(number):
+        raise RowError(f"{column}: expected a finite number, got {value!r}")
+    return number
+
+
+def _flag(column, value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise RowError(f"{column}: expected true or false, got {value!r}")
+
+
+def _tax_treatment(column, value):
+    for treatment in TAX_TREATMENTS:
+        if str(value).strip().lower() == treatment.lower():
+            return treatment
+    raise RowError(f"{column}: expected one of {', '.join(TAX_TREATMENTS)}, got {value!r}")
+
+
+def parse_row(record, model):
+    """Validated model inputs from one input record (CSV values are strings)."""
+    if not isinstance(record, dict):
+        raise RowError(f"expected an object, got {type(record).__name__}")
+    row = {}
+    for column in model.required:
+        value = record.get(column)
+        if value is None or value == '':
+            raise RowError(f"{column}: missing")
+        row[column] = _number(column, value)
+    for column, default in model.optional.items():
+        value = record.get(column)
+        if value is None or value == '':
+            row[column] = default
+        elif isinstance(default, bool):
+            row[column] = _flag(column, value)
+        elif isinstance(default, str):
+            row[column] = _tax_treatment(column, value)
+        else:
+            row[column] = _number(column, value)
+    return row
+
+
+def read_records(file, input_format):
+    """Yield ``(line_number, record)``, with ``record`` None for unparseable lines."""
+    if input_format == 'csv':
+        reader = csv.DictReader(file)
+        for record in reader:
+            if None in record:
+                yield reader.line_num, None
+            else:
+                yield reader.line_num, record
+        return
+    for line_number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError:
+            yield line_number, None
+
+
+def _missing(values):
+    return (values.isna() | (values == '')).to_numpy()
+
+
+def _numbers(values):
+    # As _number: JSON true/false are not numbers, though pandas would read them as 1/0
+    numbers = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+    booleans = values.map(lambda value: isinstance(value, (bool, np.bool_))).to_numpy(dtype=bool)
+    return np.where(booleans, np.nan, numbers)
+
+
+def parse_chunk(batch, model, errors):
+    """Model input columns for the valid records of ``batch``, a list of ``(line_number, record)``.
+
+    Columns are converted and validated a whole chunk at a time; only the
+    rows that fail are passed through ``parse_row``, to report why to
+    ``errors(line_number, message, record)``.
+    """
+    records = [record if isinstance(record, dict) else {} for _, record in batch]
+    frame = pd.DataFrame.from_records(records, index=pd.RangeIndex(len(records)))
+    valid = np.array([isinstance(record, dict) for _, record in batch], dtype=bool)
+
+    def column_values(column):
+        if column in frame:
+            return frame[column].astype(object)
+        return pd.Series(None, index=frame.index, dtype=object)
+
+    columns = {}
+    for column in model.required:
+        numbers = _numbers(column_values(column))
+        valid &= np.isfinite(numbers)
+        columns[column] = numbers
+    for column, default in model.optional.items():
+        values = column_values(column)
+        missing = _missing(values)
+        if isinstance(default, (bool, str)):
+            text = values.astype(str).str.strip().str.lower()
+            if isinstance(default, bool):
+                true, false = text.isin(_TRUE).to_numpy(), text.isin(_FALSE).to_numpy()
+                valid &= missing | true | false
+                parsed = np.where(missing, default, true)
+            else:
+                parsed = text.map({treatment.lower(): treatment for treatment in TAX_TREATMENTS})
+                valid &= missing | parsed.notna().to_numpy()
+                parsed = np.where(missing, default, parsed.fillna(default).to_numpy(dtype=str))
+        else:
+            numbers = _numbers(values)
+            valid &= missing | np.isfinite(numbers)
+            parsed = np.where(missing, default, numbers)
+        columns[column] = parsed
+
+    for i in np.flatnonzero(~valid):
+        line_number, record = batch[i]
+        try:
+            if record is None:
+                raise RowError("malformed line")
+            parse_row(record, model)
+            raise RowError("invalid value")
+        except RowError as error:
+            errors(line_number, str(error), record)
+
+    line_numbers = [line_number for (line_number, _), ok in zip(batch, valid) if ok]
+    ids = column_values('id')[valid].tolist()
+    return line_numbers, ids, {column: values[valid] for column, values in columns.items()}
+
+
+def chunk_rows(records, model, chunk_size, errors):
+    """Parse ``(line_number, record)`` pairs ``chunk_size`` at a time (see parse_chunk)."""
+    batch = []
+    for item in records:
+        batch.append(item)
+        if len(batch) == chunk_size:
+            yield parse_chunk(batch, model, errors)
+            batch = []
+    if batch:
+        yield parse_chunk(batch, model, errors)
+
+
+def _evaluate(evaluate, chunk):
+    line_numbers, ids, columns = chunk
+    return line_numbers, ids, evaluate(columns)
+
+
+def evaluate_chunks(chunks, model, max_workers=1, stamp_duty_table=None):
+    """Yield ``(line_numbers, ids, outputs)`` per chunk, in input order.
+
+    With more than one worker, at most two chunks per worker are in flight,
+    so a slow writer or a huge input cannot pile results up in memory.
+    """
+    evaluate = partial(_evaluate, partial(model.evaluate, stamp_duty_table=stamp_duty_table))
+    if max_workers == 1:
+        for chunk in chunks:
+            yield evaluate(chunk)
+        return
+    max_workers = max_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(evaluate, chunk))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class JsonLinesWriter:
+
+    def __init__(self, file, columns):
+        self.file = file
+        self.columns = columns
+
+    def write(self, line_numbers, ids, outputs):
+        if not len(line_numbers):
+            return
+        frame = pd.DataFrame({'row': line_numbers, 'id': ids, **{column: outputs[column] for column in self.columns}})
+        # NaN and infinities (which JSON cannot hold) are written as null
+        self.file.write(frame.to_json(orient='records', lines=True, double_precision=15))
+
+    def close(self):
+        if self.file is sys.stdout:
+            self.file.flush()
+        else:
+            self.file.close()
+
+
+class _ArrowTableWriter:
+    """Base for outputs written through pyarrow, one table per chunk."""
+
+    format_name = None
+
+    def __init__(self, columns):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise SystemExit(f"{self.format_name} output needs pyarrow: pip install pyarrow") from None
+        self.pa = pa
+        self.columns = columns
+        self.schema = pa.schema(
+            [('row', pa.int64()), ('id', pa.string())] + [(column, pa.float64()) for column in columns]
+        )
+
+    def write(self, line_numbers, ids, outputs):
+        table = self.pa.Table.from_pydict(
+            {
+                'row': line_numbers,
+                'id': self.pa.nulls(len(line_numbers), self.pa.string()) if ids is None
+                else [None if row_id is None else str(row_id) for row_id in ids],
+                **{column: np.asarray(outputs[column], dtype=float) for column in self.columns},
+            },
+            schema=self.schema,
+        )
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+
+class ParquetWriter(_ArrowTableWriter):
+
+    format_name = 'Parquet'
+
+    def __init__(self, path, columns):
+        super().__init__(columns)
+        import pyarrow.parquet as pq
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+
+class ArrowWriter(_ArrowTableWriter):
+    """Arrow IPC file (Feather v2), one record batch per chunk."""
+
+    format_name = 'Arrow'
+
+    def __init__(self, path, columns):
+        super().__init__(columns)
+        self.sink = self.pa.OSFile(path, 'wb')
+        self.writer = self.pa.ipc.new_file(self.sink, self.schema)
+
+    def close(self):
+        super().close()
+        self.sink.close()
+
+
+class NpyWriter:
+    """A directory of ``<column>.npy`` files, appended to chunk by chunk.
+
+    Each file's header is rewritten with the final length on close (the NPY
+    header leaves room for this), so the output never has to be held in
+    memory and can be opened with ``np.load(..., mmap_mode='r')``. Ids are
+    not written; ``row.npy`` links each result back to its input row.
+    """
+
+    def __init__(self, directory, columns):
+        os.makedirs(directory, exist_ok=True)
+        self.dtypes = {'row': np.dtype(np.int64), **{column: np.dtype(float) for column in columns}}
+        self.files = {column: open(os.path.join(directory, f'{column}.npy'), 'wb') for column in self.dtypes}
+        self.rows = 0
+        self._headers()
+
+    def _headers(self):
+        for column, file in self.files.items():
+            file.seek(0)
+            np.lib.format.write_array_header_1_0(
+                file, {'descr': np.lib.format.dtype_to_descr(self.dtypes[column]), 'fortran_order': False, 'shape': (self.rows,)}
+            )
+
+    def write(self, line_numbers, ids, outputs):
+        for column, file in self.files.items():
+            values = line_numbers if column == 'row' else outputs[column]
+            file.seek(0, os.SEEK_END)
+            np.ascontiguousarray(values, dtype=self.dtypes[column]).tofile(file)
+        self.rows += len(line_numbers)
+
+    def close(self):
+        self._headers()
+        for file in self.files.values():
+            file.close()
+
+
+class ErrorFile:
+    """Row-level errors as JSON Lines, opened on the first error."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.count = 0
+
+    def __call__(self, line_number, message, record):
+        if self.file is None:
+            self.file = open(self.path, 'w')
+        self.count += 1
+        self.file.write(json.dumps({'row': line_number, 'error': message, 'record': record}, default=str) + '\n')
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def _format(path, explicit, choices, default):
+    if explicit:
+        return explicit
+    if path and (os.path.isdir(path) or path.endswith(os.sep)):
+        # A directory of <column>.npy files
+        return 'npy' if 'npy' in choices else default
+    extension = os.path.splitext(path or '')[1].lstrip('.').lower()
+    extension = {'ndjson': 'jsonl', 'json': 'jsonl', 'feather': 'arrow', 'ipc': 'arrow'}.get(extension, extension)
+    return extension if extension in choices else default
+
+
+def run(input_file, input_format, writer, model, chunk_size=DEFAULT_CHUNK_SIZE, max_workers=1,
+        stamp_duty_table=None, errors=None):
+    """Evaluate every record of ``input_file`` and write the results; returns the row count."""
+    records = read_records(input_file, input_format)
+    chunks = chunk_rows(records, model, chunk_size, errors or (lambda *args: None))
+    written = 0
+    for line_numbers, ids, outputs in evaluate_chunks(chunks, model, max_workers, stamp_duty_table):
+        writer.write(line_numbers, ids, outputs)
+        written += len(line_numbers)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', help="JSON Lines, CSV, Parquet, Arrow or NumPy file (or directory), or - for stdin")
+    parser.add_argument('--model', choices=list(MODELS), default='buy_to_let')
+    parser.add_argument('--output', '-o',
+                        help="JSON Lines, Parquet or Arrow file, or NumPy directory (default: JSON Lines on stdout)")
+    parser.add_argument('--input-format', choices=['jsonl', 'csv', 'parquet', 'arrow', 'npy'])
+    parser.add_argument('--output-format', choices=['jsonl', 'parquet', 'arrow', 'npy'])
+    parser.add_argument('--errors', help="Row-level error file (default: <output>.errors.jsonl)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes; 0 for one per CPU (default: evaluate in-process)")
+    parser.add_argument('--stamp-duty-table', choices=list(STAMP_DUTY_TABLES), default=DEFAULT_TABLE)
+    parser.add_argument('--no-progress', action='store_true', help="Don't report progress for columnar input")
+    args = parser.parse_args(argv)
+
+    model = MODELS[args.model]
+    stdin = args.input == '-'
+    input_format = _format(None if stdin else args.input, args.input_format, ('jsonl', 'csv', 'parquet', 'arrow', 'npy'), 'jsonl')
+    output_format = _format(args.output, args.output_format, ('jsonl', 'parquet', 'arrow', 'npy'), 'jsonl')
+    if output_format != 'jsonl' and not args.output:
+        parser.error(f"{output_format} output needs --output")
+    columnar = input_format in ('parquet', 'arrow', 'npy')
+    if columnar and stdin:
+        parser.error(f"{input_format} input must be a file")
+    errors = ErrorFile(args.errors or f"{args.output.rstrip(os.sep) if args.output else 'batch'}.errors.jsonl")
+
+    input_file = None
+    if not columnar:
+        input_file = sys.stdin if stdin else open(args.input, newline='' if input_format == 'csv' else None)
+    if output_format == 'parquet':
+        writer = ParquetWriter(args.output, model.outputs)
+    elif output_format == 'arrow':
+        writer = ArrowWriter(args.output, model.outputs)
+    elif output_format == 'npy':
+        writer = NpyWriter(args.output, model.outputs)
+    else:
+        writer = JsonLinesWriter(open(args.output, 'w') if args.output else sys.stdout, model.outputs)
+
+    start = time.perf_counter()
+    try:
+        if columnar:
+            from btl_model import columnar as columnar_files
+            written = columnar_files.run(args.input, input_format, writer, model, args.chunk_size, args.workers,
+                                         args.stamp_duty_table, errors, progress=not args.no_progress)
+        else:
+            written = run(input_file, input_format, writer, model, args.chunk_size, args.workers,
+                          args.stamp_duty_table, errors)
+    finally:
+        writer.close()
+        errors.close()
+        if input_file is not None and not stdin:
+            input_file.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"{written:,} rows in {elapsed:.2f}s ({written / max(elapsed, 1e-9):,.0f} rows/s)", file=sys.stderr)
+    if errors.count:
+        print(f"{errors.count:,} malformed rows skipped, see {errors.path}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Break-even (cost-neutral) rent solver.
+
+The root of net income in rent is taken in closed form from two evaluations
+when the model is linear in rent, which the current model is. Any scenario
+where that closed-form root does not check out (tax bands, relief caps or
+other non-linear terms) falls back to bracketed bisection. Everything is
+vectorised across scenarios.
+"""
+
+import numpy as np
+
+from btl_model.income import net_inc
+
+
+def solve_break_even(func, low=0.0, high=1000.0, tol=1e-6, max_iter=200, max_expansions=60):
+    """Rent at which ``func(rent)`` is zero, for every scenario at once.
+
+    ``func`` maps an array of rents (one per scenario, or a scalar) to net
+    income and must be increasing in rent. ``high`` is doubled per scenario
+    until the root is bracketed; scenarios without a root in reach return NaN.
+    """
+    f_low = np.asarray(func(low), dtype=float)
+    high = np.broadcast_to(np.asarray(high, dtype=float), f_low.shape).copy()
+    low = np.broadcast_to(np.asarray(low, dtype=float), f_low.shape).copy()
+    f_high = np.asarray(func(high), dtype=float)
+
+    # Closed-form root of the line through the two end points
+    with np.errstate(divide='ignore', invalid='ignore'):
+        root = low - f_low * (high - low) / (f_high - f_low)
+    scale = np.maximum(np.abs(f_low), 1.0)
+    solved = np.isfinite(root) & (np.abs(func(np.where(np.isfinite(root), root, low))) <= tol * scale)
+    if solved.all():
+        return root[()] if root.ndim == 0 else root
+
+    # Bracket and bisect whatever the line did not solve
+    for _ in range(max_expansions):
+        unbracketed = ~solved & (f_high < 0)
+        if not unbracketed.any():
+            break
+        low = np.where(unbracketed, high, low)
+        f_low = np.where(unbracketed, f_high, f_low)
+        high = np.where(unbracketed, high * 2, high)
+        f_high = np.where(unbracketed, func(high), f_high)
+
+    bracketed = (f_low <= 0) & (f_high >= 0)
+    for _ in range(max_iter):
+        active = ~solved & bracketed & (high - low > tol * np.maximum(np.abs(high), 1.0))
+        if not active.any():
+            break
+        mid = (low + high) / 2
+        f_mid = func(mid)
+        below = f_mid < 0
+        low = np.where(active & below, mid, low)
+        high = np.where(active & ~below, mid, high)
+
+    root = np.where(solved, root, np.where(bracketed, (low + high) / 2, np.nan))
+    return root[()] if root.ndim == 0 else root
+
+
+def break_even_rent(mortgage, tax_treatment, tax_rate, management_charge_percent=0, fixed_costs=0):
+    """Monthly rent at which net income is zero.
+
+    Takes the same inputs as ``net_inc`` (less the rent); array inputs give
+    one break-even rent per scenario.
+    """
+    def income(rent):
+        return net_inc(rent, mortgage, tax_treatment, tax_rate, management_charge_percent, fixed_costs)
+
+    return solve_break_even(income)
@@ -0,0 +1,261 @@
+"""Persistent result cache shared between processes.
+
+Results are keyed on a canonical hash of everything that produced them (a
+namespace, such as the function or page node, and its full inputs) and kept,
+pickled, in a local SQLite file. Like ``btl_model.store`` the database runs
+in WAL mode and every call opens its own short-lived connection, so any
+number of Streamlit sessions, server processes and batch workers can share
+one file: a scenario computed by one of them is a lookup for the rest.
+
+Entries expire ``ttl`` seconds after they were stored, and once the cache
+holds more than ``max_bytes`` the least recently used are evicted. Every
+key also covers the source of ``btl_model``, so changing the model never
+serves results it would no longer produce. Hits and misses are counted per
+namespace in the database, across all the processes using it.
+
+A lookup only reads the database: access times and hit/miss counts are kept
+in memory and written in one transaction every ``FLUSH_EVERY`` lookups, on
+the next ``set`` (before evicting) and on ``stats``. Call ``flush`` before a
+process exits to keep the last few.
+
+Values are unpickled on a hit, so only point the cache at a file you trust.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import math
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import closing, contextmanager
+
+import numpy as np
+
+DEFAULT_PATH = os.environ.get('BTL_RESULT_CACHE', 'results_cache.db')
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+DEFAULT_TTL = 7 * 24 * 3600
+# Lookups between writes of the access times and hit/miss counts
+FLUSH_EVERY = 100
+
+CacheStats = namedtuple('CacheStats', ('hits', 'misses', 'entries', 'size'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at);
+CREATE INDEX IF NOT EXISTS results_stored_at ON results (stored_at);
+CREATE TABLE IF NOT EXISTS counters (
+    namespace TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def model_version():
+    """Digest of the ``btl_model`` source, so results never outlive the code."""
+    digest = hashlib.sha1()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.py'):
+            with open(os.path.join(directory, name), 'rb') as source:
+                digest.update(name.encode() + b'\0' + source.read())
+    return digest.hexdigest()
+
+
+def _canonical(value):
+    # A JSON-serialisable form in which equal inputs are identical: 250000 and
+    # 250000.0 are the same scenario, and arrays are identified by their bytes
+    if value is None or isinstance(value, (bool, np.bool_, str)):
+        return value.item() if isinstance(value, np.bool_) else value
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        value = float(value)
+        # -0.0 is 0.0; NaN and the infinities are not JSON numbers
+        return value + 0.0 if math.isfinite(value) else repr(value)
+    if isinstance(value, bytes):
+        return ['bytes', hashlib.sha256(value).hexdigest()]
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            # Labels such as tax treatments, hashed in one pass rather than item by item
+            text = json.dumps(value.ravel().tolist(), default=repr)
+            return ['array', list(value.shape), hashlib.sha256(text.encode()).hexdigest()]
+        data = np.ascontiguousarray(value)
+        return ['ndarray', data.dtype.str, list(data.shape), hashlib.sha256(data.data).hexdigest()]
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    raise TypeError(f"Cannot build a cache key from a {type(value).__name__}")
+
+
+def scenario_key(namespace, inputs):
+    """Canonical hash of ``inputs`` (a dict of scenario inputs) under ``namespace``."""
+    text = json.dumps([model_version(), namespace, _canonical(inputs)], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+_MISSING = object()
+
+
+class ResultCache:
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL, flush_every=FLUSH_EVERY):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.flush_every = flush_every
+        # Not yet written: namespace -> [hits, misses], and key -> last access time
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._accessed = {}
+        self._lookups = 0
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # Commits (or rolls back) on exit and always closes
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with conn:
+                yield conn
+
+    def _take_pending(self):
+        with self._lock:
+            counts, accessed = self._counts, self._accessed
+            self._counts, self._accessed, self._lookups = {}, {}, 0
+        return counts, accessed
+
+    def _write_pending(self, conn, counts, accessed):
+        conn.executemany(
+            'INSERT INTO counters (namespace, hits, misses) VALUES (?, ?, ?) '
+            'ON CONFLICT (namespace) DO UPDATE SET hits = hits + excluded.hits, misses = misses + excluded.misses',
+            [(namespace, hits, misses) for namespace, (hits, misses) in counts.items()],
+        )
+        conn.executemany(
+            'UPDATE results SET accessed_at = max(accessed_at, ?) WHERE key = ?',
+            [(when, key) for key, when in accessed.items()],
+        )
+
+    def flush(self):
+        """Write the access times and hit/miss counts held in memory."""
+        counts, accessed = self._take_pending()
+        if counts or accessed:
+            with self._connect() as conn:
+                self._write_pending(conn, counts, accessed)
+
+    def get(self, namespace, inputs, default=None):
+        """The result stored for ``inputs``, or ``default``; counts a hit or a miss."""
+        key = scenario_key(namespace, inputs)
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute('SELECT value, stored_at FROM results WHERE key = ?', (key,)).fetchone()
+        # Expired entries are misses here and deleted by the next eviction
+        if row is not None and self.ttl is not None and row[1] < now - self.ttl:
+            row = None
+        with self._lock:
+            self._counts.setdefault(namespace, [0, 0])[row is None] += 1
+            if row is not None:
+                self._accessed[key] = now
+            self._lookups += 1
+            due = self._lookups >= self.flush_every
+        if due:
+            self.flush()
+        return default if row is None else pickle.loads(row[0])
+
+    def set(self, namespace, inputs, value):
+        """Store ``value`` as the result for ``inputs``, evicting to stay within ``max_bytes``.
+
+        A value too large for the cache on its own is not stored.
+        """
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.max_bytes is not None and len(data) > self.max_bytes:
+            return
+        key = scenario_key(namespace, inputs)
+        now = time.time()
+        counts, accessed = self._take_pending()
+        with self._connect() as conn:
+            # Recent hits first, so the eviction below sees them
+            self._write_pending(conn, counts, accessed)
+            conn.execute(
+                """INSERT INTO results (key, namespace, value, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (key) DO UPDATE SET
+                       value = excluded.value, size = excluded.size,
+                       stored_at = excluded.stored_at, accessed_at = excluded.accessed_at""",
+                (key, namespace, data, len(data), now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        if self.ttl is not None:
+            conn.execute('DELETE FROM results WHERE stored_at < ?', (now - self.ttl,))
+        if self.max_bytes is None:
+            return
+        excess = conn.execute('SELECT total(size) FROM results').fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        # Least recently used first, until the excess is covered
+        cutoff = conn.execute(
+            """SELECT accessed_at FROM (
+                   SELECT accessed_at, SUM(size) OVER (ORDER BY accessed_at, key) AS freed FROM results
+               ) WHERE freed >= ? ORDER BY accessed_at LIMIT 1""",
+            (excess,),
+        ).fetchone()
+        conn.execute('DELETE FROM results WHERE accessed_at <= ?', (cutoff[0],))
+
+    def get_or_compute(self, namespace, inputs, compute):
+        """The stored result for ``inputs``, or ``compute()`` stored for next time."""
+        value = self.get(namespace, inputs, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(namespace, inputs, value)
+        return value
+
+    def memoize(self, func=None, namespace=None):
+        """Decorator caching ``func`` on its full arguments, defaults included.
+
+        The namespace defaults to the function's module and qualified name.
+        """
+        if func is None:
+            return functools.partial(self.memoize, namespace=namespace)
+        namespace = namespace or f'{func.__module__}.{func.__qualname__}'
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return self.get_or_compute(namespace, dict(bound.arguments), lambda: func(*args, **kwargs))
+
+        return wrapper
+
+    def stats(self, namespace=None):
+        """CacheStats: hits and misses since the counters were reset, entries and size in bytes."""
+        self.flush()
+        where, params = (' WHERE namespace = ?', (namespace,)) if namespace is not None else ('', ())
+        with self._connect() as conn:
+            hits, misses = conn.execute(f'SELECT total(hits), total(misses) FROM counters{where}', params).fetchone()
+            entries, size = conn.execute(f'SELECT COUNT(*), total(size) FROM results{where}', params).fetchone()
+        return CacheStats(int(hits), int(misses), entries, int(size))
+
+    def clear(self, namespace=None, counters=True):
+        """Drop the stored results (and, with ``counters``, the hit/miss counts)."""
+        self.flush()
+        where, params = (' WHERE namespace = ?', (namespace,)) if namespace is not None else ('', ())
+        with self._connect() as conn:
+            conn.execute(f'DELETE FROM results{where}', params)
+            if counters:
+                conn.execute(f'DELETE FROM counters{where}', params)
@@ -0,0 +1,262 @@
+"""Out-of-core evaluation of columnar scenario files.
+
+    python -m btl_model.batch scenarios.parquet --output results.parquet
+    python -m btl_model.batch scenarios.arrow --output results.arrow --workers 0
+    python -m btl_model.batch scenarios/ --output results/ --output-format npy
+
+Parquet, Arrow IPC (Feather v2) and NumPy files are read ``chunk_size`` rows
+at a time: Parquet by record batch, Arrow and NumPy from memory maps. Where a
+column is already float64 without nulls the model reads its buffer directly
+rather than a copy, and nothing is parsed row by row, so peak memory is set
+by the chunk size (and, for Parquet, the row group size) rather than the
+file. A NumPy input is either a directory of ``<column>.npy`` files or one
+structured ``.npy`` array. Output rows carry their 0-based input ``row``.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from btl_model.batch import _FALSE, _TRUE, evaluate_chunks
+from btl_model.income import TAX_TREATMENTS
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+FORMATS = ('parquet', 'arrow', 'npy')
+
+
+def _numpy(array):
+    # Zero-copy for fixed-width columns without nulls; strings and nulls are converted
+    try:
+        return array.to_numpy(zero_copy_only=True)
+    except Exception:
+        return array.to_numpy(zero_copy_only=False)
+
+
+def _arrow_batches(batches, chunk_size):
+    # Record batches, sliced (without copying) to at most ``chunk_size`` rows
+    for batch in batches:
+        for offset in range(0, batch.num_rows, chunk_size):
+            yield batch.slice(offset, chunk_size)
+
+
+def _check_columns(available, model):
+    missing = [column for column in model.required if column not in available]
+    if missing:
+        raise ValueError(f"Missing input columns: {', '.join(missing)}")
+    return [column for column in (*model.required, *model.optional, 'id') if column in available]
+
+
+def read_columns(path, input_format, model, chunk_size):
+    """``(total_rows, chunks)``, where ``chunks`` yields ``(first_row, {column: array})``."""
+    if input_format == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet input needs pyarrow: pip install pyarrow") from None
+        file = pq.ParquetFile(path, memory_map=True)
+        names = _check_columns(file.schema_arrow.names, model)
+        batches = _arrow_batches(file.iter_batches(batch_size=chunk_size, columns=names), chunk_size)
+        total = file.metadata.num_rows
+    elif input_format == 'arrow':
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise SystemExit("Arrow input needs pyarrow: pip install pyarrow") from None
+        reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+        names = _check_columns(reader.schema.names, model)
+        record_batches = [reader.get_batch(i) for i in range(reader.num_record_batches)]
+        batches = _arrow_batches(record_batches, chunk_size)
+        total = sum(batch.num_rows for batch in record_batches)
+    elif input_format == 'npy':
+        arrays = _npy_columns(path)
+        names = _check_columns(arrays, model)
+        total = len(arrays[names[0]])
+        return total, (
+            (start, {name: arrays[name][start:start + chunk_size] for name in names})
+            for start in range(0, total, chunk_size)
+        )
+    else:
+        raise ValueError(f"Unknown columnar format {input_format!r}; expected one of {', '.join(FORMATS)}")
+
+    def chunks():
+        start = 0
+        for batch in batches:
+            yield start, {name: _numpy(batch.column(name)) for name in names}
+            start += batch.num_rows
+
+    return total, chunks()
+
+
+def _npy_columns(path):
+    if os.path.isdir(path):
+        return {
+            name[:-len('.npy')]: np.load(os.path.join(path, name), mmap_mode='r')
+            for name in sorted(os.listdir(path)) if name.endswith('.npy')
+        }
+    records = np.load(path, mmap_mode='r')
+    if records.dtype.names is None:
+        raise ValueError(f"{path} is not a structured array; use a directory of <column>.npy files instead")
+    return {name: records[name] for name in records.dtype.names}
+
+
+def _booleans(values):
+    # True/false are not numbers, as in ``batch.parse_row``, though NumPy and pandas would read them as 1/0
+    if values.dtype.kind == 'b':
+        return np.ones(len(values), dtype=bool)
+    if values.dtype.kind == 'O':
+        return np.fromiter((isinstance(value, (bool, np.bool_)) for value in values), dtype=bool, count=len(values))
+    return np.zeros(len(values), dtype=bool)
+
+
+def _as_float(values):
+    """``(numbers, booleans)``: ``values`` as floats, NaN where not a number, and where they were booleans."""
+    values = np.asarray(values)
+    booleans = _booleans(values)
+    if values.dtype.kind in 'fiu':
+        return values.astype(float, copy=False), booleans
+    numbers = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float)
+    return np.where(booleans, np.nan, numbers), booleans
+
+
+def _labels(values, lookup, default):
+    """Map text labels through ``lookup`` once per distinct value.
+
+    Returns ``(parsed, invalid)``; nulls and empty strings take ``default``.
+    """
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    mapped = [default if str(label).strip() == '' else lookup.get(str(label).strip().lower()) for label in uniques]
+    # Nulls have code -1, which picks the entry appended for them
+    invalid = np.array([value is None for value in mapped] + [False])[codes]
+    parsed = np.array([default if value is None else value for value in mapped] + [default], dtype=object)[codes]
+    return parsed, invalid
+
+
+def parse_columns(first_row, columns, model, errors):
+    """Validated model inputs for one chunk of columns, like ``batch.parse_chunk``.
+
+    Invalid rows are dropped and reported to ``errors(row, message, record)``.
+    Returns ``(rows, ids, columns)``; ``ids`` is None without an ``id`` column.
+    """
+    n = len(next(iter(columns.values())))
+    checks = []
+    parsed = {}
+
+    for column in model.required:
+        values, booleans = _as_float(columns[column])
+        checks.append((booleans, f"{column}: expected a number"))
+        checks.append((~np.isfinite(values), f"{column}: missing or not a finite number"))
+        parsed[column] = values
+    for column, default in model.optional.items():
+        if column not in columns:
+            parsed[column] = np.full(n, default)
+            continue
+        values = np.asarray(columns[column])
+        if isinstance(default, bool):
+            if values.dtype == bool:
+                parsed[column] = values
+            elif values.dtype.kind in 'fiu':
+                numbers = values.astype(float)
+                parsed[column] = np.where(np.isnan(numbers), default, numbers != 0)
+            else:
+                lookup = {**{text: False for text in _FALSE}, **{text: True for text in _TRUE}}
+                values, invalid = _labels(values, lookup, default)
+                checks.append((invalid, f"{column}: expected true or false"))
+                parsed[column] = values.astype(bool)
+        elif isinstance(default, str):
+            values, invalid = _labels(values, {treatment.lower(): treatment for treatment in TAX_TREATMENTS}, default)
+            checks.append((invalid, f"{column}: expected one of {', '.join(TAX_TREATMENTS)}"))
+            parsed[column] = values.astype(str)
+        else:
+            numbers, booleans = _as_float(values)
+            checks.append((booleans | np.isinf(numbers) | (np.isnan(numbers) & ~pd.isna(values)), f"{column}: expected a number"))
+            parsed[column] = np.where(np.isnan(numbers), default, numbers)
+
+    valid = np.ones(n, dtype=bool)
+    for invalid, _ in checks:
+        valid &= ~invalid
+    for i in np.flatnonzero(~valid):
+        message = next(message for invalid, message in checks if invalid[i])
+        record = {column: None if pd.isna(values[i]) else values[i].item() if hasattr(values[i], 'item') else values[i]
+                  for column, values in columns.items()}
+        errors(first_row + int(i), message, record)
+
+    rows = np.arange(first_row, first_row + n)
+    ids = columns.get('id')
+    if valid.all():
+        return rows, ids, parsed
+    return rows[valid], None if ids is None else ids[valid], {column: values[valid] for column, values in parsed.items()}
+
+
+def _memory():
+    # MB in use, leaving out pages of memory-mapped files (the OS can drop those at will)
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('RssAnon:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is not None:
+        # Peak resident size: kilobytes on Linux, bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+    return None
+
+
+class Progress:
+    """Rows done, throughput, time left and peak memory, on stderr.
+
+    Memory is this process's, sampled at each report; worker processes
+    each hold their own chunks on top of it.
+    """
+
+    def __init__(self, total, stream=sys.stderr, interval=1.0):
+        self.total = total
+        self.stream = stream
+        self.interval = interval
+        self.start = self.last = time.perf_counter()
+        self.peak = None
+
+    def update(self, done, final=False):
+        memory = _memory()
+        if memory is not None:
+            self.peak = max(self.peak or 0, memory)
+        now = time.perf_counter()
+        if not final and now - self.last < self.interval:
+            return
+        self.last = now
+        elapsed = max(now - self.start, 1e-9)
+        rate = done / elapsed
+        line = f"{done:,}/{self.total:,} rows ({done / max(self.total, 1):.1%}), {rate:,.0f} rows/s"
+        if not final and rate > 0:
+            line += f", {(self.total - done) / rate:,.0f}s left"
+        if self.peak is not None:
+            line += f", peak memory {self.peak:,.0f} MB"
+        print(line, file=self.stream, flush=True)
+
+
+def run(path, input_format, writer, model, chunk_size, max_workers=1, stamp_duty_table=None, errors=None,
+        progress=True):
+    """Evaluate a columnar file chunk by chunk and write the results; returns the row count."""
+    errors = errors or (lambda *args: None)
+    total, chunks = read_columns(path, input_format, model, chunk_size)
+    tracker = Progress(total) if progress else None
+    written = 0
+    for rows, ids, outputs in evaluate_chunks(
+        (parse_columns(first_row, columns, model, errors) for first_row, columns in chunks),
+        model, max_workers, stamp_duty_table,
+    ):
+        writer.write(rows, ids, outputs)
+        written += len(rows)
+        if tracker:
+            # Rows are in input order, so the last row written is how far the input has got
+            tracker.update(int(rows[-1]) + 1 if len(rows) else written)
+    if tracker:
+        tracker.update(total, final=True)
+    return written
@@ -0,0 +1,163 @@
+"""Batch evaluation of the Tax Comparison model.
+
+Each row is one property currently held personally, described with the same
+inputs as the Tax Comparison page: it is evaluated under both ownership
+routes, alongside the one-off cost of transferring it to a company. Cost
+lines are annual figures here, where the page lets each be monthly or annual.
+``plan_transfers`` sets those costs against the yearly saving across a
+whole portfolio.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from btl_model.breakeven import break_even_rent
+from btl_model.income import LIMITED_COMPANY, PERSONAL, net_inc
+from btl_model.mortgage import first_month_terms
+from btl_model.portfolio import _columns
+from btl_model.stamp_duty import sdlt
+
+REQUIRED_COLUMNS = (
+    'current_market_value', 'purchase_price', 'mortgage_remaining', 'rent',
+    'interest_rate_personal', 'length_of_mortgage_personal',
+    'interest_rate_company', 'length_of_mortgage_company',
+    'income_tax_rate', 'corporation_tax_rate',
+)
+
+# Annual cost lines (£) shared by both routes
+COST_COLUMNS = ('service_charge', 'maintenance_cost', 'landlord_insurance', 'building_insurance')
+
+OPTIONAL_COLUMNS = {
+    **{column: 0.0 for column in COST_COLUMNS},
+    'management_charge_percent': 0.0,
+    'accountancy_cost_personal': 0.0,
+    'accountancy_cost_company': 0.0,
+    'capital_gains_tax_rate': 0.24,
+    'legal_fees': 0.0,
+    'mortgage_arrangement_fee_company': 0.0,
+}
+
+# Fractions, such as 0.19 for 19%
+TAX_RATE_COLUMNS = ('income_tax_rate', 'corporation_tax_rate', 'capital_gains_tax_rate')
+
+OUTPUT_COLUMNS = (
+    'monthly_repayment_personal', 'monthly_repayment_company',
+    'net_income_personal', 'net_income_company', 'monthly_difference',
+    'cost_neutral_rent_personal', 'cost_neutral_rent_company',
+    'capital_gains_tax', 'additional_stamp_duty', 'total_transfer_cost', 'transfer_payback_months',
+)
+
+
+def evaluate_comparison_columns(columns, stamp_duty_table=None):
+    """Evaluate both ownership routes for a dict of equal-length column arrays.
+
+    Tax rates are fractions, and a ValueError is raised for any outside 0 to
+    1 (such as 19 for 19%). ``monthly_difference`` is company less personal
+    net income; ``transfer_payback_months`` is how long that difference takes
+    to repay the transfer cost (NaN if the company route is not better).
+    """
+    columns = _columns(columns, REQUIRED_COLUMNS, OPTIONAL_COLUMNS)
+    for column in TAX_RATE_COLUMNS:
+        rates = columns[column].astype(float)
+        outside = (rates < 0) | (rates > 1)
+        if outside.any():
+            raise ValueError(
+                f"{column} must be a fraction between 0 and 1 (0.19 for 19%), got {rates[outside][0]:g}"
+            )
+    rent = columns['rent']
+    management_charge_percent = columns['management_charge_percent'].astype(float)
+    shared_costs = sum(columns[column].astype(float) for column in COST_COLUMNS)
+
+    # Both routes carry the outstanding balance, each on its own terms
+    mortgage = first_month_terms(
+        np.concatenate([columns['mortgage_remaining']] * 2),
+        np.concatenate([columns['interest_rate_personal'], columns['interest_rate_company']]),
+        np.concatenate([columns['length_of_mortgage_personal'], columns['length_of_mortgage_company']]),
+    )
+    n = len(rent)
+    income_kwargs = dict(
+        tax_treatment=np.repeat([PERSONAL, LIMITED_COMPANY], n),
+        tax_rate=np.concatenate([columns['income_tax_rate'], columns['corporation_tax_rate']]),
+        management_charge_percent=np.tile(management_charge_percent, 2),
+        fixed_costs=np.concatenate([
+            (shared_costs + columns['accountancy_cost_personal'].astype(float)) / 12,
+            (shared_costs + columns['accountancy_cost_company'].astype(float)) / 12,
+        ]),
+    )
+    net_income = net_inc(np.tile(rent, 2), mortgage, **income_kwargs)
+    cost_neutral_rent = break_even_rent(mortgage, **income_kwargs)
+
+    capital_gains = np.maximum(columns['current_market_value'] - columns['purchase_price'], 0)
+    capital_gains_tax = capital_gains * columns['capital_gains_tax_rate'].astype(float)
+    additional_stamp_duty = sdlt(columns['current_market_value'], additional_property=True, table=stamp_duty_table)
+    total_transfer_cost = (
+        capital_gains_tax + additional_stamp_duty
+        + columns['legal_fees'].astype(float) + columns['mortgage_arrangement_fee_company'].astype(float)
+    )
+    difference = net_income[n:] - net_income[:n]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payback = np.where(difference > 0, total_transfer_cost / difference, np.nan)
+
+    return {
+        'monthly_repayment_personal': mortgage.repay[:n],
+        'monthly_repayment_company': mortgage.repay[n:],
+        'net_income_personal': net_income[:n],
+        'net_income_company': net_income[n:],
+        'monthly_difference': difference,
+        'cost_neutral_rent_personal': cost_neutral_rent[:n],
+        'cost_neutral_rent_company': cost_neutral_rent[n:],
+        'capital_gains_tax': capital_gains_tax,
+        'additional_stamp_duty': additional_stamp_duty,
+        'total_transfer_cost': total_transfer_cost,
+        'transfer_payback_months': payback,
+    }
+
+
+TransferPlan = namedtuple('TransferPlan', ('properties', 'summary'))
+
+
+def plan_transfers(properties, horizon=10, stamp_duty_table=None):
+    """Rank properties for transfer into a company by how quickly each pays back.
+
+    ``properties`` is a DataFrame (or anything ``pd.DataFrame`` accepts) with
+    one row per property and the columns of ``evaluate_comparison_columns``.
+    Returns a TransferPlan: ``properties`` has that function's outputs plus
+    the yearly net income difference, the payback year (the first full year
+    by which the difference has covered the transfer cost), ``worth_transferring``
+    (paid back within ``horizon`` years) and running totals, sorted into the
+    order to transfer them: quickest payback first, those that never pay
+    back last. ``summary`` totals the whole portfolio and the worthwhile part.
+    """
+    properties = pd.DataFrame(properties)
+    outputs = evaluate_comparison_columns(
+        {column: properties[column].to_numpy() for column in properties.columns}, stamp_duty_table,
+    )
+    plan = properties.assign(**outputs)
+    plan['annual_difference'] = plan['monthly_difference'] * 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payback = np.where(plan['annual_difference'] > 0, plan['total_transfer_cost'] / plan['annual_difference'], np.nan)
+    plan['payback_year'] = np.ceil(payback)
+    plan['worth_transferring'] = plan['payback_year'] <= horizon
+
+    plan = plan.iloc[np.argsort(np.where(np.isnan(payback), np.inf, payback), kind='stable')]
+    plan.insert(0, 'rank', np.arange(1, len(plan) + 1))
+    plan['cumulative_transfer_cost'] = plan['total_transfer_cost'].cumsum()
+    plan['cumulative_annual_difference'] = plan['annual_difference'].cumsum()
+
+    def totals(rows):
+        cost = rows['total_transfer_cost'].sum()
+        difference = rows['annual_difference'].sum()
+        return {
+            'properties': len(rows),
+            'total_transfer_cost': cost,
+            'annual_difference': difference,
+            'payback_year': np.ceil(cost / difference) if difference > 0 else np.nan,
+        }
+
+    summary = pd.DataFrame({
+        'All properties': totals(plan),
+        f'Paying back within {horizon} years': totals(plan[plan['worth_transferring']]),
+    }).T
+    return TransferPlan(plan.reset_index(drop=True), summary)
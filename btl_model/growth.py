@@ -0,0 +1,9 @@
+"""Capital growth projections."""
+
+import numpy as np
+
+
+def culm_growth_func(houseprice, annual_capital_growth, years):
+    """Cumulative capital growth after ``years`` at an annual % growth rate."""
+    capital_growth_float = (np.asarray(annual_capital_growth) / 100)
+    return (houseprice * (np.power(1 + capital_growth_float, years))) - houseprice
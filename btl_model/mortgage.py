@@ -0,0 +1,127 @@
+"""Mortgage repayment and amortisation calculations."""
+
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+AmortizationSchedule = namedtuple(
+    'AmortizationSchedule',
+    ['month', 'payment', 'balance', 'interest', 'capital', 'cumulative_interest'],
+)
+
+
+def _monthly_rate(interest_rate):
+    return (np.asarray(interest_rate, dtype=float) / 100) / 12
+
+
+def _payment(principal, rate, nper):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = (1 + rate) ** nper
+        return np.where(rate == 0, principal / nper, principal * rate * growth / (growth - 1))
+
+
+def monthly_payment(principal, interest_rate, length_of_mortgage):
+    """Level monthly repayment for an annual % rate over a term in years.
+
+    Equivalent to ``abs(npf.pmt(...))`` but broadcasts over array inputs.
+    """
+    payment = _payment(
+        np.asarray(principal, dtype=float),
+        _monthly_rate(interest_rate),
+        np.asarray(length_of_mortgage, dtype=float) * 12,
+    )
+    return payment[()] if payment.ndim == 0 else payment
+
+
+def amortization_schedule(principal, interest_rate, length_of_mortgage):
+    """Month-by-month repayment schedule in a single vectorised pass.
+
+    ``principal``, ``interest_rate`` (annual %) and ``length_of_mortgage``
+    (years) broadcast together. Scalar inputs give 1-D arrays over months;
+    array inputs give 2-D (loans x months) arrays. Months after a loan's term
+    are zero-filled (the balance stays at zero).
+    """
+    principal, interest_rate, length_of_mortgage = np.broadcast_arrays(
+        np.asarray(principal, dtype=float),
+        np.asarray(interest_rate, dtype=float),
+        np.asarray(length_of_mortgage, dtype=float),
+    )
+    scalar = principal.ndim == 0
+    principal = np.atleast_1d(principal).reshape(-1, 1)
+    rate = _monthly_rate(interest_rate).reshape(-1, 1)
+    nper = np.atleast_1d(length_of_mortgage).reshape(-1, 1) * 12
+    payment = _payment(principal, rate, nper)
+
+    n_months = int(np.ceil(nper.max())) if nper.size else 0
+    month = np.arange(1, n_months + 1)
+    active = month <= np.ceil(nper)
+
+    # Closed-form opening balance for each month: B_k = P(1+r)^k - pmt((1+r)^k - 1)/r
+    k = month - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = (1 + rate) ** k
+        opening = np.where(rate == 0, principal - payment * k, principal * growth - payment * (growth - 1) / rate)
+    opening = np.where(active, np.clip(opening, 0, None), 0.0)
+
+    interest = opening * rate
+    capital = np.minimum(payment - interest, opening)
+    payment_made = np.where(active, interest + capital, 0.0)
+    balance = opening - capital
+    cumulative_interest = np.cumsum(interest, axis=-1)
+
+    if scalar:
+        payment_made, balance, interest, capital, cumulative_interest = (
+            a[0] for a in (payment_made, balance, interest, capital, cumulative_interest)
+        )
+    return AmortizationSchedule(month, payment_made, balance, interest, capital, cumulative_interest)
+
+
+def outstanding_balance(principal, interest_rate, length_of_mortgage, months):
+    """Balance left after ``months`` level repayments, in closed form.
+
+    Broadcasts like ``monthly_payment``; zero once the term has run.
+    """
+    principal = np.asarray(principal, dtype=float)
+    rate = _monthly_rate(interest_rate)
+    nper = np.asarray(length_of_mortgage, dtype=float) * 12
+    months = np.minimum(np.asarray(months, dtype=float), nper)
+    payment = _payment(principal, rate, nper)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        growth = (1 + rate) ** months
+        balance = np.where(rate == 0, principal - payment * months, principal * growth - payment * (growth - 1) / rate)
+    balance = np.clip(balance, 0, None)
+    return balance[()] if balance.ndim == 0 else balance
+
+
+MortgageTerms = namedtuple('MortgageTerms', ['principle', 'interest', 'repay'])
+
+
+def first_month_terms(mort_req, interest_rate, length_of_mortgage):
+    """Month-one capital, interest and total repayment, broadcast over arrays.
+
+    Avoids building the full schedule when only the first month is needed,
+    e.g. when evaluating a whole portfolio.
+    """
+    principal = np.asarray(mort_req, dtype=float)
+    rate = _monthly_rate(interest_rate)
+    payment = _payment(principal, rate, np.asarray(length_of_mortgage, dtype=float) * 12)
+    interest = principal * rate
+    return MortgageTerms(payment - interest, interest, payment)
+
+
+@lru_cache(maxsize=128)
+def mortgage_terms(mort_req, interest_rate, length_of_mortgage):
+    """Month-one capital, interest and total repayment for a loan, from its schedule.
+
+    Cached per (principal, rate, term) so repeated calls from the pages and
+    the personal/limited company paths share one computation.
+    """
+    schedule = amortization_schedule(mort_req, interest_rate, length_of_mortgage)
+    if not len(schedule.month):
+        return MortgageTerms(*(float(v) for v in first_month_terms(mort_req, interest_rate, length_of_mortgage)))
+    return MortgageTerms(float(schedule.capital[0]), float(schedule.interest[0]), float(schedule.payment[0]))
+
+
+def ltv(deposit, houseprice):
+    return (houseprice - deposit)/houseprice
@@ -0,0 +1,174 @@
+"""Search for the best deal structure: deposit, mortgage term and ownership route.
+
+Every candidate structure is evaluated together: month-by-month amortisation
+for all of them at once, annual net income over the holding period, a sale
+at the end and the IRR of the resulting cash flows. A coarse grid over
+deposit, term and tax treatment is searched first, then the deposit of the
+best structures is refined by repeatedly zooming a finer grid around it.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from btl_model.income import LIMITED_COMPANY, PERSONAL, TAX_TREATMENTS, net_inc
+from btl_model.mortgage import MortgageTerms, amortization_schedule
+from btl_model.returns import irr, investment_cash_flows, sale_proceeds
+from btl_model.stamp_duty import sdlt
+
+TARGETS = ('net_income', 'irr', 'cash_on_cash')
+
+STRUCTURE_COLUMNS = (
+    'tax_treatment', 'deposit', 'ltv', 'length_of_mortgage', 'stamp_duty', 'capital',
+    'monthly_repayment', 'net_income', 'cash_on_cash', 'irr',
+)
+
+OptimizationResult = namedtuple('OptimizationResult', ('best', 'frontier', 'candidates'))
+
+
+def evaluate_structures(houseprice, rent, interest_rate, deposit, length_of_mortgage, tax_treatment, tax_rate,
+                        years=10, annual_capital_growth=0, rent_increase=0, cost_inflation=0,
+                        management_charge_percent=0, fixed_costs=0, capital_gains_tax_rate=0.24, selling_costs=0,
+                        additional_property=True, stamp_duty_table=None):
+    """Metrics for each structure, as a dict of arrays keyed by STRUCTURE_COLUMNS.
+
+    ``deposit``, ``length_of_mortgage``, ``tax_treatment`` and ``tax_rate``
+    (a fraction) broadcast together; the other inputs describe the property
+    and are shared. ``net_income`` is the first month's; ``cash_on_cash`` is
+    the first year's net income over the capital put in (deposit plus stamp
+    duty); ``irr`` assumes a sale after ``years``, taxed at the company's
+    ``tax_rate`` for a company and ``capital_gains_tax_rate`` personally.
+    """
+    deposit, length_of_mortgage, tax_treatment, tax_rate = (
+        np.atleast_1d(a) for a in np.broadcast_arrays(deposit, length_of_mortgage, tax_treatment, tax_rate)
+    )
+    deposit = deposit.astype(float)
+    tax_rate = tax_rate.astype(float)
+    company = tax_treatment == LIMITED_COMPANY
+    months = int(years) * 12
+
+    schedule = amortization_schedule(houseprice - deposit, interest_rate, length_of_mortgage)
+    # Loans shorter than the holding period are already zero-filled; pad to it
+    pad = max(months - schedule.payment.shape[1], 0)
+    capital, interest, payment, balance = (
+        np.pad(getattr(schedule, name), ((0, 0), (0, pad)))[:, :months]
+        for name in ('capital', 'interest', 'payment', 'balance')
+    )
+
+    year = np.arange(months) // 12
+    monthly_rent = rent * (1 + rent_increase / 100) ** year
+    monthly_fixed_costs = fixed_costs * (1 + cost_inflation / 100) ** year
+    monthly_net_income = net_inc(
+        monthly_rent, MortgageTerms(capital, interest, payment), tax_treatment[:, np.newaxis],
+        tax_rate[:, np.newaxis], management_charge_percent, monthly_fixed_costs,
+    )
+    annual_net_income = monthly_net_income.reshape(len(deposit), -1, 12).sum(axis=2)
+
+    stamp_duty = sdlt(houseprice, additional_property=company | additional_property, table=stamp_duty_table)
+    capital_in = deposit + stamp_duty
+    valuation = houseprice * (1 + annual_capital_growth / 100) ** years
+    proceeds = sale_proceeds(
+        valuation, balance[:, -1] if months else houseprice - deposit, houseprice,
+        np.where(company, tax_rate, capital_gains_tax_rate), selling_costs,
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cash_on_cash = annual_net_income[:, 0] / capital_in
+
+    return {
+        'tax_treatment': tax_treatment,
+        'deposit': deposit,
+        'ltv': (houseprice - deposit) / houseprice,
+        'length_of_mortgage': length_of_mortgage.astype(float),
+        'stamp_duty': stamp_duty,
+        'capital': capital_in,
+        'monthly_repayment': payment[:, 0] if months else np.zeros(len(deposit)),
+        'net_income': monthly_net_income[:, 0],
+        'cash_on_cash': cash_on_cash,
+        'irr': irr(investment_cash_flows(capital_in, annual_net_income, proceeds)),
+    }
+
+
+def efficient_frontier(structures, target):
+    """The structures no other beats on ``target`` for the same or less capital."""
+    ordered = structures.sort_values(['capital', target], ascending=[True, False])
+    score = ordered[target].fillna(-np.inf).to_numpy()
+    best_so_far = np.maximum.accumulate(score)
+    improves = np.concatenate([[True], score[1:] > best_so_far[:-1]])
+    return ordered[improves & np.isfinite(score)].reset_index(drop=True)
+
+
+def optimise_structure(houseprice, rent, interest_rate, budget, target='net_income', tax_rates=None,
+                       treatments=TAX_TREATMENTS, terms=range(5, 41), min_ltv=0.0, max_ltv=0.75,
+                       deposit_steps=40, refine_steps=21, refine_rounds=3, top=10, **property_inputs):
+    """Best deposit, term and ownership route for a capital ``budget``.
+
+    ``tax_rates`` maps each tax treatment to its rate as a fraction (by
+    default 40% income tax and 19% corporation tax). The deposit ranges over
+    loan-to-values between ``min_ltv`` and ``max_ltv``, limited so that
+    deposit plus stamp duty fits in the budget. Other keyword arguments are
+    passed to ``evaluate_structures``. Returns an OptimizationResult of
+    DataFrames: the ``top`` structures by ``target`` (at most one per
+    treatment and term), the efficient frontier of ``target`` against
+    capital, and every candidate evaluated.
+    """
+    if target not in TARGETS:
+        raise ValueError(f"Unknown target {target!r}; expected one of {', '.join(TARGETS)}")
+    tax_rates = {PERSONAL: 0.4, LIMITED_COMPANY: 0.19, **(tax_rates or {})}
+    treatments = list(treatments)
+    terms = np.asarray(list(terms), dtype=float)
+    additional_property = property_inputs.get('additional_property', True)
+    stamp_duty_table = property_inputs.get('stamp_duty_table')
+
+    def evaluate(deposit, term, treatment):
+        rate = np.vectorize(tax_rates.get, otypes=[float])(treatment)
+        return pd.DataFrame(evaluate_structures(
+            houseprice, rent, interest_rate, deposit, term, treatment, rate, **property_inputs,
+        ))
+
+    # Deposit bounds per treatment: the LTV limits, and what the budget leaves after stamp duty
+    bounds = {}
+    for treatment in treatments:
+        duty = float(sdlt(houseprice, additional_property=treatment == LIMITED_COMPANY or additional_property,
+                          table=stamp_duty_table))
+        low = houseprice * (1 - max_ltv)
+        high = min(houseprice * (1 - min_ltv), budget - duty)
+        if high >= low:
+            bounds[treatment] = (low, high)
+    if not bounds:
+        empty = pd.DataFrame(columns=STRUCTURE_COLUMNS)
+        return OptimizationResult(empty, empty, empty)
+
+    # Coarse grid: every treatment x term x deposit
+    grid = [
+        (deposit, term, treatment)
+        for treatment, (low, high) in bounds.items()
+        for term in terms
+        for deposit in np.linspace(low, high, deposit_steps)
+    ]
+    deposits, grid_terms, grid_treatments = (np.array(values) for values in zip(*grid))
+    candidates = evaluate(deposits, grid_terms, grid_treatments)
+
+    # Refine the deposit of the best structures by zooming in on each one
+    step = {treatment: (high - low) / max(deposit_steps - 1, 1) for treatment, (low, high) in bounds.items()}
+    for _ in range(refine_rounds):
+        leaders = candidates.nlargest(top, target)
+        zoom = np.linspace(-1, 1, refine_steps)
+        refine_deposits = np.concatenate([
+            np.clip(row.deposit + zoom * step[row.tax_treatment], *bounds[row.tax_treatment])
+            for row in leaders.itertuples()
+        ])
+        refine_terms = np.repeat(leaders['length_of_mortgage'].to_numpy(), refine_steps)
+        refine_treatments = np.repeat(leaders['tax_treatment'].to_numpy(), refine_steps)
+        candidates = pd.concat([candidates, evaluate(refine_deposits, refine_terms, refine_treatments)], ignore_index=True)
+        step = {treatment: size / (refine_steps // 2) for treatment, size in step.items()}
+
+    candidates = candidates.drop_duplicates(['tax_treatment', 'length_of_mortgage', 'deposit'], ignore_index=True)
+    # The best deposit for each treatment and term, so the leaders are distinct structures
+    best = (
+        candidates.sort_values(target, ascending=False)
+        .drop_duplicates(['tax_treatment', 'length_of_mortgage'])
+        .head(top)
+        .reset_index(drop=True)
+    )
+    return OptimizationResult(best, efficient_frontier(candidates, target), candidates)
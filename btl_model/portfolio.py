@@ -0,0 +1,146 @@
+"""Batch evaluation of the Buy to Let model over a portfolio of properties.
+
+Each row of the input table is one property, described with the same inputs
+as the Buy to Let page sidebar. All rows are evaluated together with NumPy;
+large tables are split into chunks and spread across a process pool.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from btl_model.breakeven import break_even_rent
+from btl_model.income import LIMITED_COMPANY, PERSONAL, net_inc
+from btl_model.growth import culm_growth_func
+from btl_model.mortgage import first_month_terms, outstanding_balance
+from btl_model.stamp_duty import sdlt
+
+REQUIRED_COLUMNS = ('houseprice', 'deposit', 'rent', 'interest_rate', 'length_of_mortgage', 'tax_rate')
+
+# Monthly cost lines (£), as entered on the Buy to Let page
+COST_COLUMNS = ('service_charge', 'maintenance_cost', 'landlord_insurance', 'building_insurance', 'accountancy_cost')
+
+OPTIONAL_COLUMNS = {
+    **{column: 0.0 for column in COST_COLUMNS},
+    'management_charge_percent': 0.0,
+    'tax_treatment': PERSONAL,
+    # Personal purchases pay the higher rates unless this is a main residence;
+    # a limited company always does.
+    'additional_property': True,
+    'first_time_buyer': False,
+    'non_resident': False,
+    # Growth (%) and holding period (years) for the valuation and equity at the end
+    'annual_capital_growth': 0.0,
+    'years': 10.0,
+}
+
+OUTPUT_COLUMNS = (
+    'mortgage_required', 'ltv', 'monthly_repayment', 'mortgage_interest', 'mortgage_capital',
+    'net_income', 'cost_neutral_rent', 'stamp_duty', 'total_capital_required',
+    'valuation', 'capital_growth', 'mortgage_balance', 'equity',
+)
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def _columns(properties, required=REQUIRED_COLUMNS, optional=OPTIONAL_COLUMNS):
+    missing = [column for column in required if column not in properties]
+    if missing:
+        raise ValueError(f"Missing portfolio columns: {', '.join(missing)}")
+    n = len(properties[required[0]])
+    columns = {}
+    for column in required:
+        columns[column] = np.asarray(properties[column], dtype=float)
+    for column, default in optional.items():
+        if column in properties:
+            columns[column] = np.asarray(properties[column])
+        else:
+            columns[column] = np.full(n, default)
+    return columns
+
+
+def evaluate_columns(columns, stamp_duty_table=None):
+    """Evaluate the model for a dict of equal-length column arrays.
+
+    Tax rates are fractions (0.19 for 19% corporation tax, 0.4 for the higher
+    income tax band). Returns a dict of output arrays keyed by OUTPUT_COLUMNS.
+    """
+    columns = _columns(columns)
+    houseprice = columns['houseprice']
+    deposit = columns['deposit']
+    tax_treatment = columns['tax_treatment']
+    management_charge_percent = columns['management_charge_percent'].astype(float)
+    fixed_costs = sum(columns[column].astype(float) for column in COST_COLUMNS)
+
+    mort_req = houseprice - deposit
+    mortgage = first_month_terms(mort_req, columns['interest_rate'], columns['length_of_mortgage'])
+
+    income_kwargs = dict(
+        tax_treatment=tax_treatment,
+        tax_rate=columns['tax_rate'],
+        management_charge_percent=management_charge_percent,
+        fixed_costs=fixed_costs,
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        loan_to_value = mort_req / houseprice
+
+    additional = (tax_treatment == LIMITED_COMPANY) | columns['additional_property'].astype(bool)
+    duty = sdlt(
+        houseprice,
+        additional_property=additional,
+        first_time_buyer=columns['first_time_buyer'].astype(bool),
+        non_resident=columns['non_resident'].astype(bool),
+        table=stamp_duty_table,
+    )
+
+    years = columns['years'].astype(float)
+    capital_growth = culm_growth_func(houseprice, columns['annual_capital_growth'].astype(float), years)
+    balance = outstanding_balance(mort_req, columns['interest_rate'], columns['length_of_mortgage'], years * 12)
+
+    return {
+        'mortgage_required': mort_req,
+        'ltv': loan_to_value,
+        'monthly_repayment': mortgage.repay,
+        'mortgage_interest': mortgage.interest,
+        'mortgage_capital': mortgage.principle,
+        'net_income': net_inc(columns['rent'], mortgage, **income_kwargs),
+        'cost_neutral_rent': break_even_rent(mortgage, **income_kwargs),
+        'stamp_duty': duty,
+        'total_capital_required': deposit + duty,
+        'valuation': houseprice + capital_growth,
+        'capital_growth': capital_growth,
+        'mortgage_balance': balance,
+        'equity': houseprice + capital_growth - balance,
+    }
+
+
+def _chunks(properties, chunk_size):
+    for start in range(0, len(properties), chunk_size):
+        chunk = properties.iloc[start:start + chunk_size]
+        yield {column: chunk[column].to_numpy() for column in chunk.columns}
+
+
+def evaluate_portfolio(properties, chunk_size=DEFAULT_CHUNK_SIZE, max_workers=None, stamp_duty_table=None):
+    """Evaluate every property in a table and return a DataFrame of outputs.
+
+    ``properties`` is a DataFrame (or anything ``pd.DataFrame`` accepts) with
+    one row per property. Tables larger than ``chunk_size`` rows are split and
+    evaluated across a process pool of ``max_workers`` processes; pass
+    ``max_workers=1`` to stay in-process. ``stamp_duty_table`` selects the
+    SDLT rates (see btl_model.stamp_duty.STAMP_DUTY_TABLES).
+    """
+    properties = pd.DataFrame(properties)
+    evaluate = partial(evaluate_columns, stamp_duty_table=stamp_duty_table)
+    if len(properties) <= chunk_size or max_workers == 1:
+        results = [evaluate(chunk) for chunk in _chunks(properties, chunk_size)]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(evaluate, _chunks(properties, chunk_size)))
+
+    outputs = {
+        column: np.concatenate([result[column] for result in results]) if results else np.empty(0)
+        for column in OUTPUT_COLUMNS
+    }
+    return pd.DataFrame(outputs, index=properties.index)
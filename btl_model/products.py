@@ -0,0 +1,161 @@
+"""Compare a table of mortgage products against one deal.
+
+A product table has one row per product. Rates, fees and limits are in %
+as lenders quote them: ``rate`` 4.79, ``max_ltv`` 75, ``icr`` 125 (rent as
+a percentage of the interest at the stressed rate). Every product is
+evaluated against the deal in one vectorised pass: whether the lender would
+offer it (loan to value, ICR and who may borrow), the monthly repayment and
+net income it gives, and its true cost over the fixed period, the interest
+paid plus fees, which is what products are ranked on.
+"""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from btl_model.income import PERSONAL, TAX_TREATMENTS, net_inc
+from btl_model.mortgage import MortgageTerms, monthly_payment, outstanding_balance
+
+DEFAULT_PATH = os.environ.get('BTL_MORTGAGE_PRODUCTS', 'mortgage_products.csv')
+
+# Fixed period in years; the arrangement fee in £
+REQUIRED_COLUMNS = ('name', 'rate', 'fixed_period', 'arrangement_fee')
+
+OPTIONAL_COLUMNS = {
+    'lender': '',
+    # A further fee as a % of the loan
+    'fee_percent': 0.0,
+    'max_ltv': 75.0,
+    'repayment_type': 'repayment',
+    'icr': 125.0,
+    # The rate the ICR is tested at, if higher than the product's own rate
+    'icr_stress_rate': np.nan,
+    # 'Any', or the tax treatment the product is limited to
+    'ownership': 'Any',
+}
+
+REPAYMENT_TYPES = ('repayment', 'interest_only')
+
+OUTPUT_COLUMNS = (
+    'eligible', 'reason', 'rank', 'loan', 'ltv', 'fees', 'monthly_payment', 'net_income', 'icr_cover',
+    'interest_over_fix', 'true_cost', 'annual_cost', 'balance_after_fix',
+)
+
+
+def load_products(source):
+    """Read a product table from a CSV, Parquet or JSON Lines file (a path or an open file).
+
+    Missing optional columns are filled with their defaults; raises
+    ValueError if a required column is missing or a value is invalid.
+    """
+    name = str(getattr(source, 'name', source)).lower()
+    if name.endswith('.parquet'):
+        products = pd.read_parquet(source)
+    elif name.endswith(('.jsonl', '.json')):
+        products = pd.read_json(source, lines=name.endswith('.jsonl'))
+    else:
+        products = pd.read_csv(source)
+    return normalise_products(products)
+
+
+def _labels(values, allowed, description, clean):
+    # Tables have a handful of distinct labels, so clean each once and map back
+    codes, uniques = pd.factorize(values.astype(str))
+    cleaned = np.array([clean(label) for label in uniques] or [''], dtype=object)
+    unknown = [label for label in cleaned[:len(uniques)] if label not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown {description}: {unknown[0]!r}")
+    return cleaned[codes]
+
+
+def normalise_products(products):
+    """A copy of ``products`` with defaults filled in and values checked."""
+    missing = [column for column in REQUIRED_COLUMNS if column not in products]
+    if missing:
+        raise ValueError(f"Missing product columns: {', '.join(missing)}")
+    products = products.copy()
+    for column, default in OPTIONAL_COLUMNS.items():
+        if column not in products:
+            products[column] = default
+        elif not isinstance(default, str):
+            products[column] = products[column].fillna(default)
+    for column in ('rate', 'fixed_period', 'arrangement_fee', 'fee_percent', 'max_ltv', 'icr', 'icr_stress_rate'):
+        try:
+            products[column] = pd.to_numeric(products[column]).astype(float)
+        except (TypeError, ValueError):
+            raise ValueError(f"Product column {column!r} must be numeric") from None
+    if products[['rate', 'fixed_period', 'arrangement_fee']].isna().any().any():
+        raise ValueError("Every product needs a rate, fixed period and arrangement fee")
+
+    products['repayment_type'] = _labels(
+        products['repayment_type'].fillna('repayment'), REPAYMENT_TYPES, 'repayment type',
+        lambda label: re.sub(r'[\s-]+', '_', label.strip().lower()),
+    )
+    products['ownership'] = _labels(products['ownership'].fillna('Any'), ('Any',) + TAX_TREATMENTS, 'ownership', str.strip)
+    products['name'] = products['name'].astype(str)
+    products['lender'] = products['lender'].fillna('').astype(str)
+    return products.reset_index(drop=True)
+
+
+def compare_products(products, houseprice, deposit, rent, length_of_mortgage, tax_treatment=PERSONAL, tax_rate=0.0,
+                     management_charge_percent=0, fixed_costs=0, add_fee_to_loan=False, eligible_only=False):
+    """Evaluate every product against one deal, cheapest eligible products first.
+
+    ``products`` is a table as returned by ``load_products`` (it is
+    normalised here too). Fees are paid up front unless ``add_fee_to_loan``,
+    in which case they are borrowed and accrue interest; either way they
+    count in full towards ``true_cost``. ``rank`` orders the eligible
+    products by ``annual_cost``, the true cost per year of the fixed period,
+    so that a two-year fix compares fairly with a five-year one.
+    ``net_income`` is the first month's, from the same model as the pages.
+    """
+    products = normalise_products(products)
+    rate = products['rate'].to_numpy()
+    interest_only = (products['repayment_type'] == 'interest_only').to_numpy()
+
+    fees = products['arrangement_fee'].to_numpy() + products['fee_percent'].to_numpy() / 100 * (houseprice - deposit)
+    loan = houseprice - deposit + (fees if add_fee_to_loan else 0.0)
+    ltv = loan / houseprice if houseprice else np.full(len(products), np.inf)
+
+    # Months of the fix, and the balance at its end
+    term_months = length_of_mortgage * 12
+    months = np.minimum(products['fixed_period'].to_numpy() * 12, term_months)
+    monthly_rate = rate / 1200
+    payment = np.where(interest_only, loan * monthly_rate, monthly_payment(loan, rate, length_of_mortgage))
+    balance_after_fix = np.where(
+        interest_only, loan, outstanding_balance(loan, rate, length_of_mortgage, np.maximum(months, 0))
+    )
+    interest_over_fix = payment * months - (loan - balance_after_fix)
+    true_cost = interest_over_fix + fees
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annual_cost = true_cost / (months / 12)
+
+    # Lender checks: loan to value, rent cover at the stressed rate, and who may borrow
+    first_interest = loan * monthly_rate
+    mortgage = MortgageTerms(payment - first_interest, first_interest, payment)
+    net_income = net_inc(rent, mortgage, tax_treatment, tax_rate, management_charge_percent, fixed_costs)
+    stress_rate = np.fmax(rate, products['icr_stress_rate'].to_numpy())
+    with np.errstate(divide='ignore', invalid='ignore'):
+        icr_cover = np.where(stress_rate > 0, rent * 1200 / (loan * stress_rate), np.inf)
+    ownership = products['ownership'].to_numpy()
+    checks = (
+        (ltv * 100 > products['max_ltv'].to_numpy() + 1e-9, "LTV above the product's maximum"),
+        (icr_cover * 100 < products['icr'].to_numpy() - 1e-9, "Rent below the lender's ICR"),
+        ((ownership != 'Any') & (ownership != tax_treatment), f"Not available to {str(tax_treatment).lower()} buyers"),
+        (months <= 0, "No mortgage term"),
+    )
+    reason = np.select([failed for failed, _ in checks], [message for _, message in checks], default='')
+    eligible = reason == ''
+
+    result = products.assign(
+        eligible=eligible, reason=reason, loan=loan, ltv=ltv, fees=fees, monthly_payment=payment,
+        net_income=net_income, icr_cover=icr_cover, interest_over_fix=interest_over_fix, true_cost=true_cost,
+        annual_cost=annual_cost, balance_after_fix=balance_after_fix,
+    )
+    result = result.sort_values(['eligible', 'annual_cost'], ascending=[False, True], kind='stable')
+    result['rank'] = np.where(result['eligible'], np.arange(1, len(result) + 1), np.nan)
+    if eligible_only:
+        result = result[result['eligible']]
+    return result.reset_index(drop=True)
@@ -0,0 +1,84 @@
+"""Year-by-year and month-by-month cash-flow projection.
+
+Combines the amortisation schedule, rent and cost inflation, tax and capital
+growth in a single array pass and returns one columnar DataFrame, so the
+chart and table of a projection come from the same frame.
+"""
+
+import numpy as np
+import pandas as pd
+
+from btl_model.income import EBIT, NOPAT, PERSONAL, net_inc, total_costs
+from btl_model.mortgage import MortgageTerms, amortization_schedule
+
+PROJECTION_COLUMNS = (
+    'rent', 'running_costs', 'mortgage_interest', 'mortgage_capital', 'mortgage_payment',
+    'tax', 'net_income', 'cumulative_net_income', 'balance', 'valuation', 'equity',
+)
+
+# Flows are summed over a year; balances are taken at the end of it.
+_STOCKS = ('cumulative_net_income', 'balance', 'valuation', 'equity')
+
+
+def _mortgage_months(mort_req, interest_rate, length_of_mortgage, months):
+    padded = {name: np.zeros(months) for name in ('payment', 'interest', 'capital', 'balance')}
+    if mort_req > 0 and length_of_mortgage > 0:
+        schedule = amortization_schedule(mort_req, interest_rate, length_of_mortgage)
+        n = min(months, len(schedule.month))
+        for name in padded:
+            padded[name][:n] = getattr(schedule, name)[:n]
+    elif mort_req > 0:
+        padded['balance'][:] = mort_req
+    return padded
+
+
+def project(houseprice, mort_req, rent, interest_rate, length_of_mortgage, years, annual_capital_growth=0,
+            rent_increase=0, cost_inflation=0, tax_treatment=PERSONAL, tax_rate=0.0,
+            management_charge_percent=0, fixed_costs=0, frequency='annual'):
+    """Project rent, costs, mortgage, tax, net income and equity over ``years``.
+
+    Rent and fixed costs are monthly figures that rise by ``rent_increase``
+    and ``cost_inflation`` (% a year) at the start of each year after the
+    first; capital growth compounds monthly so that year-end valuations match
+    ``culm_growth_func``. ``frequency`` is 'annual' (one row per year, flows
+    summed) or 'monthly'.
+    """
+    if frequency not in ('annual', 'monthly'):
+        raise ValueError(f"Unknown frequency: {frequency!r}")
+    months = int(years) * 12
+    month = np.arange(1, months + 1)
+    year = (month - 1) // 12 + 1
+
+    mortgage_months = _mortgage_months(mort_req, interest_rate, length_of_mortgage, months)
+    mortgage = MortgageTerms(mortgage_months['capital'], mortgage_months['interest'], mortgage_months['payment'])
+
+    monthly_rent = rent * (1 + rent_increase / 100) ** (year - 1)
+    monthly_fixed_costs = fixed_costs * (1 + cost_inflation / 100) ** (year - 1)
+    ebit = EBIT(monthly_rent, mortgage, tax_treatment, management_charge_percent, monthly_fixed_costs)
+    nopat = NOPAT(monthly_rent, mortgage, tax_treatment, tax_rate, management_charge_percent, monthly_fixed_costs)
+    net_income = net_inc(monthly_rent, mortgage, tax_treatment, tax_rate, management_charge_percent, monthly_fixed_costs)
+    valuation = houseprice * (1 + annual_capital_growth / 100) ** (month / 12)
+
+    columns = {
+        'rent': monthly_rent,
+        'running_costs': total_costs(monthly_rent, management_charge_percent, monthly_fixed_costs),
+        'mortgage_interest': mortgage.interest,
+        'mortgage_capital': mortgage.principle,
+        'mortgage_payment': mortgage.repay,
+        'tax': ebit - nopat,
+        'net_income': net_income,
+        'cumulative_net_income': np.cumsum(net_income),
+        'balance': mortgage_months['balance'],
+        'valuation': valuation,
+        'equity': valuation - mortgage_months['balance'],
+    }
+
+    if frequency == 'monthly':
+        frame = pd.DataFrame({'year': year, 'month': month, **columns})
+    else:
+        annual = {
+            name: values.reshape(-1, 12)[:, -1] if name in _STOCKS else values.reshape(-1, 12).sum(axis=1)
+            for name, values in columns.items()
+        }
+        frame = pd.DataFrame({'year': np.arange(1, int(years) + 1), **annual})
+    return frame
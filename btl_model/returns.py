@@ -0,0 +1,119 @@
+"""Investment return metrics over batches of cash-flow scenarios.
+
+Cash flows are (scenarios x periods) matrices with period 0 undiscounted, as
+for ``npf.npv``/``npf.irr``. Every metric is computed for all scenarios at
+once; IRR uses vectorised Newton steps with a bisection fallback rather than
+a polynomial root solve per scenario.
+"""
+
+import numpy as np
+
+# IRR search bracket for the bisection fallback
+IRR_LOWER = -0.99
+IRR_UPPER = 10.0
+
+
+def _as_matrix(cashflows):
+    cashflows = np.asarray(cashflows, dtype=float)
+    return cashflows, cashflows.ndim == 1
+
+
+def _npv_and_derivative(rate, cashflows):
+    # Horner's scheme in x = 1 / (1 + rate): one pass over periods, no powers.
+    x = 1 / (1 + rate)
+    value = np.zeros_like(x)
+    derivative = np.zeros_like(x)
+    for column in range(cashflows.shape[1] - 1, -1, -1):
+        derivative = derivative * x + value
+        value = value * x + cashflows[:, column]
+    # d(npv)/d(rate) = d(npv)/dx * dx/d(rate), with dx/d(rate) = -x^2
+    return value, -derivative * x * x
+
+
+def npv(rate, cashflows):
+    """Net present value at ``rate`` (a fraction, scalar or per scenario)."""
+    cashflows, single = _as_matrix(cashflows)
+    matrix = np.atleast_2d(cashflows)
+    rate = np.broadcast_to(np.asarray(rate, dtype=float), matrix.shape[:1])
+    value = _npv_and_derivative(rate, matrix)[0]
+    return value[0] if single else value
+
+
+def irr(cashflows, guess=0.1, tol=1e-10, max_iter=50):
+    """Internal rate of return for each scenario; NaN where there is none.
+
+    Newton's method runs on every scenario together; any that fail to
+    converge inside the search bracket are finished by bisection, provided
+    NPV changes sign across it.
+    """
+    cashflows, single = _as_matrix(cashflows)
+    matrix = np.atleast_2d(cashflows)
+    n = matrix.shape[0]
+    rate = np.full(n, float(guess))
+    converged = np.zeros(n, dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for _ in range(max_iter):
+            value, derivative = _npv_and_derivative(rate, matrix)
+            step = value / derivative
+            rate = np.where(converged, rate, rate - step)
+            converged |= np.abs(step) <= tol * np.maximum(np.abs(rate), 1.0)
+            if converged.all():
+                break
+        good = converged & np.isfinite(rate) & (rate > IRR_LOWER) & (rate < IRR_UPPER)
+
+        if not good.all():
+            todo = ~good
+            low = np.full(n, IRR_LOWER)
+            high = np.full(n, IRR_UPPER)
+            f_low = _npv_and_derivative(low, matrix)[0]
+            f_high = _npv_and_derivative(high, matrix)[0]
+            bracketed = todo & (np.sign(f_low) != np.sign(f_high))
+            for _ in range(200):
+                mid = (low + high) / 2
+                f_mid = _npv_and_derivative(mid, matrix)[0]
+                same = np.sign(f_mid) == np.sign(f_low)
+                low = np.where(bracketed & same, mid, low)
+                f_low = np.where(bracketed & same, f_mid, f_low)
+                high = np.where(bracketed & ~same, mid, high)
+                if np.all(high[bracketed] - low[bracketed] <= tol):
+                    break
+            rate = np.where(good, rate, np.where(bracketed, (low + high) / 2, np.nan))
+    return rate[0] if single else rate
+
+
+def cash_on_cash(annual_cash_flow, cash_invested):
+    """Annual pre-sale cash return as a fraction of the cash put in."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.asarray(annual_cash_flow, dtype=float) / np.asarray(cash_invested, dtype=float)
+
+
+def payback_period(cashflows):
+    """First period in which cumulative cash flow turns non-negative (NaN if never)."""
+    cashflows, single = _as_matrix(cashflows)
+    cumulative = np.cumsum(np.atleast_2d(cashflows), axis=1)
+    paid_back = cumulative >= 0
+    period = np.where(paid_back.any(axis=1), paid_back.argmax(axis=1), np.nan)
+    return period[0] if single else period
+
+
+def sale_proceeds(valuation, balance, purchase_price, capital_gains_tax_rate, selling_costs=0):
+    """Cash released by a sale: valuation less the mortgage, costs and tax on the gain.
+
+    ``capital_gains_tax_rate`` is a fraction (corporation tax for a company).
+    """
+    gain = np.maximum(np.asarray(valuation) - purchase_price - selling_costs, 0)
+    return valuation - balance - selling_costs - gain * capital_gains_tax_rate
+
+
+def investment_cash_flows(initial_outlay, annual_net_income, proceeds):
+    """(scenarios x years + 1) cash flows: outlay, yearly income, income plus sale.
+
+    ``initial_outlay`` (deposit plus stamp duty and fees) and ``proceeds`` are
+    per scenario; ``annual_net_income`` is (scenarios x years), e.g. the
+    ``net_income`` column of an annual projection.
+    """
+    income = np.atleast_2d(np.asarray(annual_net_income, dtype=float))
+    outlay = np.broadcast_to(np.asarray(initial_outlay, dtype=float), income.shape[:1])
+    cashflows = np.concatenate([-outlay[:, np.newaxis], income], axis=1)
+    cashflows[:, -1] += proceeds
+    return cashflows
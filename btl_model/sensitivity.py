@@ -0,0 +1,137 @@
+"""Sensitivity analysis of net income and yield to the Buy to Let inputs.
+
+A scenario is a dict of the Buy to Let page inputs. Grids over two inputs are
+evaluated by broadcasting (no Python loops) and cached per input hash, and a
+tornado ranking swings each input in turn to show which move net income the
+most.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from btl_model.income import PERSONAL, net_inc
+from btl_model.mortgage import first_month_terms
+
+# Numeric scenario inputs and their defaults. Monthly costs are in £,
+# percentages in %; void_rate is the % of rent lost to empty months.
+SCENARIO_INPUTS = {
+    'houseprice': 0.0,
+    'deposit': 0.0,
+    'rent': 0.0,
+    'service_charge': 0.0,
+    'management_charge_percent': 0.0,
+    'maintenance_cost': 0.0,
+    'landlord_insurance': 0.0,
+    'building_insurance': 0.0,
+    'accountancy_cost': 0.0,
+    'interest_rate': 0.0,
+    'length_of_mortgage': 25.0,
+    'void_rate': 0.0,
+    'tax_rate': 0.0,
+}
+
+METRICS = ('net_income', 'net_yield')
+
+TornadoBar = namedtuple('TornadoBar', ['input', 'low_value', 'high_value', 'low_result', 'high_result', 'swing'])
+
+
+def _scenario(inputs):
+    scenario = dict(SCENARIO_INPUTS)
+    scenario['tax_treatment'] = PERSONAL
+    unknown = set(inputs) - set(scenario)
+    if unknown:
+        raise ValueError(f"Unknown scenario inputs: {', '.join(sorted(unknown))}")
+    scenario.update(inputs)
+    return scenario
+
+
+def scenario_metrics(inputs):
+    """Monthly net income and annual net yield for a scenario.
+
+    Any numeric input may be an array; all inputs broadcast together.
+    """
+    s = _scenario(inputs)
+    mortgage = first_month_terms(s['houseprice'] - s['deposit'], s['interest_rate'], s['length_of_mortgage'])
+    collected_rent = s['rent'] * (1 - np.asarray(s['void_rate']) / 100)
+    fixed_costs = (
+        s['service_charge'] + s['maintenance_cost'] + s['landlord_insurance']
+        + s['building_insurance'] + s['accountancy_cost']
+    )
+    net_income = net_inc(collected_rent, mortgage, s['tax_treatment'], s['tax_rate'],
+                         s['management_charge_percent'], fixed_costs)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        net_yield = 12 * net_income / s['houseprice']
+    return {'net_income': net_income, 'net_yield': net_yield}
+
+
+def _freeze(inputs):
+    return tuple(sorted(inputs.items()))
+
+
+@lru_cache(maxsize=64)
+def _cached_grid(frozen_inputs, x_name, x_range, y_name, y_range, metric):
+    x = np.linspace(*x_range)
+    y = np.linspace(*y_range)
+    inputs = dict(frozen_inputs)
+    inputs[x_name] = x[np.newaxis, :]
+    inputs[y_name] = y[:, np.newaxis]
+    z = np.broadcast_to(scenario_metrics(inputs)[metric], (len(y), len(x))).copy()
+    for array in (x, y, z):
+        array.flags.writeable = False
+    return x, y, z
+
+
+def sensitivity_grid(inputs, x_name, x_range, y_name, y_range, metric='net_income'):
+    """Evaluate ``metric`` over a grid of two inputs.
+
+    ``x_range``/``y_range`` are ``(start, stop, num)`` as for ``np.linspace``.
+    Returns ``(x, y, z)`` with ``z`` shaped (len(y), len(x)). Results are
+    cached per scenario, so re-requesting a grid is a lookup; the returned
+    arrays are read-only.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric!r}")
+    if x_name == y_name:
+        raise ValueError("The grid needs two different inputs")
+    _scenario({x_name: 0, y_name: 0})
+    x_range = (float(x_range[0]), float(x_range[1]), int(x_range[2]))
+    y_range = (float(y_range[0]), float(y_range[1]), int(y_range[2]))
+    return _cached_grid(_freeze(inputs), x_name, x_range, y_name, y_range, metric)
+
+
+def tornado(inputs, swing=0.1, swings=None, metric='net_income'):
+    """Rank inputs by how far they move ``metric`` when swung up and down.
+
+    Each numeric input is moved by ``swing`` (a fraction of its value) either
+    way; ``swings`` maps input names to absolute ``(low, high)`` values to
+    use instead, e.g. for inputs that are currently zero. All 2 x inputs
+    scenarios are evaluated in one vectorised call. Returns TornadoBar rows,
+    largest swing first.
+    """
+    scenario = _scenario(inputs)
+    swings = dict(swings or {})
+    names = [name for name in SCENARIO_INPUTS if name in swings or scenario[name] != 0]
+    if not names:
+        return []
+
+    lows = np.array([swings[name][0] if name in swings else scenario[name] * (1 - swing) for name in names])
+    highs = np.array([swings[name][1] if name in swings else scenario[name] * (1 + swing) for name in names])
+
+    # One row per (input, direction): every input at its base value except
+    # the one being swung.
+    n = len(names)
+    batch = {name: np.full(2 * n, float(scenario[name])) for name in SCENARIO_INPUTS}
+    for i, name in enumerate(names):
+        batch[name][i] = lows[i]
+        batch[name][n + i] = highs[i]
+    batch['tax_treatment'] = scenario['tax_treatment']
+    results = scenario_metrics(batch)[metric]
+
+    bars = [
+        TornadoBar(name, float(lows[i]), float(highs[i]), float(results[i]), float(results[n + i]),
+                   float(abs(results[n + i] - results[i])))
+        for i, name in enumerate(names)
+    ]
+    return sorted(bars, key=lambda bar: bar.swing, reverse=True)
@@ -0,0 +1,293 @@
+"""Local HTTP JSON service for the calculation core.
+
+    python -m btl_model.service --port 8000 --workers 4
+
+Every endpoint takes a JSON object by POST, with the column names used by
+``btl_model.batch``, and returns the outputs as a JSON object:
+
+    /mortgage      principal, interest_rate, length_of_mortgage
+    /stamp-duty    houseprice [, additional_property, first_time_buyer, non_resident]
+    /buy-to-let    a btl_model.portfolio row (all its outputs)
+    /net-income    a btl_model.portfolio row (net income only)
+    /break-even    a btl_model.portfolio row (cost-neutral rent only)
+    /comparison    a btl_model.comparison row (personal vs company)
+    /batch         {"endpoint": "/buy-to-let", "scenarios": [...]}
+
+Any request may add ``stamp_duty_table``. ``/batch`` returns
+``{"results": [...], "errors": [...]}``, each entry carrying the scenario's
+``index``. ``GET /health`` answers ``{"status": "ok"}``.
+
+The server is a single asyncio event loop with HTTP/1.1 keep-alive. Small
+requests are evaluated inline, which takes microseconds with the vectorised
+model; batches of ``POOL_THRESHOLD`` scenarios or more are split into chunks
+and evaluated on a process pool, so they never stall other connections.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from btl_model.batch import MODELS, Model, RowError, parse_chunk, parse_row
+from btl_model.mortgage import first_month_terms
+from btl_model.stamp_duty import STAMP_DUTY_TABLES, sdlt
+
+# Batches at least this long are evaluated on the process pool
+POOL_THRESHOLD = 2_000
+POOL_CHUNK_SIZE = 10_000
+
+MAX_BODY = 64 * 1024 * 1024
+MAX_BATCH = 1_000_000
+
+
+def evaluate_mortgage(columns, stamp_duty_table=None):
+    mortgage = first_month_terms(columns['principal'], columns['interest_rate'], columns['length_of_mortgage'])
+    return {'monthly_repayment': mortgage.repay, 'mortgage_interest': mortgage.interest, 'mortgage_capital': mortgage.principle}
+
+
+def evaluate_stamp_duty(columns, stamp_duty_table=None):
+    return {'stamp_duty': sdlt(
+        columns['houseprice'],
+        additional_property=columns['additional_property'].astype(bool),
+        first_time_buyer=columns['first_time_buyer'].astype(bool),
+        non_resident=columns['non_resident'].astype(bool),
+        table=stamp_duty_table,
+    )}
+
+
+MORTGAGE = Model(
+    evaluate_mortgage, ('principal', 'interest_rate', 'length_of_mortgage'), {},
+    ('monthly_repayment', 'mortgage_interest', 'mortgage_capital'),
+)
+STAMP_DUTY = Model(
+    evaluate_stamp_duty, ('houseprice',),
+    {'additional_property': False, 'first_time_buyer': False, 'non_resident': False}, ('stamp_duty',),
+)
+
+# Endpoint: (model, outputs returned)
+ENDPOINTS = {
+    '/mortgage': (MORTGAGE, MORTGAGE.outputs),
+    '/stamp-duty': (STAMP_DUTY, STAMP_DUTY.outputs),
+    '/buy-to-let': (MODELS['buy_to_let'], MODELS['buy_to_let'].outputs),
+    '/net-income': (MODELS['buy_to_let'], ('monthly_repayment', 'net_income')),
+    '/break-even': (MODELS['buy_to_let'], ('monthly_repayment', 'cost_neutral_rent')),
+    '/comparison': (MODELS['tax_comparison'], MODELS['tax_comparison'].outputs),
+}
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large'}
+
+
+class RequestError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _error(message):
+    return json.dumps({'error': message})
+
+
+def _stamp_duty_table(payload):
+    table = payload.get('stamp_duty_table')
+    if table is not None and (not isinstance(table, str) or table not in STAMP_DUTY_TABLES):
+        raise RequestError(400, f"Unknown stamp_duty_table {table!r}; expected one of {', '.join(STAMP_DUTY_TABLES)}")
+    return table
+
+
+def _results_json(indices, outputs, names):
+    # NaN and infinities (which JSON cannot hold) become null
+    frame = pd.DataFrame({'index': indices, **{name: outputs[name] for name in names}})
+    return frame.to_json(orient='records', double_precision=15)
+
+
+class CalculationService:
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self.pool = None
+        # Single requests waiting to be evaluated together, per (endpoint, table)
+        self.pending = {}
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    async def _evaluate(self, model, columns, n, table):
+        evaluate = partial(model.evaluate, stamp_duty_table=table)
+        if n < POOL_THRESHOLD or self.max_workers == 1:
+            return evaluate(columns)
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        loop = asyncio.get_running_loop()
+        starts = range(0, n, POOL_CHUNK_SIZE)
+        parts = await asyncio.gather(*(
+            loop.run_in_executor(self.pool, evaluate, {name: values[start:start + POOL_CHUNK_SIZE] for name, values in columns.items()})
+            for start in starts
+        ))
+        return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+    def _flush(self, key):
+        model, table = ENDPOINTS[key[0]][0], key[1]
+        self._resolve(model, table, self.pending.pop(key))
+
+    def _resolve(self, model, table, pending):
+        columns = {name: np.array([row[name] for row, _ in pending]) for name in pending[0][0]}
+        try:
+            outputs = model.evaluate(columns, stamp_duty_table=table)
+        except Exception as error:
+            if len(pending) == 1:
+                pending[0][1].set_exception(error)
+                return
+            # Evaluate the requests one by one, so only the one that failed gets the error
+            for item in pending:
+                self._resolve(model, table, [item])
+            return
+        for i, (_, future) in enumerate(pending):
+            future.set_result({name: float(values[i]) for name, values in outputs.items()})
+
+    async def single(self, path, payload):
+        """Outputs for one scenario.
+
+        Requests for the same endpoint that arrive while the event loop is
+        busy are queued and evaluated as one vectorised call on the next
+        iteration, so under load the per-request cost falls towards the
+        per-row cost of a batch.
+        """
+        model, names = ENDPOINTS[path]
+        if not isinstance(payload, dict):
+            raise RequestError(400, "Expected a JSON object")
+        # One row is quicker to validate with parse_row than with a chunk's DataFrame
+        row = parse_row(payload, model)
+        key = (path, _stamp_duty_table(payload))
+        future = asyncio.get_running_loop().create_future()
+        if key not in self.pending:
+            self.pending[key] = []
+            asyncio.get_running_loop().call_soon(self._flush, key)
+        self.pending[key].append((row, future))
+        values = await future
+        return json.dumps({name: values[name] if math.isfinite(values[name]) else None for name in names})
+
+    async def batch(self, payload):
+        if not isinstance(payload, dict) or not isinstance(payload.get('scenarios'), list):
+            raise RequestError(400, 'Expected {"endpoint": ..., "scenarios": [...]}')
+        endpoint = payload.get('endpoint', '/buy-to-let')
+        if not isinstance(endpoint, str) or endpoint not in ENDPOINTS:
+            raise RequestError(400, f"Unknown endpoint {endpoint!r}")
+        scenarios = payload['scenarios']
+        if len(scenarios) > MAX_BATCH:
+            raise RequestError(413, f"At most {MAX_BATCH:,} scenarios per batch")
+        model, names = ENDPOINTS[endpoint]
+        table = _stamp_duty_table(payload)
+
+        errors = []
+        indices, _, columns = parse_chunk(
+            list(enumerate(scenarios)), model,
+            lambda index, message, record: errors.append({'index': index, 'error': message}),
+        )
+        outputs = await self._evaluate(model, columns, len(indices), table) if indices else {name: [] for name in names}
+        return f'{{"results": {_results_json(indices, outputs, names)}, "errors": {json.dumps(errors)}}}'
+
+    async def dispatch(self, method, path, body):
+        """``(status, JSON text)`` for one request."""
+        path = path.split('?', 1)[0]
+        if path == '/health':
+            return 200, '{"status": "ok"}'
+        if path != '/batch' and path not in ENDPOINTS:
+            return 404, _error(f"No endpoint {path}")
+        if method != 'POST':
+            return 405, _error("Use POST")
+        try:
+            try:
+                payload = json.loads(body or b'null')
+            except ValueError as error:
+                raise RequestError(400, f"Invalid JSON: {error}") from None
+            if path == '/batch':
+                return 200, await self.batch(payload)
+            return 200, await self.single(path, payload)
+        except RequestError as error:
+            return error.status, _error(str(error))
+        except (RowError, ValueError) as error:
+            return 400, _error(str(error))
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, _error("Malformed request line"), keep_alive=False)
+                    break
+                headers = {}
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = headers.get('content-length') or '0'
+                if not (length.isascii() and length.isdigit()):
+                    await self._respond(writer, 400, _error("Invalid Content-Length"), keep_alive=False)
+                    break
+                length = int(length)
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, _error("Request body too large"), keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                status, text = await self.dispatch(method, path, body)
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' or (version == 'HTTP/1.1' and connection != 'close')
+                await self._respond(writer, status, text, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, text, keep_alive):
+        body = text.encode()
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+
+async def serve(host='127.0.0.1', port=8000, max_workers=None):
+    service = CalculationService(max_workers)
+    server = await asyncio.start_server(service.handle, host, port, limit=MAX_BODY)
+    print(f"Serving on http://{host}:{port}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="Processes for large batches; 1 evaluates everything in the event loop")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
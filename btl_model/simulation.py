@@ -0,0 +1,172 @@
+"""Monte Carlo simulation of capital growth, rent growth and interest rates.
+
+Paths are drawn as (paths x years) matrices in one vectorised step per chunk
+from a seeded generator. Percentiles are accumulated from fixed-bin
+histograms chunk by chunk, so memory is bounded by ``chunk_size`` rather than
+the number of paths.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from btl_model.income import PERSONAL, net_inc
+from btl_model.mortgage import MortgageTerms, monthly_payment
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+SimulationSummary = namedtuple(
+    'SimulationSummary',
+    ['years', 'percentiles', 'valuation', 'equity', 'cumulative_net_income', 'mean'],
+)
+
+
+class StreamingQuantiles:
+    """Approximate per-column quantiles over rows that arrive in chunks.
+
+    Bin edges are fixed from the first chunk (padded either side); values
+    outside them fall in the end bins, and the exact minimum and maximum are
+    tracked so the extreme percentiles stay bounded.
+    """
+
+    def __init__(self, bins=4096, padding=0.5):
+        self.bins = bins
+        self.padding = padding
+        self.edges = None
+        self.counts = None
+        self.total = 0
+        self.sum = None
+        self.min = None
+        self.max = None
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        n_rows, n_cols = values.shape
+        if not n_rows:
+            return
+        if self.edges is None:
+            low, high = values.min(axis=0), values.max(axis=0)
+            span = np.maximum(high - low, 1e-9 * np.maximum(np.abs(high), 1.0))
+            low, high = low - span * self.padding, high + span * self.padding
+            self.edges = low[:, None] + (high - low)[:, None] * np.linspace(0, 1, self.bins + 1)
+            self.counts = np.zeros((n_cols, self.bins), dtype=np.int64)
+            self.sum = np.zeros(n_cols)
+            self.min, self.max = values.min(axis=0), values.max(axis=0)
+
+        width = self.edges[:, -1] - self.edges[:, 0]
+        index = ((values - self.edges[:, 0]) / width * self.bins).astype(np.int64)
+        index = np.clip(index, 0, self.bins - 1) + np.arange(n_cols) * self.bins
+        self.counts += np.bincount(index.ravel(), minlength=n_cols * self.bins).reshape(n_cols, self.bins)
+        self.total += n_rows
+        self.sum += values.sum(axis=0)
+        self.min = np.minimum(self.min, values.min(axis=0))
+        self.max = np.maximum(self.max, values.max(axis=0))
+
+    def mean(self):
+        return self.sum / self.total
+
+    def quantiles(self, percentiles):
+        """(len(percentiles) x columns) array, interpolating within bins."""
+        if not self.total:
+            raise ValueError("No values to take quantiles of")
+        cumulative = np.cumsum(self.counts, axis=1)
+        result = np.empty((len(percentiles), self.counts.shape[0]))
+        for i, percentile in enumerate(percentiles):
+            target = percentile / 100 * self.total
+            for column in range(self.counts.shape[0]):
+                bin_index = min(np.searchsorted(cumulative[column], target), self.bins - 1)
+                below = cumulative[column, bin_index - 1] if bin_index else 0
+                in_bin = self.counts[column, bin_index]
+                fraction = (target - below) / in_bin if in_bin else 0.0
+                edges = self.edges[column]
+                result[i, column] = edges[bin_index] + fraction * (edges[bin_index + 1] - edges[bin_index])
+        return np.clip(result, self.min, self.max)
+
+
+def _simulate_chunk(rng, paths, years, houseprice, mort_req, rent, interest_rate, length_of_mortgage,
+                    capital_growth, capital_growth_volatility, rent_growth, rent_growth_volatility,
+                    interest_rate_volatility, income_kwargs):
+    growth = rng.normal(capital_growth, capital_growth_volatility, (paths, years)) / 100
+    valuation = houseprice * np.cumprod(1 + growth, axis=1)
+
+    # Year one rent is the entered rent; later years compound the drawn growth.
+    rent_growth_draws = rng.normal(rent_growth, rent_growth_volatility, (paths, years)) / 100
+    rent_growth_draws[:, 0] = 0
+    monthly_rent = rent * np.cumprod(1 + rent_growth_draws, axis=1)
+
+    # Annual rate changes as a random walk, floored at zero; year one is known.
+    shocks = rng.normal(0, interest_rate_volatility, (paths, years))
+    shocks[:, 0] = 0
+    rates = np.clip(interest_rate + np.cumsum(shocks, axis=1), 0, None)
+
+    balance = np.full(paths, float(mort_req))
+    balances = np.empty((paths, years))
+    net_income = np.empty((paths, years))
+    term_months = length_of_mortgage * 12
+    for year in range(years):
+        # Re-amortise the outstanding balance over the remaining term at this
+        # year's rate, then roll the balance forward twelve months in closed form.
+        remaining = max(term_months - 12 * year, 0)
+        rate = rates[:, year] / 100 / 12
+        months = min(12, remaining)
+        if months:
+            payment = monthly_payment(balance, rates[:, year], remaining / 12)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                compound = (1 + rate) ** months
+                end_balance = np.where(
+                    rate == 0, balance - payment * months, balance * compound - payment * (compound - 1) / rate
+                )
+            end_balance = np.clip(end_balance, 0, None)
+            repaid = payment * months
+            capital = balance - end_balance
+            interest = repaid - capital
+        else:
+            end_balance = capital = interest = repaid = np.zeros(paths)
+
+        mortgage = MortgageTerms(capital / 12, interest / 12, repaid / 12)
+        net_income[:, year] = 12 * net_inc(monthly_rent[:, year], mortgage, **income_kwargs)
+        balances[:, year] = end_balance
+        balance = end_balance
+
+    return valuation, valuation - balances, np.cumsum(net_income, axis=1)
+
+
+def simulate_growth(houseprice, mort_req, rent, interest_rate, length_of_mortgage, years=10, paths=10_000,
+                    capital_growth=3.0, capital_growth_volatility=5.0, rent_growth=2.0, rent_growth_volatility=2.0,
+                    interest_rate_volatility=0.5, tax_treatment=PERSONAL, tax_rate=0.0,
+                    management_charge_percent=0, fixed_costs=0, percentiles=DEFAULT_PERCENTILES,
+                    seed=None, chunk_size=50_000):
+    """Percentile bands of valuation, equity and cumulative net income by year.
+
+    Growth rates, volatilities and ``interest_rate`` are in %, with the
+    volatility of the interest rate being the standard deviation of its
+    year-on-year change. Net income uses the same model as the pages, with
+    each year's mortgage re-amortised at the simulated rate. Paths are
+    processed ``chunk_size`` at a time.
+    """
+    if paths < 1:
+        raise ValueError(f"paths must be at least 1, got {paths}")
+    rng = np.random.default_rng(seed)
+    income_kwargs = dict(
+        tax_treatment=tax_treatment,
+        tax_rate=tax_rate,
+        management_charge_percent=management_charge_percent,
+        fixed_costs=fixed_costs,
+    )
+    stats = [StreamingQuantiles() for _ in range(3)]
+    for start in range(0, paths, chunk_size):
+        chunk = _simulate_chunk(
+            rng, min(chunk_size, paths - start), years, houseprice, mort_req, rent, interest_rate,
+            length_of_mortgage, capital_growth, capital_growth_volatility, rent_growth,
+            rent_growth_volatility, interest_rate_volatility, income_kwargs,
+        )
+        for stat, values in zip(stats, chunk):
+            stat.update(values)
+
+    valuation, equity, cumulative_net_income = (stat.quantiles(percentiles) for stat in stats)
+    mean = {
+        'valuation': stats[0].mean(),
+        'equity': stats[1].mean(),
+        'cumulative_net_income': stats[2].mean(),
+    }
+    return SimulationSummary(np.arange(1, years + 1), tuple(percentiles), valuation, equity, cumulative_net_income, mean)
@@ -0,0 +1,119 @@
+"""Stamp Duty Land Tax (SDLT) calculations.
+
+Rates are held as versioned band tables keyed by the date they took effect.
+Duty is evaluated over arrays of prices with a cumulative-band lookup, so a
+whole portfolio (or millions of rows) is priced in one pass.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+StampDutyTable = namedtuple('StampDutyTable', [
+    'thresholds',                   # lower bound of each band (£)
+    'rates',                        # marginal rate of each band
+    'additional_surcharge',         # extra rate on the whole price for additional properties
+    'additional_minimum',           # additional property rates do not apply below this price
+    'non_resident_surcharge',       # extra rate on the whole price for non-UK residents
+    'first_time_buyer_thresholds',
+    'first_time_buyer_rates',
+    'first_time_buyer_limit',       # relief is not available above this price
+])
+
+STAMP_DUTY_TABLES = {
+    '2022-09-23': StampDutyTable(
+        thresholds=(0, 250000, 925000, 1500000),
+        rates=(0, 0.05, 0.10, 0.12),
+        additional_surcharge=0.03,
+        additional_minimum=40000,
+        non_resident_surcharge=0.02,
+        first_time_buyer_thresholds=(0, 425000),
+        first_time_buyer_rates=(0, 0.05),
+        first_time_buyer_limit=625000,
+    ),
+    '2024-10-31': StampDutyTable(
+        thresholds=(0, 250000, 925000, 1500000),
+        rates=(0, 0.05, 0.10, 0.12),
+        additional_surcharge=0.05,
+        additional_minimum=40000,
+        non_resident_surcharge=0.02,
+        first_time_buyer_thresholds=(0, 425000),
+        first_time_buyer_rates=(0, 0.05),
+        first_time_buyer_limit=625000,
+    ),
+    '2025-04-01': StampDutyTable(
+        thresholds=(0, 125000, 250000, 925000, 1500000),
+        rates=(0, 0.02, 0.05, 0.10, 0.12),
+        additional_surcharge=0.05,
+        additional_minimum=40000,
+        non_resident_surcharge=0.02,
+        first_time_buyer_thresholds=(0, 300000),
+        first_time_buyer_rates=(0, 0.05),
+        first_time_buyer_limit=500000,
+    ),
+}
+
+DEFAULT_TABLE = '2022-09-23'
+
+
+def table_for(date):
+    """Name of the table in force on an ISO ``date`` (e.g. '2024-12-01')."""
+    in_force = [name for name in sorted(STAMP_DUTY_TABLES) if name <= str(date)]
+    if not in_force:
+        raise ValueError(f"No stamp duty table in force on {date}")
+    return in_force[-1]
+
+
+def _get_table(table):
+    if table is None:
+        table = DEFAULT_TABLE
+    if isinstance(table, StampDutyTable):
+        return table
+    try:
+        return STAMP_DUTY_TABLES[table]
+    except KeyError:
+        raise ValueError(f"Unknown stamp duty table: {table!r}") from None
+
+
+def _banded(price, thresholds, rates):
+    thresholds = np.asarray(thresholds, dtype=float)
+    rates = np.asarray(rates, dtype=float)
+    # Duty due on the whole of each band below the one a price falls in
+    cumulative = np.concatenate(([0.0], np.cumsum(np.diff(thresholds) * rates[:-1])))
+    band = np.searchsorted(thresholds, price, side='right') - 1
+    band = np.clip(band, 0, None)
+    return np.where(price > 0, cumulative[band] + (price - thresholds[band]) * rates[band], 0.0)
+
+
+def sdlt(houseprice, additional_property=False, first_time_buyer=False, non_resident=False, table=None):
+    """Stamp duty payable on one price or an array of prices.
+
+    The flags broadcast against ``houseprice``. First-time buyer relief is
+    ignored for additional properties and for prices above the relief limit.
+    ``table`` is a key of STAMP_DUTY_TABLES or a StampDutyTable.
+    """
+    table = _get_table(table)
+    price = np.asarray(houseprice, dtype=float)
+    additional = np.asarray(additional_property, dtype=bool) & (price >= table.additional_minimum)
+    relief = (
+        np.asarray(first_time_buyer, dtype=bool)
+        & ~np.asarray(additional_property, dtype=bool)
+        & (price <= table.first_time_buyer_limit)
+    )
+
+    duty = _banded(price, table.thresholds, table.rates)
+    if relief.any():
+        duty = np.where(relief, _banded(price, table.first_time_buyer_thresholds, table.first_time_buyer_rates), duty)
+    duty = duty + price * (
+        np.where(additional, table.additional_surcharge, 0.0)
+        + np.where(np.asarray(non_resident, dtype=bool), table.non_resident_surcharge, 0.0)
+    )
+    return duty[()] if duty.ndim == 0 else duty
+
+
+def stamp_duty(houseprice, table=None):
+    return sdlt(houseprice, table=table)
+
+
+def stamp_duty_additional(houseprice, table=None):
+    return sdlt(houseprice, additional_property=True, table=table)
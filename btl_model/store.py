@@ -0,0 +1,175 @@
+"""SQLite store for saved scenarios.
+
+A scenario is the full set of inputs that produced it plus the computed
+outputs, both kept as JSON. Rows are de-duplicated on a hash of that content
+per user (saving the same scenario again only refreshes its name and date),
+and the key metrics are copied into indexed columns so that listing and
+filtering thousands of scenarios never has to parse the JSON.
+
+The database runs in WAL mode and every call opens its own short-lived
+connection, so any number of sessions and processes can share one file.
+"""
+
+import datetime
+import hashlib
+import json
+import math
+import os
+import sqlite3
+from collections import namedtuple
+from contextlib import closing, contextmanager
+
+DEFAULT_PATH = os.environ.get('BTL_SCENARIO_DB', 'scenarios.db')
+
+# Indexed copies of key figures, taken from the outputs (or failing that the inputs)
+METRIC_COLUMNS = ('houseprice', 'rent', 'net_income', 'break_even_rent', 'total_capital', 'irr', 'npv')
+
+Scenario = namedtuple('Scenario', ('id', 'user', 'name', 'saved_at', 'inputs', 'outputs'))
+ScenarioSummary = namedtuple('ScenarioSummary', ('id', 'user', 'name', 'saved_at') + METRIC_COLUMNS)
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL,
+    name TEXT,
+    content_hash TEXT NOT NULL,
+    saved_at TEXT NOT NULL,
+    {', '.join(f'{column} REAL' for column in METRIC_COLUMNS)},
+    inputs TEXT NOT NULL,
+    outputs TEXT NOT NULL,
+    UNIQUE (user, content_hash)
+);
+CREATE INDEX IF NOT EXISTS scenarios_saved_at ON scenarios (saved_at);
+CREATE INDEX IF NOT EXISTS scenarios_user_saved_at ON scenarios (user, saved_at);
+{''.join(f'CREATE INDEX IF NOT EXISTS scenarios_user_{column} ON scenarios (user, {column});' for column in METRIC_COLUMNS)}
+"""
+
+
+def _to_json(value):
+    # NumPy scalars and arrays are stored as plain numbers and lists
+    return json.dumps(value, sort_keys=True, default=lambda v: v.tolist())
+
+
+def _metric(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def content_hash(inputs, outputs):
+    """Digest identifying a scenario by its inputs and outputs."""
+    return hashlib.sha256(_to_json({'inputs': inputs, 'outputs': outputs}).encode()).hexdigest()
+
+
+class ScenarioStore:
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # Commits (or rolls back) on exit and always closes
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with conn:
+                yield conn
+
+    def save(self, inputs, outputs, user='anonymous', name=None):
+        """Save a scenario and return its id; an identical one is updated instead."""
+        digest = content_hash(inputs, outputs)
+        metrics = [_metric(outputs.get(column, inputs.get(column))) for column in METRIC_COLUMNS]
+        saved_at = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+        with self._connect() as conn:
+            conn.execute(
+                f"""INSERT INTO scenarios (user, name, content_hash, saved_at, {', '.join(METRIC_COLUMNS)}, inputs, outputs)
+                    VALUES ({', '.join('?' * (len(METRIC_COLUMNS) + 6))})
+                    ON CONFLICT (user, content_hash) DO UPDATE SET
+                        name = COALESCE(excluded.name, name), saved_at = excluded.saved_at""",
+                (user, name, digest, saved_at, *metrics, _to_json(inputs), _to_json(outputs)),
+            )
+            return conn.execute(
+                'SELECT id FROM scenarios WHERE user = ? AND content_hash = ?', (user, digest)
+            ).fetchone()[0]
+
+    def load(self, scenario_id):
+        """The Scenario with id ``scenario_id``; raises KeyError if there is none."""
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT id, user, name, saved_at, inputs, outputs FROM scenarios WHERE id = ?', (scenario_id,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(f"No saved scenario with id {scenario_id}")
+        return Scenario(*row[:4], json.loads(row[4]), json.loads(row[5]))
+
+    def delete(self, scenario_id, user):
+        """Delete ``user``'s scenario ``scenario_id``; returns whether there was one."""
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM scenarios WHERE id = ? AND user = ?', (scenario_id, user)).rowcount > 0
+
+    def _where(self, user, since, until, ranges):
+        clauses, params = [], []
+        if user is not None:
+            clauses.append('user = ?')
+            params.append(user)
+        if since is not None:
+            clauses.append('saved_at >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('saved_at < ?')
+            params.append(until)
+        for column, (low, high) in (ranges or {}).items():
+            if column not in METRIC_COLUMNS:
+                raise ValueError(f"Unknown metric: {column!r}")
+            if low is not None:
+                clauses.append(f'{column} >= ?')
+                params.append(low)
+            if high is not None:
+                clauses.append(f'{column} <= ?')
+                params.append(high)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def list_scenarios(self, user=None, since=None, until=None, ranges=None, order_by='saved_at',
+                       descending=True, limit=100, offset=0):
+        """Summaries (without inputs and outputs) of the matching scenarios.
+
+        ``since``/``until`` are ISO dates or timestamps (UTC); ``ranges`` maps
+        metric columns to ``(low, high)`` bounds, either of which may be None.
+        """
+        if order_by not in ('saved_at', 'name') + METRIC_COLUMNS:
+            raise ValueError(f"Cannot order by {order_by!r}")
+        where, params = self._where(user, since, until, ranges)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"""SELECT id, user, name, saved_at, {', '.join(METRIC_COLUMNS)} FROM scenarios{where}
+                    ORDER BY {order_by} {'DESC' if descending else 'ASC'}, id LIMIT ? OFFSET ?""",
+                (*params, limit, offset),
+            ).fetchall()
+        return [ScenarioSummary(*row) for row in rows]
+
+    def count(self, user=None, since=None, until=None, ranges=None):
+        where, params = self._where(user, since, until, ranges)
+        with self._connect() as conn:
+            return conn.execute(f'SELECT COUNT(*) FROM scenarios{where}', params).fetchone()[0]
+
+    def export_jsonl(self, file, user=None, since=None, until=None, ranges=None, batch_size=1000):
+        """Stream the matching scenarios to ``file`` as JSON Lines; returns the count."""
+        where, params = self._where(user, since, until, ranges)
+        written = 0
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f'SELECT id, user, name, saved_at, inputs, outputs FROM scenarios{where} ORDER BY id', params
+            )
+            while rows := cursor.fetchmany(batch_size):
+                for scenario_id, user_, name, saved_at, inputs, outputs in rows:
+                    # The stored JSON is spliced in as-is rather than re-encoded
+                    file.write(
+                        f'{{"id": {scenario_id}, "user": {json.dumps(user_)}, "name": {json.dumps(name)}, '
+                        f'"saved_at": "{saved_at}", "inputs": {inputs}, "outputs": {outputs}}}\n'
+                    )
+                written += len(rows)
+        return written
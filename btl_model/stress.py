@@ -0,0 +1,245 @@
+"""Remortgage stress testing along interest rate paths.
+
+A buy-to-let mortgage is rarely on one rate for its whole term: the initial
+fix ends after a few years, and the loan is then remortgaged onto a new fix
+(paying an arrangement fee) or left on the lender's standard variable rate
+(SVR). ``stress_test`` re-amortises every loan along every path of a
+reference rate, choosing a product at each fixed-period end, and reports the
+worst payment, net income and interest coverage ratio (ICR) under stress.
+
+Loans, paths and months are evaluated together as (loans x paths x months)
+arrays. Re-amortising the balance each month over the remaining term at that
+month's rate gives ``B[t + 1] = B[t] * (1 + r[t] - a[t])``, with ``a`` the
+annuity factor, so the balances within a fixed period are one cumulative
+product. The only Python loop is over fixed periods, where the next product
+depends on the balance reached.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from btl_model.income import PERSONAL, net_inc
+from btl_model.mortgage import MortgageTerms
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# What happens at the end of each fixed period:
+#   refix     remortgage onto a new fix, paying the arrangement fee
+#   svr       stay on the lender's SVR for the rest of the term
+#   cheapest  refix only if the new rate, with the fee spread over the fixed
+#             period, is below the SVR; otherwise the SVR until the next check
+#   icr       refix only if the rent passes the lender's ICR test at the
+#             stressed rate; otherwise stuck on the SVR until the next check
+SWITCH_RULES = ('refix', 'svr', 'cheapest', 'icr')
+
+# Per loan and path: worst month over the horizon, and totals
+PATH_METRICS = (
+    'worst_payment', 'worst_net_income', 'min_icr', 'total_interest', 'total_fees',
+    'refinances', 'svr_months', 'end_balance',
+)
+
+StressResult = namedtuple('StressResult', ('months', 'percentiles', 'paths', 'summary', 'bands'))
+
+
+def rate_shock_paths(base_rate, shocks, months, at_month=0):
+    """One reference rate path per shock (percentage points), floored at zero."""
+    shocks = np.asarray(shocks, dtype=float).reshape(-1, 1)
+    shifted = np.where(np.arange(months) >= at_month, shocks, 0.0)
+    return np.clip(base_rate + shifted, 0, None)
+
+
+def random_rate_paths(base_rate, months, paths=1000, volatility=0.5, drift=0.0, seed=None):
+    """Random-walk reference rate paths changing once a year, floored at zero.
+
+    ``volatility`` and ``drift`` are the standard deviation and mean of the
+    yearly change in percentage points; the first year stays at ``base_rate``.
+    """
+    rng = np.random.default_rng(seed)
+    shocks = rng.normal(drift, volatility, (paths, -(-months // 12)))
+    shocks[:, 0] = 0
+    annual = np.clip(base_rate + np.cumsum(shocks, axis=1), 0, None)
+    return np.repeat(annual, 12, axis=1)[:, :months]
+
+
+def _annuity_factor(rate, remaining):
+    # Share of the balance repaid each month to clear it over ``remaining`` months
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        factor = np.where(rate == 0, 1 / remaining, rate / (1 - (1 + rate) ** -remaining))
+    return np.where(remaining > 0, factor, 0.0)
+
+
+def _path_percentiles(values, percentiles):
+    # (loans x percentiles x months) across the paths axis; one sort is
+    # quicker than np.percentile's partition for several percentiles
+    ordered = np.sort(values, axis=1)
+    position = np.asarray(percentiles, dtype=float) / 100 * (ordered.shape[1] - 1)
+    low = np.floor(position).astype(int)
+    high = np.minimum(low + 1, ordered.shape[1] - 1)
+    weight = (position - low)[:, np.newaxis]
+    return ordered[:, low] * (1 - weight) + ordered[:, high] * weight
+
+
+def _stress_chunk(principal, interest_rate, term_months, rent, rate_paths, horizon, period, fixed_margin,
+                  svr_margin, arrangement_fee, arrangement_fee_percent, add_fee_to_loan, switch_rule,
+                  icr_threshold, icr_stress_rate, income, rent_increase, cost_inflation, percentiles):
+    n_loans, n_paths = len(principal), len(rate_paths)
+    loan = (slice(None), np.newaxis)
+
+    balance = np.broadcast_to(principal[loan], (n_loans, n_paths)).astype(float)
+    metrics = {name: np.zeros((n_loans, n_paths)) for name in PATH_METRICS}
+    metrics['worst_payment'][:] = -np.inf
+    metrics['worst_net_income'][:] = np.inf
+    metrics['min_icr'][:] = np.inf
+    bands = {name: [] for name in ('rate', 'payment', 'net_income', 'balance')}
+
+    for start in range(0, horizon, period):
+        month = np.arange(start, min(start + period, horizon))
+        remaining = term_months[loan + (np.newaxis,)] - month
+        active = remaining > 0
+        reference = rate_paths[np.newaxis, :, month]
+        if start == 0:
+            rate = np.broadcast_to(interest_rate[loan + (np.newaxis,)], (n_loans, n_paths, len(month)))
+            fees = np.zeros_like(balance)
+        else:
+            fixed_rate = reference[..., 0] + fixed_margin[loan]
+            svr = reference + svr_margin[loan + (np.newaxis,)]
+            fees = arrangement_fee[loan] + arrangement_fee_percent / 100 * balance
+            outstanding = (balance > 0) & active[..., 0]
+            if switch_rule == 'refix':
+                refix = outstanding
+            elif switch_rule == 'svr':
+                refix = np.zeros_like(outstanding)
+            elif switch_rule == 'cheapest':
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    fee_rate = 100 * fees / (balance * period / 12)
+                refix = outstanding & (fixed_rate + fee_rate < svr[..., 0])
+            else:
+                annual_rent = 12 * rent[loan] * (1 + rent_increase / 100) ** (start // 12)
+                stressed_interest = balance * np.maximum(fixed_rate, icr_stress_rate) / 100
+                refix = outstanding & (annual_rent >= icr_threshold * stressed_interest)
+            fees = np.where(refix, fees, 0.0)
+            if add_fee_to_loan:
+                balance = balance + fees
+            rate = np.where(refix[..., np.newaxis], fixed_rate[..., np.newaxis], svr)
+            metrics['refinances'] += refix
+            metrics['svr_months'] += (~refix[..., np.newaxis] & active).sum(axis=-1)
+
+        monthly_rate = rate / 1200
+        annuity = _annuity_factor(monthly_rate, remaining)
+        growth = np.cumprod(np.where(active, 1 + monthly_rate - annuity, 0.0), axis=-1)
+        opening = balance[..., np.newaxis] * np.concatenate([np.ones((n_loans, n_paths, 1)), growth[..., :-1]], axis=-1)
+        interest = opening * monthly_rate * active
+        payment = opening * annuity
+        closing = balance[..., np.newaxis] * growth
+
+        year = month // 12
+        monthly_rent = rent[loan + (np.newaxis,)] * (1 + rent_increase / 100) ** year
+        monthly_costs = income['fixed_costs'][loan + (np.newaxis,)] * (1 + cost_inflation / 100) ** year
+        net_income = net_inc(
+            monthly_rent, MortgageTerms(payment - interest, interest, payment),
+            income['tax_treatment'][loan + (np.newaxis,)], income['tax_rate'][loan + (np.newaxis,)],
+            income['management_charge_percent'][loan + (np.newaxis,)], monthly_costs,
+        )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            icr = np.where(interest > 0, monthly_rent / interest, np.inf)
+
+        metrics['worst_payment'] = np.maximum(metrics['worst_payment'], payment.max(axis=-1))
+        metrics['worst_net_income'] = np.minimum(metrics['worst_net_income'], net_income.min(axis=-1))
+        metrics['min_icr'] = np.minimum(metrics['min_icr'], icr.min(axis=-1))
+        metrics['total_interest'] += interest.sum(axis=-1)
+        metrics['total_fees'] += fees
+        balance = closing[..., -1]
+
+        for name, values in (('rate', np.where(active, rate, 0.0)), ('payment', payment),
+                             ('net_income', net_income), ('balance', closing)):
+            bands[name].append(_path_percentiles(values, percentiles))
+
+    metrics['end_balance'] = balance
+    return metrics, {name: np.concatenate(parts, axis=-1) for name, parts in bands.items()}
+
+
+def stress_test(principal, interest_rate, length_of_mortgage, rent, rate_paths, fixed_period=5, fixed_margin=1.0,
+                svr_margin=4.0, arrangement_fee=0, arrangement_fee_percent=0, add_fee_to_loan=True,
+                switch_rule='refix', icr_threshold=1.25, icr_stress_rate=5.5, tax_treatment=PERSONAL, tax_rate=0.0,
+                management_charge_percent=0, fixed_costs=0, rent_increase=0, cost_inflation=0, years=None,
+                percentiles=DEFAULT_PERCENTILES, stress_percentile=95, chunk_size=2_000_000):
+    """Payments, net income and ICR of loans remortgaged along rate paths.
+
+    ``principal``, ``interest_rate`` (the initial fixed rate, annual %),
+    ``length_of_mortgage`` (years), ``rent``, the margins, ``arrangement_fee``
+    and the tax and cost inputs broadcast together, one value per loan. ``rate_paths`` is a (paths x
+    months) array of the reference rate in %, e.g. from ``random_rate_paths``
+    or ``rate_shock_paths``; it is extended at its last rate if shorter than
+    the horizon (``years``, by default the longest term).
+
+    Every ``fixed_period`` years the loan moves, according to
+    ``switch_rule`` (see SWITCH_RULES), to a new fix at the reference rate
+    plus ``fixed_margin`` or to the SVR at the reference rate plus
+    ``svr_margin``. A new fix costs ``arrangement_fee`` plus
+    ``arrangement_fee_percent`` of the balance, added to the loan unless
+    ``add_fee_to_loan`` is false; fees are reported separately and not taken
+    from net income. The ICR test for the ``icr`` rule is the annual rent
+    over the interest at the new rate or ``icr_stress_rate``, whichever is
+    higher, against ``icr_threshold``; the reported ICR is monthly rent over
+    the monthly interest actually paid.
+
+    Returns a StressResult: ``paths`` maps PATH_METRICS to (loans x paths)
+    arrays; ``summary`` gives per-loan worst cases over all paths, the same
+    figures at the ``stress_percentile`` (the adverse tail), and the share of
+    paths breaching the ICR threshold or with a negative month; ``bands``
+    maps 'rate', 'payment', 'net_income' and 'balance' to (loans x
+    percentiles x months) arrays across paths. Loans are processed in chunks
+    of about ``chunk_size`` loan-path-months.
+    """
+    if switch_rule not in SWITCH_RULES:
+        raise ValueError(f"Unknown switch rule {switch_rule!r}; expected one of {', '.join(SWITCH_RULES)}")
+    period = int(round(fixed_period * 12))
+    if period < 1:
+        raise ValueError("fixed_period must be at least a month")
+
+    (principal, interest_rate, length_of_mortgage, rent, fixed_margin, svr_margin, arrangement_fee, tax_treatment,
+     tax_rate, management_charge_percent, fixed_costs) = (
+        np.atleast_1d(a) for a in np.broadcast_arrays(
+            np.asarray(principal, dtype=float), np.asarray(interest_rate, dtype=float),
+            np.asarray(length_of_mortgage, dtype=float), np.asarray(rent, dtype=float),
+            np.asarray(fixed_margin, dtype=float), np.asarray(svr_margin, dtype=float),
+            np.asarray(arrangement_fee, dtype=float), np.asarray(tax_treatment), np.asarray(tax_rate, dtype=float),
+            np.asarray(management_charge_percent, dtype=float), np.asarray(fixed_costs, dtype=float),
+        )
+    )
+    term_months = np.ceil(length_of_mortgage * 12)
+    horizon = int(years * 12) if years is not None else int(term_months.max(initial=0))
+    rate_paths = np.atleast_2d(np.asarray(rate_paths, dtype=float))
+    if rate_paths.shape[1] < horizon:
+        rate_paths = np.pad(rate_paths, ((0, 0), (0, horizon - rate_paths.shape[1])), mode='edge')
+
+    n_paths = len(rate_paths)
+    step = max(1, chunk_size // max(n_paths * min(period, horizon), 1))
+    parts = []
+    for start in range(0, len(principal), step):
+        chunk = slice(start, start + step)
+        parts.append(_stress_chunk(
+            principal[chunk], interest_rate[chunk], term_months[chunk], rent[chunk], rate_paths, horizon, period,
+            fixed_margin[chunk], svr_margin[chunk], arrangement_fee[chunk], arrangement_fee_percent, add_fee_to_loan, switch_rule,
+            icr_threshold, icr_stress_rate,
+            {'tax_treatment': tax_treatment[chunk], 'tax_rate': tax_rate[chunk],
+             'management_charge_percent': management_charge_percent[chunk], 'fixed_costs': fixed_costs[chunk]},
+            rent_increase, cost_inflation, list(percentiles),
+        ))
+    paths = {name: np.concatenate([metrics[name] for metrics, _ in parts]) for name in PATH_METRICS}
+    bands = {name: np.concatenate([chunk_bands[name] for _, chunk_bands in parts]) for name in parts[0][1]}
+
+    summary = {
+        'worst_payment': paths['worst_payment'].max(axis=1),
+        'worst_net_income': paths['worst_net_income'].min(axis=1),
+        'min_icr': paths['min_icr'].min(axis=1),
+        'stressed_payment': np.percentile(paths['worst_payment'], stress_percentile, axis=1),
+        'stressed_net_income': np.percentile(paths['worst_net_income'], 100 - stress_percentile, axis=1),
+        'stressed_icr': np.percentile(paths['min_icr'], 100 - stress_percentile, axis=1),
+        'icr_breach_probability': (paths['min_icr'] < icr_threshold).mean(axis=1),
+        'negative_income_probability': (paths['worst_net_income'] < 0).mean(axis=1),
+        'mean_total_interest': paths['total_interest'].mean(axis=1),
+        'mean_total_fees': paths['total_fees'].mean(axis=1),
+    }
+    return StressResult(np.arange(1, horizon + 1), tuple(percentiles), paths, summary, bands)
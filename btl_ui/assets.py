@@ -0,0 +1,106 @@
+"""Lottie animation loading shared by all pages.
+
+Parsed animations are cached for the life of the server process, so widget
+reruns do not re-read or re-parse them. Remote animations are fetched on a
+background thread with a bounded wait and written to an on-disk cache; if
+the fetch is slow or fails the page renders with the fallback instead, and a
+failed fetch is retried at most once every ``RETRY_INTERVAL`` seconds.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from functools import lru_cache
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "btl_model", "lottie")
+
+# How long a page render waits for a remote animation before falling back
+RENDER_TIMEOUT = 1.0
+# How long the background fetch itself may take
+REQUEST_TIMEOUT = 10.0
+# Least time between fetches of a URL, so a failing one is not fetched on every rerun
+RETRY_INTERVAL = 60.0
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="lottie")
+_pending = {}
+_submitted = {}
+_remote = {}
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=32)
+def _load_file(path, mtime):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _cache_path(url):
+    return os.path.join(CACHE_DIR, hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+
+def _fetch(url):
+    import requests
+
+    r = requests.get(url, timeout=REQUEST_TIMEOUT)
+    # Fail the future on an error status, so the fetch is retried
+    r.raise_for_status()
+    animation = r.json()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = _cache_path(url) + f".{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(animation, f)
+    os.replace(tmp_path, _cache_path(url))
+    with _lock:
+        _remote[url] = animation
+    return animation
+
+
+def _load_url(url, timeout):
+    with _lock:
+        if url in _remote:
+            return _remote[url]
+    if os.path.exists(_cache_path(url)):
+        try:
+            animation = _load_file(_cache_path(url), os.path.getmtime(_cache_path(url)))
+        except (OSError, ValueError):
+            pass
+        else:
+            with _lock:
+                _remote[url] = animation
+            return animation
+
+    with _lock:
+        future = _pending.get(url)
+        failed = future is not None and future.done() and future.exception() is not None
+        if future is None or (failed and time.monotonic() - _submitted[url] >= RETRY_INTERVAL):
+            _submitted[url] = time.monotonic()
+            future = _pending[url] = _executor.submit(_fetch, url)
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        # Keep fetching in the background; a later rerun picks it up.
+        return None
+    except Exception:
+        return None
+
+
+def load_lottie(source, fallback=None, timeout=RENDER_TIMEOUT):
+    """Return a parsed Lottie animation, or ``None`` if it cannot be loaded.
+
+    ``source`` is a URL or a local file path. ``fallback`` is an optional
+    local file used when the source is unavailable.
+    """
+    animation = None
+    if source.startswith('http'):
+        animation = _load_url(source, timeout)
+    else:
+        try:
+            animation = _load_file(source, os.path.getmtime(source))
+        except (OSError, ValueError):
+            animation = None
+    if animation is None and fallback is not None:
+        return load_lottie(fallback)
+    return animation
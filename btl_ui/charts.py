@@ -0,0 +1,50 @@
+"""Plotly trace helpers for long series.
+
+A chart is only a few hundred pixels wide, so a series with more points than
+that is downsampled before it is serialised: each bucket keeps its minimum
+and maximum, which preserves the visible envelope (peaks, troughs and
+crossings) at a fraction of the payload. Series that remain long are drawn
+with WebGL traces, which render far faster than SVG in the browser.
+"""
+
+import numpy as np
+import plotly.graph_objects as go
+
+# Points kept per series: two (min and max) per bucket, about one bucket per pixel
+PIXEL_BUDGET = 2000
+
+# Series longer than this are drawn with Scattergl
+WEBGL_THRESHOLD = 1000
+
+
+def minmax_downsample(x, y, max_points=PIXEL_BUDGET):
+    """Min/max downsampling of ``y`` against ``x``.
+
+    Returns ``(x, y)`` unchanged when already within ``max_points``,
+    otherwise at most ``max_points`` points (plus the end points), in order.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = len(y)
+    if n <= max_points or max_points < 4:
+        return x, y
+
+    buckets = max_points // 2
+    size = -(-n // buckets)
+    # Pad the tail with the last value so every bucket has ``size`` points
+    padded = np.concatenate([y, np.repeat(y[-1:], buckets * size - n)]).reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    keep = np.concatenate([
+        [0, n - 1],
+        np.minimum(offsets + padded.argmin(axis=1), n - 1),
+        np.minimum(offsets + padded.argmax(axis=1), n - 1),
+    ])
+    keep = np.unique(keep)
+    return x[keep], y[keep]
+
+
+def line_trace(x, y, max_points=PIXEL_BUDGET, **kwargs):
+    """A Scatter trace for ``(x, y)``, downsampled and switched to WebGL when long."""
+    x, y = minmax_downsample(x, y, max_points)
+    trace = go.Scattergl if len(y) > WEBGL_THRESHOLD else go.Scatter
+    return trace(x=x, y=y, **kwargs)
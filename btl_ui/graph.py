@@ -0,0 +1,108 @@
+"""Dependency-tracked, memoised computations for Streamlit reruns.
+
+Streamlit reruns a page top to bottom on every widget change. A page declares
+its calculations as nodes of a ComputationGraph, each naming the widget
+inputs and upstream nodes it reads; node results are memoised in a
+dict-like store (normally ``st.session_state``) under a key derived from
+those values. On a rerun only nodes whose own inputs, or whose upstream
+results, changed are recomputed.
+
+Nodes registered with ``shared=True`` are also looked up in a persistent
+``btl_model.cache.ResultCache``, if the graph has one, before being
+computed, so a scenario another session or process has already run costs a
+lookup. Their key is the node's own input values and its dependencies' keys,
+plus the node's source.
+"""
+
+import hashlib
+import inspect
+
+
+class ComputationGraph:
+
+    def __init__(self, store, namespace="graph", cache=None):
+        self.store = store
+        self.namespace = namespace
+        self.cache = cache
+        self.shared = set()
+        self.inputs = {}
+        self.nodes = {}
+        # Names of the nodes recomputed (rather than read from the store)
+        # since the graph was created, i.e. during this rerun.
+        self.recomputed = []
+        self._keys = {}
+
+    def set_inputs(self, **inputs):
+        """Record widget values; may be called again as more widgets render."""
+        self.inputs.update(inputs)
+        self._keys.clear()
+
+    def node(self, name, inputs=(), deps=(), shared=False):
+        """Decorator registering ``func(**inputs, **deps)`` as node ``name``.
+
+        ``shared`` nodes are also kept in the graph's persistent cache; their
+        inputs and results must be picklable.
+        """
+        def register(func):
+            self.nodes[name] = (func, tuple(inputs), tuple(deps))
+            self._keys.pop(name, None)
+            if shared:
+                self.shared.add(name)
+            else:
+                self.shared.discard(name)
+            return func
+        return register
+
+    def _store_key(self, name):
+        return f"{self.namespace}.{name}"
+
+    def key(self, name):
+        """Digest of a node's inputs and its dependencies' keys."""
+        if name not in self._keys:
+            func, inputs, deps = self.nodes[name]
+            missing = [i for i in inputs if i not in self.inputs]
+            if missing:
+                raise KeyError(f"Node {name!r} needs inputs that have not been set: {', '.join(missing)}")
+            parts = (
+                tuple((i, self.inputs[i]) for i in inputs),
+                tuple((d, self.key(d)) for d in deps),
+            )
+            self._keys[name] = hashlib.sha1(repr(parts).encode()).hexdigest()
+        return self._keys[name]
+
+    def get(self, name):
+        """Value of node ``name``, recomputing it only if its key changed."""
+        key = self.key(name)
+        cached = self.store.get(self._store_key(name))
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        func, inputs, deps = self.nodes[name]
+
+        def compute():
+            kwargs = {i: self.inputs[i] for i in inputs}
+            kwargs.update({d: self.get(d) for d in deps})
+            self.recomputed.append(name)
+            return func(**kwargs)
+
+        if self.cache is not None and name in self.shared:
+            value = self.cache.get_or_compute(self._store_key(name), {
+                'inputs': {i: self.inputs[i] for i in inputs},
+                'deps': {d: self.key(d) for d in deps},
+                'source': _source(func),
+            }, compute)
+        else:
+            value = compute()
+        self.store[self._store_key(name)] = (key, value)
+        return value
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+
+def _source(func):
+    # A node's code is part of its shared key, so editing a page invalidates its results
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        return func.__code__.co_code
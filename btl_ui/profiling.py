@@ -0,0 +1,192 @@
+"""Opt-in rerun profiling for the Streamlit pages.
+
+Pages wrap their sections in ``profiler.section(name)`` and call
+``profiler.finish()`` at the end of the script. Timing is always cheap
+enough to leave in; the overlay and metrics are only produced when
+profiling is enabled with the ``BTL_PROFILE=1`` environment variable. It is
+deliberately not something a visitor can turn on, since it writes metrics
+and can start a metrics server.
+
+When enabled, every rerun is added to process-wide latency histograms. They
+are written in Prometheus text format to ``BTL_METRICS_FILE`` (for a
+textfile collector) and/or served at ``/metrics`` on ``BTL_METRICS_PORT``.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+# Reruns kept per session for the p50/p99 shown in the overlay
+SESSION_HISTORY = 500
+
+
+class Histogram:
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += seconds
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Process-wide rerun and section latency histograms."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reruns = defaultdict(Histogram)
+        self.sections = defaultdict(Histogram)
+
+    def record(self, page, total, sections):
+        with self.lock:
+            self.reruns[page].observe(total)
+            for name, seconds in sections.items():
+                self.sections[(page, name)].observe(seconds)
+
+    def _histogram_lines(self, metric, labels, histogram):
+        cumulative = 0
+        for bound, count in zip(BUCKETS, histogram.counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            yield f'{metric}_bucket{{{labels},le="{le}"}} {cumulative}'
+        yield f'{metric}_sum{{{labels}}} {histogram.sum}'
+        yield f'{metric}_count{{{labels}}} {histogram.count}'
+
+    def prometheus_text(self):
+        lines = [
+            '# HELP btl_rerun_seconds Wall time of a full page rerun.',
+            '# TYPE btl_rerun_seconds histogram',
+        ]
+        with self.lock:
+            for page, histogram in sorted(self.reruns.items()):
+                lines.extend(self._histogram_lines('btl_rerun_seconds', f'page="{page}"', histogram))
+            lines += [
+                '# HELP btl_section_seconds Wall time of a page section within a rerun.',
+                '# TYPE btl_section_seconds histogram',
+            ]
+            for (page, name), histogram in sorted(self.sections.items()):
+                lines.extend(self._histogram_lines('btl_section_seconds', f'page="{page}",section="{name}"', histogram))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+registry = MetricsRegistry()
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def serve_metrics(port, host='127.0.0.1'):
+    """Serve the registry at http://host:port/metrics on a daemon thread (once per process)."""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        _server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=_server.serve_forever, name='btl-metrics', daemon=True).start()
+        return _server
+
+
+class RerunProfiler:
+    """Times the sections of one page rerun."""
+
+    def __init__(self, page):
+        self.page = page
+        self.started = time.perf_counter()
+        self.sections = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    @contextmanager
+    def section(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections[name] += time.perf_counter() - start
+            self.calls[name] += 1
+
+    def enabled(self):
+        return os.environ.get('BTL_PROFILE') == '1'
+
+    def finish(self, cache=None):
+        """Record the rerun and, if profiling is enabled, show the overlay.
+
+        With a ``btl_model.cache.ResultCache``, its shared hit/miss counts are shown too.
+        """
+        total = time.perf_counter() - self.started
+        if not self.enabled():
+            return total
+
+        import pandas as pd
+        import streamlit as st
+
+        registry.record(self.page, total, self.sections)
+        if os.environ.get('BTL_METRICS_FILE'):
+            registry.write(os.environ['BTL_METRICS_FILE'])
+        if os.environ.get('BTL_METRICS_PORT'):
+            serve_metrics(int(os.environ['BTL_METRICS_PORT']))
+
+        history = st.session_state.setdefault(f'_profiler.{self.page}', deque(maxlen=SESSION_HISTORY))
+        history.append(total)
+
+        with st.expander(f"⏱️ Rerun timings: {total * 1000:,.1f} ms"):
+            timings = pd.DataFrame({
+                "Section": list(self.sections),
+                "Calls": [self.calls[name] for name in self.sections],
+                "Time (ms)": [seconds * 1000 for seconds in self.sections.values()],
+                "Share of Rerun": [100 * seconds / total for seconds in self.sections.values()],
+            }).sort_values("Time (ms)", ascending=False)
+            st.dataframe(
+                timings,
+                hide_index=True,
+                column_config={
+                    "Time (ms)": st.column_config.NumberColumn(format="%.2f"),
+                    "Share of Rerun": st.column_config.ProgressColumn(min_value=0, max_value=100, format="%.0f%%"),
+                },
+            )
+            p50, p99 = np.percentile(history, [50, 99]) * 1000
+            st.caption(f"This session: {len(history)} reruns, p50 {p50:,.1f} ms, p99 {p99:,.1f} ms")
+            if cache is not None:
+                stats = cache.stats()
+                lookups = max(stats.hits + stats.misses, 1)
+                st.caption(
+                    f"Result cache (all sessions): {stats.hits:,} hits, {stats.misses:,} misses "
+                    f"({stats.hits / lookups:.0%} hit rate), {stats.entries:,} entries, {stats.size / 1024 ** 2:,.1f} MB"
+                )
+        return total
@@ -1,28 +1,49 @@
 import streamlit as st
+import io
 import numpy as np
-import numpy_financial as npf
-import matplotlib.pyplot as plt
-import json
-from numpy.linalg import LinAlgError
 import pandas as pd
 import plotly.graph_objects as go
 from streamlit_lottie import st_lottie
-import requests
+from btl_model import (
+    DEFAULT_TABLE,
+    LIMITED_COMPANY,
+    PERSONAL,
+    STAMP_DUTY_TABLES,
+    SWITCH_RULES,
+    break_even_rent,
+    cash_on_cash,
+    investment_cash_flows,
+    irr,
+    ltv,
+    mortgage_terms,
+    net_inc,
+    npv,
+    payback_period,
+    sale_proceeds,
+    scenario_metrics,
+    sdlt,
+    sensitivity_grid,
+    random_rate_paths,
+    rate_shock_paths,
+    simulate_growth,
+    stress_test,
+    tornado,
+)
+from btl_model.cache import ResultCache
+from btl_model.optimizer import optimise_structure
+from btl_model.products import DEFAULT_PATH as PRODUCTS_PATH, compare_products, load_products
+from btl_model.projection import project
+from btl_model.store import ScenarioStore, ScenarioSummary
+from btl_ui.assets import load_lottie
+from btl_ui.charts import line_trace
+from btl_ui.graph import ComputationGraph
+from btl_ui.profiling import RerunProfiler
+
+profiler = RerunProfiler("buy_to_let")
 
 # Load Lottie animation
-def load_lottie(source):
-    if source.startswith('http'):
-        # If the source is a URL
-        r = requests.get(source)
-        if r.status_code != 200:
-            return None
-        return r.json()
-    else:
-        # If the source is a local file path
-        with open(source, 'r') as f:
-            return json.load(f)
-
-lottie_house = load_lottie("1725915498155.json")
+with profiler.section("asset_load"):
+    lottie_house = load_lottie("1725915498155.json")
 
 # Setup page
 st.set_page_config(
@@ -80,120 +101,331 @@ with col2:
     else:
         st.warning("Failed to load house animation.")
 
+# Defaults for the keyed inputs that do not start at zero. They are seeded into
+# session state rather than passed as widget values, so that loading a saved
+# scenario can set any input through session state.
+INPUT_DEFAULTS = {
+    "input.houseprice": 100000,
+    "input.deposit": 10000,
+    "input.corporation_tax": 19,
+    "input.years": 10,
+    "input.stamp_duty_table": DEFAULT_TABLE,
+    "input.selling_costs": 0.0,
+    "input.discount_rate": 5.0,
+}
+for key, value in INPUT_DEFAULTS.items():
+    st.session_state.setdefault(key, value)
+
 # Sidebar
 with st.sidebar:
     st.subheader("Model Parameters")
-    tax_treatment = st.radio("Tax Treatment", ["Limited company", "Personal"])
+    tax_treatment = st.radio("Tax Treatment", ["Limited company", "Personal"], key="input.tax_treatment")
 
     tabs = st.tabs(["🏡 House", "💰 Income", "💸 Costs", "🏦 Mortgage", "📈 Growth"])
     
     with tabs[0]:
-        houseprice = st.number_input('House price (£)', value=100000, step=10000)
-        deposit = st.number_input('Deposit (£)', value=10000, step=1000)
+        houseprice = st.number_input('House price (£)', step=10000, key="input.houseprice")
+        deposit = st.number_input('Deposit (£)', step=1000, key="input.deposit")
     
     with tabs[1]:
-        rent = st.number_input('Expected rental income (PCM) (£)')
+        rent = st.number_input('Expected rental income (PCM) (£)', key="input.rent")
         if tax_treatment == "Limited company":
-            incometax = st.number_input('Rate of Corporation tax (%)', value=19)
+            incometax = st.number_input('Rate of Corporation tax (%)', step=1, key="input.corporation_tax")
         else:
-            incometax = st.selectbox("Income Tax Band", ("Personal Allowance (0%)", "Basic (20%)", "Higher (40%)", "Additional (45%)"))
+            incometax = st.selectbox("Income Tax Band", ("Personal Allowance (0%)", "Basic (20%)", "Higher (40%)", "Additional (45%)"), key="input.income_tax_band")
             incometax = {"Personal Allowance (0%)": 0, "Basic (20%)": 0.2, "Higher (40%)": 0.4, "Additional (45%)": 0.45}[incometax]
     
     with tabs[2]:
-        service_charge = st.number_input('Service Charge (£)')
-        management_charge_percent = st.number_input('Management Charge (%)')
-        maintenance_cost = st.number_input('Maintenance Costs (£)')
-        landlord_insurance = st.number_input('Landlord Insurance (£)')
-        building_insurance = st.number_input('Buildings Insurance (£)')
-        accountancy_cost = st.number_input('Accountancy Fees (£)')
+        service_charge = st.number_input('Service Charge (£)', key="input.service_charge")
+        management_charge_percent = st.number_input('Management Charge (%)', key="input.management_charge_percent")
+        maintenance_cost = st.number_input('Maintenance Costs (£)', key="input.maintenance_cost")
+        landlord_insurance = st.number_input('Landlord Insurance (£)', key="input.landlord_insurance")
+        building_insurance = st.number_input('Buildings Insurance (£)', key="input.building_insurance")
+        accountancy_cost = st.number_input('Accountancy Fees (£)', key="input.accountancy_cost")
     
     with tabs[3]:
-        interest_rate = st.number_input("Interest Rate (%)")
-        length_of_mortgage = st.number_input("Length of Mortgage (years)")
+        interest_rate = st.number_input("Interest Rate (%)", key="input.interest_rate")
+        length_of_mortgage = st.number_input("Length of Mortgage (years)", key="input.length_of_mortgage")
+        arrangement_fee = st.number_input("Arrangement Fee (£)", min_value=0.0, step=100.0, key="input.arrangement_fee",
+                                          help="Paid up front, so included in the capital required.")
     
     with tabs[4]:
-        annual_capital_growth = st.number_input("Predicted Annual Capital Growth (%)")
-
-# Function Definitions
-def get_mortgage_details():
-    mort_req = houseprice - deposit
-    interest_rate_monthly = (interest_rate / 100) / 12
-    length_of_mortgage_monthly = length_of_mortgage * 12
-    mortgage_principle_sum = npf.ppmt(interest_rate_monthly, 1, length_of_mortgage_monthly, mort_req)
-    mortgage_interest = npf.ipmt(interest_rate_monthly, 1, length_of_mortgage_monthly, mort_req)
-    total_monthly_repay = npf.pmt(interest_rate_monthly, length_of_mortgage_monthly, mort_req)
-    return abs(mortgage_principle_sum), abs(mortgage_interest), abs(total_monthly_repay)
-
-def ltv(deposit, houseprice):
-    return (houseprice - deposit)/houseprice
-
-def stamp_duty(houseprice):
-    if houseprice <= 250000:
-        return 0
-    elif 250000 < houseprice <= 925000:
-        return (houseprice - 250000) * 0.05
-    elif 925000 < houseprice <= 1500000:
-        return (houseprice - 925000) * 0.1 + 33750
-    else:
-        return (houseprice - 1500000) * 0.12 + 91250
-    
-def stamp_duty_additional(houseprice):
-        if houseprice <= 250000:
-            return houseprice * 0.03
-        elif 250000 < houseprice <= 925000:
-            return (houseprice - 250000) * 0.08 + 7500
-        elif 925000 < houseprice <= 1500000:
-            return (houseprice - 925000) * 0.13 + 61500
-        else:
-            return (houseprice - 1500000) * 0.15 + 136250
-
-def total_costs(rent_val):
-    return service_charge + (rent_val * (management_charge_percent / 100)) + maintenance_cost + landlord_insurance + building_insurance + accountancy_cost
-
-def tax_credit(interest):
-    tax_credit_sum = float(interest * 0.2)
-    return tax_credit_sum
-
-def EBIT(rent_val):
-    if tax_treatment == "Personal":
-        return rent_val - total_costs(rent_val)
-    elif tax_treatment == "Limited company":
-        return rent_val - (total_costs(rent_val) + mort_interest)
-
-def NOPAT(rent_val, interest):
-    if tax_treatment == "Personal":
-        return (EBIT(rent_val) - (EBIT(rent_val) * (incometax))) + tax_credit(interest)
-    elif tax_treatment == "Limited company":
-        return (EBIT(rent_val) - (EBIT(rent_val) * (incometax/100)))
-
-def net_inc(rent_val, interest, mortgage_repay):
-    if tax_treatment == "Personal":
-        return NOPAT(rent_val, interest) - mortgage_repay
-    elif tax_treatment == "Limited company":
-        return NOPAT(rent_val, interest) - mort_principle
-
-def culm_growth_func(years):
-    capital_growth_float = (annual_capital_growth / 100)
-    return (houseprice * (pow(1 + capital_growth_float, years))) - houseprice
-
-def save():
-    calculations = {'deposit': deposit, 'houseprice': houseprice}
-    json_object = json.dumps(calculations, indent=4)
-    with open("calculations.json", "w") as outfile:
-        outfile.write(json_object)
-    st.download_button(
-        label="Download JSON",
-        data=json_object,
-        file_name='calculations.json',
-        mime='application/json'
+        annual_capital_growth = st.number_input("Predicted Annual Capital Growth (%)", key="input.annual_capital_growth")
+        rent_increase = st.number_input("Annual Rent Increase (%)", key="input.rent_increase")
+        cost_inflation = st.number_input("Annual Cost Inflation (%)", key="input.cost_inflation")
+
+# The model takes tax rates as fractions: corporation tax is entered in %, income tax bands are already fractions
+tax_rate = incometax / 100 if tax_treatment == LIMITED_COMPANY else incometax
+
+# Calculations are nodes of a graph memoised in session state, so a rerun only
+# recomputes the nodes downstream of the widgets that changed. The expensive
+# ones are shared with other sessions and processes through the result cache.
+@st.cache_resource
+def get_result_cache():
+    return ResultCache()
+
+result_cache = get_result_cache()
+graph = ComputationGraph(st.session_state, namespace="buy_to_let", cache=result_cache)
+graph.set_inputs(
+    houseprice=houseprice,
+    deposit=deposit,
+    rent=rent,
+    tax_treatment=tax_treatment,
+    tax_rate=tax_rate,
+    service_charge=service_charge,
+    management_charge_percent=management_charge_percent,
+    maintenance_cost=maintenance_cost,
+    landlord_insurance=landlord_insurance,
+    building_insurance=building_insurance,
+    accountancy_cost=accountancy_cost,
+    interest_rate=interest_rate,
+    length_of_mortgage=length_of_mortgage,
+    arrangement_fee=arrangement_fee,
+    annual_capital_growth=annual_capital_growth,
+    rent_increase=rent_increase,
+    cost_inflation=cost_inflation,
+)
+SWITCH_RULE_LABELS = {
+    "refix": "Always remortgage onto a new fix",
+    "cheapest": "Remortgage only if cheaper than the SVR",
+    "icr": "Remortgage only if the rent passes the lender's ICR test",
+    "svr": "Stay on the SVR",
+}
+RATE_SHOCKS = (0.0, 1.0, 2.0, 3.0, 5.0)
+DEAL_TARGETS = {"net_income": "Net Monthly Income (£)", "irr": "IRR", "cash_on_cash": "Year 1 Cash-on-Cash"}
+income_inputs = ("rent", "tax_treatment", "tax_rate", "management_charge_percent")
+projection_inputs = ("houseprice", "deposit", "rent", "interest_rate", "length_of_mortgage", "years",
+                     "annual_capital_growth", "rent_increase", "cost_inflation", "tax_treatment", "tax_rate",
+                     "management_charge_percent")
+
+@graph.node("mortgage", inputs=("houseprice", "deposit", "interest_rate", "length_of_mortgage"))
+def get_mortgage_details(houseprice, deposit, interest_rate, length_of_mortgage):
+    if houseprice > 0 and deposit > 0 and interest_rate > 0 and length_of_mortgage > 0:
+        return mortgage_terms(houseprice - deposit, interest_rate, length_of_mortgage)
+    return None
+
+@graph.node("cost_totals", inputs=("service_charge", "maintenance_cost", "landlord_insurance", "building_insurance", "accountancy_cost"))
+def get_fixed_costs(service_charge, maintenance_cost, landlord_insurance, building_insurance, accountancy_cost):
+    return service_charge + maintenance_cost + landlord_insurance + building_insurance + accountancy_cost
+
+@graph.node("net_income_curve", inputs=income_inputs, deps=("mortgage", "cost_totals"))
+def get_net_income_curve(rent, tax_treatment, tax_rate, management_charge_percent, mortgage, cost_totals):
+    x = np.linspace(rent * 0.5, rent * 1.5, 100)
+    return x, net_inc(x, mortgage, tax_treatment, tax_rate, management_charge_percent, cost_totals)
+
+@graph.node("break_even", inputs=income_inputs[1:], deps=("mortgage", "cost_totals"))
+def get_break_even(tax_treatment, tax_rate, management_charge_percent, mortgage, cost_totals):
+    return break_even_rent(mortgage, tax_treatment, tax_rate, management_charge_percent, cost_totals)
+
+def get_projection(houseprice, deposit, rent, interest_rate, length_of_mortgage, years, annual_capital_growth,
+                   rent_increase, cost_inflation, tax_treatment, tax_rate, management_charge_percent,
+                   mortgage, cost_totals, frequency='annual'):
+    # Without complete mortgage details only the valuation is projected
+    mort_req = houseprice - deposit if mortgage is not None else 0
+    return project(houseprice, mort_req, rent, interest_rate, length_of_mortgage, years,
+                   annual_capital_growth=annual_capital_growth, rent_increase=rent_increase,
+                   cost_inflation=cost_inflation, tax_treatment=tax_treatment, tax_rate=tax_rate,
+                   management_charge_percent=management_charge_percent, fixed_costs=cost_totals,
+                   frequency=frequency)
+
+@graph.node("monthly_projection", inputs=projection_inputs, deps=("mortgage", "cost_totals"), shared=True)
+def get_monthly_projection(**kwargs):
+    return get_projection(frequency='monthly', **kwargs)
+
+graph.node("growth_projection", inputs=projection_inputs, deps=("mortgage", "cost_totals"), shared=True)(get_projection)
+
+@graph.node("simulation", inputs=("houseprice", "deposit", "rent", "interest_rate", "length_of_mortgage", "years",
+                                  "tax_treatment", "tax_rate", "management_charge_percent", "annual_capital_growth",
+                                  "capital_growth_volatility", "paths", "rent_growth", "rent_growth_volatility",
+                                  "interest_rate_volatility"), deps=("cost_totals",), shared=True)
+def get_simulation(houseprice, deposit, rent, interest_rate, length_of_mortgage, years, tax_treatment, tax_rate,
+                   management_charge_percent, annual_capital_growth, capital_growth_volatility, paths, rent_growth,
+                   rent_growth_volatility, interest_rate_volatility, cost_totals):
+    return simulate_growth(
+        houseprice, houseprice - deposit, rent, interest_rate, length_of_mortgage,
+        years=years, paths=paths,
+        capital_growth=annual_capital_growth, capital_growth_volatility=capital_growth_volatility,
+        rent_growth=rent_growth, rent_growth_volatility=rent_growth_volatility,
+        interest_rate_volatility=interest_rate_volatility,
+        tax_treatment=tax_treatment, tax_rate=tax_rate,
+        management_charge_percent=management_charge_percent, fixed_costs=cost_totals,
+        seed=0,
+    )
+
+@graph.node("remortgage_stress", inputs=("houseprice", "deposit", "rent", "interest_rate", "length_of_mortgage",
+                                         "tax_treatment", "tax_rate", "management_charge_percent", "rent_increase",
+                                         "cost_inflation", "fixed_period", "switch_rule", "remortgage_fee",
+                                         "add_fee_to_loan", "svr_margin", "icr_threshold", "rate_volatility",
+                                         "stress_paths"), deps=("cost_totals",), shared=True)
+def get_remortgage_stress(houseprice, deposit, rent, interest_rate, length_of_mortgage, tax_treatment, tax_rate,
+                          management_charge_percent, rent_increase, cost_inflation, fixed_period, switch_rule,
+                          remortgage_fee, add_fee_to_loan, svr_margin, icr_threshold, rate_volatility, stress_paths,
+                          cost_totals):
+    # Rate paths are of the rate a new fix is offered at, starting from today's rate
+    months = int(np.ceil(length_of_mortgage * 12))
+    terms = dict(
+        fixed_period=fixed_period, fixed_margin=0.0, svr_margin=svr_margin, arrangement_fee=remortgage_fee,
+        add_fee_to_loan=add_fee_to_loan, switch_rule=switch_rule, icr_threshold=icr_threshold,
+        tax_treatment=tax_treatment, tax_rate=tax_rate, management_charge_percent=management_charge_percent,
+        fixed_costs=cost_totals, rent_increase=rent_increase, cost_inflation=cost_inflation,
+    )
+    simulated = stress_test(
+        houseprice - deposit, interest_rate, length_of_mortgage, rent,
+        random_rate_paths(interest_rate, months, paths=stress_paths, volatility=rate_volatility, seed=0), **terms,
     )
-    st.write(calculations)
+    # One path per parallel shock to the rate at every remortgage
+    shocked = stress_test(
+        houseprice - deposit, interest_rate, length_of_mortgage, rent,
+        rate_shock_paths(interest_rate, RATE_SHOCKS, months), percentiles=(0, 100), **terms,
+    )
+    return simulated, shocked
+
+@graph.node("capital_requirements", inputs=("houseprice", "deposit", "arrangement_fee", "additional_property",
+                                            "first_time_buyer", "non_resident", "stamp_duty_table"))
+def get_capital_requirements(houseprice, deposit, arrangement_fee, additional_property, first_time_buyer, non_resident,
+                             stamp_duty_table):
+    stamp_duty_val = float(sdlt(houseprice, additional_property, first_time_buyer, non_resident, table=stamp_duty_table))
+    return stamp_duty_val, deposit + stamp_duty_val + arrangement_fee
+
+@graph.node("product_table", inputs=("product_source",))
+def get_product_table(product_source):
+    # An uploaded table arrives as (file name, bytes); otherwise it is a path
+    if isinstance(product_source, tuple):
+        name, data = product_source
+        buffer = io.BytesIO(data)
+        buffer.name = name
+        return load_products(buffer)
+    return load_products(product_source)
+
+@graph.node("product_comparison", inputs=("houseprice", "deposit", "rent", "length_of_mortgage", "tax_treatment",
+                                          "tax_rate", "management_charge_percent", "product_fees_added"),
+            deps=("product_table", "cost_totals"))
+def get_product_comparison(houseprice, deposit, rent, length_of_mortgage, tax_treatment, tax_rate,
+                           management_charge_percent, product_fees_added, product_table, cost_totals):
+    return compare_products(
+        product_table, houseprice, deposit, rent, length_of_mortgage, tax_treatment=tax_treatment,
+        tax_rate=tax_rate, management_charge_percent=management_charge_percent, fixed_costs=cost_totals,
+        add_fee_to_loan=product_fees_added,
+    )
+
+def currency_columns(labels):
+    """Column config showing every column but year and month as whole pounds."""
+    return {
+        name: st.column_config.NumberColumn(label, format="%d" if name in ("year", "month") else "£%,.0f")
+        for name, label in labels.items()
+    }
 
+@graph.node("deal_structures", inputs=("houseprice", "rent", "interest_rate", "years", "annual_capital_growth",
+                                      "rent_increase", "cost_inflation", "management_charge_percent",
+                                      "additional_property", "stamp_duty_table", "budget", "target", "max_ltv",
+                                      "income_tax_rate", "corporation_tax_rate"), deps=("cost_totals",), shared=True)
+def get_deal_structures(houseprice, rent, interest_rate, years, annual_capital_growth, rent_increase, cost_inflation,
+                        management_charge_percent, additional_property, stamp_duty_table, budget, target, max_ltv,
+                        income_tax_rate, corporation_tax_rate, cost_totals):
+    return optimise_structure(
+        houseprice, rent, interest_rate, budget, target=target, max_ltv=max_ltv,
+        tax_rates={PERSONAL: income_tax_rate, LIMITED_COMPANY: corporation_tax_rate},
+        years=years, annual_capital_growth=annual_capital_growth, rent_increase=rent_increase,
+        cost_inflation=cost_inflation, management_charge_percent=management_charge_percent, fixed_costs=cost_totals,
+        additional_property=additional_property, stamp_duty_table=stamp_duty_table,
+    )
+
+# Figures are nodes too, so an unchanged chart is not rebuilt on a rerun
+@graph.node("net_income_figure", deps=("net_income_curve",))
+def get_net_income_figure(net_income_curve):
+    x, y = net_income_curve
+    fig = go.Figure()
+    fig.add_trace(line_trace(x, y, mode='lines', name='Net Income'))
+    fig.add_hline(y=0, line_dash="dash", line_color="red", annotation_text="Cost Neutral")
+    fig.update_layout(
+        title='Net Monthly Income vs Rent',
+        xaxis_title='Monthly Rent (£)',
+        yaxis_title='Net Monthly Income (£)',
+        hovermode='x unified'
+    )
+    return fig
+
+@graph.node("growth_figure", deps=("growth_projection", "mortgage"))
+def get_growth_figure(growth_projection, mortgage):
+    fig = go.Figure()
+    fig.add_trace(line_trace(growth_projection['year'], growth_projection['valuation'], mode='lines+markers', name='Capital Valuation'))
+    if mortgage is not None:
+        fig.add_trace(line_trace(growth_projection['year'], growth_projection['equity'], mode='lines+markers', name='Equity'))
+    fig.update_layout(
+        title='Capital Growth Over Time',
+        xaxis_title='Years',
+        yaxis_title='Capital Valuation (£)',
+        hovermode='x unified',
+        xaxis=dict(tickmode='linear', dtick=1)
+    )
+    return fig
+
+@graph.node("simulation_figure", inputs=("simulation_metric", "paths"), deps=("simulation",))
+def get_simulation_figure(simulation_metric, paths, simulation):
+    bands = {
+        "Capital Valuation": simulation.valuation,
+        "Equity": simulation.equity,
+        "Cumulative Net Income": simulation.cumulative_net_income,
+    }[simulation_metric]
+    fig = go.Figure()
+    for (low, high), opacity in (((0, 4), 0.15), ((1, 3), 0.3)):
+        label = f"{simulation.percentiles[low]}th–{simulation.percentiles[high]}th percentile"
+        fig.add_trace(line_trace(simulation.years, bands[high], mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig.add_trace(line_trace(simulation.years, bands[low], mode='lines', line=dict(width=0), fill='tonexty',
+                                 fillcolor=f'rgba(52, 152, 219, {opacity})', name=label))
+    fig.add_trace(line_trace(simulation.years, bands[2], mode='lines+markers', name='Median', line=dict(color='#2c3e50')))
+    fig.update_layout(
+        title=f'Simulated {simulation_metric} ({paths:,} paths)',
+        xaxis_title='Years',
+        yaxis_title=f'{simulation_metric} (£)',
+        hovermode='x unified',
+        xaxis=dict(tickmode='linear', dtick=1)
+    )
+    return fig
+
+@graph.node("stress_figure", inputs=("stress_metric",), deps=("remortgage_stress",))
+def get_stress_figure(stress_metric, remortgage_stress):
+    simulated, _ = remortgage_stress
+    bands = simulated.bands[{"Monthly Repayment": "payment", "Net Monthly Income": "net_income"}[stress_metric]][0]
+    years = simulated.months / 12
+    fig = go.Figure()
+    for (low, high), opacity in (((0, 4), 0.15), ((1, 3), 0.3)):
+        label = f"{simulated.percentiles[low]}th–{simulated.percentiles[high]}th percentile"
+        fig.add_trace(line_trace(years, bands[high], mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig.add_trace(line_trace(years, bands[low], mode='lines', line=dict(width=0), fill='tonexty',
+                                 fillcolor=f'rgba(231, 76, 60, {opacity})', name=label))
+    fig.add_trace(line_trace(years, bands[2], mode='lines', name='Median', line=dict(color='#2c3e50')))
+    fig.update_layout(
+        title=f'{stress_metric} Along {simulated.paths["worst_payment"].shape[1]:,} Rate Paths',
+        xaxis_title='Years',
+        yaxis_title=f'{stress_metric} (£)',
+        hovermode='x unified'
+    )
+    return fig
+
+@graph.node("deal_frontier_figure", inputs=("target",), deps=("deal_structures",))
+def get_deal_frontier_figure(target, deal_structures):
+    fig = go.Figure()
+    for treatment, frontier in deal_structures.frontier.groupby("tax_treatment"):
+        fig.add_trace(line_trace(frontier["capital"], frontier[target], mode='lines+markers', name=treatment,
+                                 customdata=frontier[["deposit", "length_of_mortgage"]],
+                                 hovertemplate="Deposit £%{customdata[0]:,.0f}, %{customdata[1]:.0f} years"))
+    fig.update_layout(
+        title='Efficient Frontier',
+        xaxis_title='Capital Required (£)',
+        yaxis_title=DEAL_TARGETS[target],
+        hovermode='closest'
+    )
+    return fig
+
+fixed_costs = graph["cost_totals"]
 
 # Main Calculations and Display
 st.header("Mortgage Details")
-if houseprice > 0 and deposit > 0 and interest_rate > 0 and length_of_mortgage > 0:
-    mort_principle, mort_interest, mort_repay = get_mortgage_details()
+with profiler.section("mortgage_calc"):
+    mortgage = graph["mortgage"]
+if mortgage is not None:
+    mort_principle, mort_interest, mort_repay = mortgage
     col1, col2, col3 = st.columns(3)
     col1.metric("Total Mortgage Required", f"£{houseprice - deposit:,.0f}")
     col2.metric("Loan to Value", f"{ltv(deposit,houseprice):.2%}")
@@ -207,28 +439,86 @@ if houseprice > 0 and deposit > 0 and interest_rate > 0 and length_of_mortgage >
 else:
     st.warning("Please enter all mortgage details to calculate repayments.")
 
+# Mortgage Products
+st.header("Mortgage Products")
+if houseprice > deposit and length_of_mortgage > 0:
+    col1, col2 = st.columns([2, 1])
+    product_file = col1.file_uploader(
+        "Product table", type=["csv", "parquet", "jsonl"],
+        help="One row per product: name, rate, fixed_period, arrangement_fee and optionally lender, fee_percent, "
+             "max_ltv, repayment_type, icr, icr_stress_rate and ownership. Rates and limits in %.",
+    )
+    product_fees_added = col2.checkbox("Add fees to the loan", key="input.product_fees_added")
+    show_ineligible = col2.checkbox("Show products not available for this deal")
+    graph.set_inputs(
+        product_source=(product_file.name, product_file.getvalue()) if product_file is not None else PRODUCTS_PATH,
+        product_fees_added=product_fees_added,
+    )
+
+    def use_product(rate, fees):
+        st.session_state["input.interest_rate"] = rate
+        st.session_state["input.arrangement_fee"] = fees
+
+    try:
+        with profiler.section("product_comparison"):
+            products = graph["product_comparison"]
+    except FileNotFoundError:
+        st.info(f"Upload a product table, or save one as {PRODUCTS_PATH}, to compare mortgage products.")
+    except ValueError as e:
+        st.error(f"Could not read the product table: {e}")
+    else:
+        eligible_products = products[products["eligible"]]
+        st.caption(f"{len(eligible_products):,} of {len(products):,} products available for this deal, cheapest "
+                   f"first by interest and fees per year of the fixed period.")
+        st.dataframe(
+            products if show_ineligible else eligible_products,
+            hide_index=True,
+            column_order=["rank", "lender", "name", "rate", "fixed_period", "repayment_type", "fees",
+                          "monthly_payment", "net_income", "icr_cover", "true_cost", "annual_cost",
+                          "balance_after_fix"] + (["reason"] if show_ineligible else []),
+            column_config={
+                "rank": st.column_config.NumberColumn("Rank", format="%d"),
+                "lender": "Lender",
+                "name": "Product",
+                "rate": st.column_config.NumberColumn("Rate", format="%.2f%%"),
+                "fixed_period": st.column_config.NumberColumn("Fixed (years)", format="%d"),
+                "repayment_type": "Type",
+                "fees": st.column_config.NumberColumn("Fees", format="£%,.0f"),
+                "monthly_payment": st.column_config.NumberColumn("Monthly Repayment", format="£%,.2f"),
+                "net_income": st.column_config.NumberColumn("Net Monthly Income", format="£%,.2f"),
+                "icr_cover": st.column_config.NumberColumn("ICR", format="percent"),
+                "true_cost": st.column_config.NumberColumn("Cost over Fix", format="£%,.0f"),
+                "annual_cost": st.column_config.NumberColumn("Cost per Year", format="£%,.0f"),
+                "balance_after_fix": st.column_config.NumberColumn("Balance after Fix", format="£%,.0f"),
+                "reason": "Not Available Because",
+            },
+        )
+        if not eligible_products.empty:
+            col1, col2 = st.columns([3, 1])
+            labels = {i: f"{row.lender} {row.name} ({row.rate:.2f}%, £{row.fees:,.0f} fees)".strip()
+                      for i, row in eligible_products.head(100).iterrows()}
+            chosen = col1.selectbox("Product", list(labels), format_func=labels.get)
+            col2.button("Use this product", on_click=use_product,
+                        args=(float(products.at[chosen, "rate"]), float(products.at[chosen, "fees"])),
+                        help="Sets the interest rate and arrangement fee in the sidebar.")
+else:
+    st.warning("Please enter a house price above the deposit and a mortgage length to compare products.")
+
 # Net Income Graph
 st.header("Net Income Analysis")
 if rent > 0 and houseprice > 0:
     try:
-        x = np.linspace(rent * 0.5, rent * 1.5, 100)
-        y = [net_inc(i, mort_interest, mort_repay) for i in x]
-        
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=x, y=y, mode='lines', name='Net Income'))
-        fig.add_hline(y=0, line_dash="dash", line_color="red", annotation_text="Cost Neutral")
-        
-        fig.update_layout(
-            title='Net Monthly Income vs Rent',
-            xaxis_title='Monthly Rent (£)',
-            yaxis_title='Net Monthly Income (£)',
-            hovermode='x unified'
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        with profiler.section("sweep"):
+            net_income_curve = graph["net_income_curve"]
+
+        with profiler.section("figure_build"):
+            fig = graph["net_income_figure"]
+
+        with profiler.section("plotly_chart"):
+            st.plotly_chart(fig, use_container_width=True)
         
-        model = np.polyfit(x, y, 1)
-        x_intercept = -model[1] / model[0]
+        with profiler.section("sweep"):
+            x_intercept = graph["break_even"]
         st.success(f"📌 Rent required for cost-neutrality after tax: £{x_intercept:,.2f}")
         
     except Exception as e:
@@ -236,70 +526,471 @@ if rent > 0 and houseprice > 0:
 else:
     st.warning("Please enter a valid rent and house price to generate the net income graph.")
 
+# Sensitivity Analysis
+st.header("Sensitivity Analysis")
+if mortgage is not None and rent > 0:
+    scenario = dict(
+        houseprice=float(houseprice),
+        deposit=float(deposit),
+        rent=float(rent),
+        service_charge=float(service_charge),
+        management_charge_percent=float(management_charge_percent),
+        maintenance_cost=float(maintenance_cost),
+        landlord_insurance=float(landlord_insurance),
+        building_insurance=float(building_insurance),
+        accountancy_cost=float(accountancy_cost),
+        interest_rate=float(interest_rate),
+        length_of_mortgage=float(length_of_mortgage),
+        tax_rate=float(tax_rate),
+        tax_treatment=tax_treatment,
+    )
+    sensitivity_inputs = {
+        "Monthly Rent (£)": "rent",
+        "Interest Rate (%)": "interest_rate",
+        "House Price (£)": "houseprice",
+        "Deposit (£)": "deposit",
+        "Management Charge (%)": "management_charge_percent",
+        "Void Rate (%)": "void_rate",
+        "Length of Mortgage (years)": "length_of_mortgage",
+    }
+    # Ranges for inputs that may currently be zero
+    absolute_ranges = {"void_rate": (0.0, 25.0), "management_charge_percent": (0.0, 20.0)}
+
+    grid_tab, tornado_tab = st.tabs(["🗺️ 2-D Grid", "🌪️ Tornado"])
+    with grid_tab:
+        col1, col2, col3, col4 = st.columns(4)
+        x_label = col1.selectbox("X axis", list(sensitivity_inputs), index=0)
+        y_label = col2.selectbox("Y axis", list(sensitivity_inputs), index=1)
+        metric_label = col3.selectbox("Metric", ["Net Monthly Income (£)", "Net Yield"])
+        resolution = col4.select_slider("Grid Resolution", [50, 100, 250, 500], value=100)
+
+        def grid_range(name):
+            if name in absolute_ranges:
+                return (*absolute_ranges[name], resolution)
+            return (scenario.get(name, 0.0) * 0.5, scenario.get(name, 0.0) * 1.5, resolution)
+
+        if x_label == y_label:
+            st.warning("Please choose two different inputs for the grid.")
+        else:
+            x_name, y_name = sensitivity_inputs[x_label], sensitivity_inputs[y_label]
+            metric = "net_income" if metric_label.startswith("Net Monthly") else "net_yield"
+            grid_x, grid_y, grid_z = sensitivity_grid(scenario, x_name, grid_range(x_name), y_name, grid_range(y_name), metric)
+
+            with profiler.section("figure_build"):
+                fig_grid = go.Figure(go.Heatmap(
+                    x=grid_x, y=grid_y, z=grid_z,
+                    colorscale='RdYlGn', zmid=0,
+                    colorbar=dict(title=metric_label),
+                ))
+                fig_grid.add_trace(go.Contour(
+                    x=grid_x, y=grid_y, z=grid_z,
+                    contours=dict(start=0, end=0, size=1, coloring='none'),
+                    line=dict(color='black', dash='dash'), showscale=False, name='Break-even', hoverinfo='skip',
+                ))
+                fig_grid.update_layout(
+                    title=f'{metric_label} by {x_label} and {y_label}',
+                    xaxis_title=x_label,
+                    yaxis_title=y_label,
+                )
+
+            with profiler.section("plotly_chart"):
+                st.plotly_chart(fig_grid, use_container_width=True)
+
+    with tornado_tab:
+        swing = st.slider("Swing each input by (%)", 1, 50, 10)
+        bars = tornado(scenario, swing=swing / 100, swings={"void_rate": (0.0, float(swing))})
+        base_income = float(scenario_metrics(scenario)["net_income"])
+
+        with profiler.section("figure_build"):
+            fig_tornado = go.Figure()
+            input_labels = {name: label for label, name in sensitivity_inputs.items()}
+            input_labels.update({
+                "service_charge": "Service Charge (£)",
+                "maintenance_cost": "Maintenance Costs (£)",
+                "landlord_insurance": "Landlord Insurance (£)",
+                "building_insurance": "Buildings Insurance (£)",
+                "accountancy_cost": "Accountancy Fees (£)",
+                "tax_rate": "Tax Rate",
+            })
+            labels = [input_labels[bar.input] for bar in bars][::-1]
+            fig_tornado.add_trace(go.Bar(
+                y=labels, x=[bar.low_result - base_income for bar in bars][::-1], base=base_income,
+                orientation='h', name='Input lowered', marker_color='#e74c3c',
+            ))
+            fig_tornado.add_trace(go.Bar(
+                y=labels, x=[bar.high_result - base_income for bar in bars][::-1], base=base_income,
+                orientation='h', name='Input raised', marker_color='#3498db',
+            ))
+            fig_tornado.update_layout(
+                title=f'Net Monthly Income Sensitivity (±{swing}%)',
+                xaxis_title='Net Monthly Income (£)',
+                barmode='overlay',
+                height=max(300, 40 * len(bars)),
+            )
+
+        with profiler.section("plotly_chart"):
+            st.plotly_chart(fig_tornado, use_container_width=True)
+else:
+    st.warning("Please enter all mortgage details and a valid rent to run the sensitivity analysis.")
+
 # Capital Growth Visualization
 st.header("Capital Growth Projection")
-years = st.slider("Select the number of years for capital growth visualization:", 1, 30, 10)
+years = st.slider("Select the number of years for capital growth visualization:", 1, 30, key="input.years")
 
-if years > 0 and houseprice > 0:
-    x_years = np.arange(1, years + 1)
-    y_growth = np.array([culm_growth_func(year) for year in x_years])
-    y_valuation = houseprice + y_growth
+graph.set_inputs(years=years)
 
-    fig_growth = go.Figure()
-    fig_growth.add_trace(go.Scatter(x=x_years, y=y_valuation, mode='lines+markers', name='Capital Valuation'))
-    fig_growth.update_layout(
-        title='Capital Growth Over Time',
-        xaxis_title='Years',
-        yaxis_title='Capital Valuation (£)',
-        hovermode='x unified',
-        xaxis=dict(tickmode='linear', dtick=1)
+if years > 0 and houseprice > 0:
+    projection = graph["growth_projection"]
+
+    with profiler.section("figure_build"):
+        fig_growth = graph["growth_figure"]
+
+    with profiler.section("plotly_chart"):
+        st.plotly_chart(fig_growth, use_container_width=True)
+
+    table_columns = {"year": "Year", "valuation": "Capital Valuation"}
+    if mortgage is not None:
+        table_columns.update({
+            "balance": "Mortgage Balance",
+            "equity": "Equity",
+            "net_income": "Net Income",
+            "cumulative_net_income": "Cumulative Net Income",
+        })
+    # st.dataframe only renders the visible rows and formats the numbers client-side
+    st.dataframe(
+        projection[list(table_columns)],
+        hide_index=True,
+        column_config=currency_columns(table_columns),
     )
-    st.plotly_chart(fig_growth, use_container_width=True)
 
-    data = {
-        "Year": range(1, years + 1),
-        "Capital Valuation": ["£{:,.0f}".format(houseprice + culm_growth_func(i)) for i in range(1, years + 1)]
-    }
-    culm_growth_func_table = pd.DataFrame(data)
-    st.table(culm_growth_func_table)
+    if mortgage is not None:
+        with st.expander("📅 Monthly Projection"):
+            monthly_projection = graph["monthly_projection"]
+            st.dataframe(
+                monthly_projection,
+                hide_index=True,
+                column_config=currency_columns({name: name.replace('_', ' ').capitalize() for name in monthly_projection}),
+            )
+
+    with st.expander("🎲 Monte Carlo Simulation"):
+        if mortgage is None:
+            st.warning("Please enter all mortgage details to run the simulation.")
+        elif st.checkbox("Simulate uncertain capital growth, rent growth and interest rates"):
+            col1, col2, col3 = st.columns(3)
+            capital_growth_volatility = col1.number_input("Capital Growth Volatility (%)", value=5.0, min_value=0.0)
+            paths = col1.select_slider("Simulated Paths", [1000, 10000, 100000, 1000000], value=10000)
+            rent_growth = col2.number_input("Annual Rent Growth (%)", value=2.0)
+            rent_growth_volatility = col2.number_input("Rent Growth Volatility (%)", value=2.0, min_value=0.0)
+            interest_rate_volatility = col3.number_input("Interest Rate Volatility (% per year)", value=0.5, min_value=0.0)
+            metric = col3.selectbox("Show", ["Capital Valuation", "Equity", "Cumulative Net Income"])
+
+            graph.set_inputs(
+                capital_growth_volatility=capital_growth_volatility,
+                paths=paths,
+                rent_growth=rent_growth,
+                rent_growth_volatility=rent_growth_volatility,
+                interest_rate_volatility=interest_rate_volatility,
+                simulation_metric=metric,
+            )
+            with profiler.section("figure_build"):
+                fig_simulation = graph["simulation_figure"]
+
+            with profiler.section("plotly_chart"):
+                st.plotly_chart(fig_simulation, use_container_width=True)
 
 # Capital Requirements
 st.header("Capital Requirements")
 
+col1, col2 = st.columns(2)
+stamp_duty_table = col1.selectbox(
+    "Stamp Duty rates in force from",
+    list(STAMP_DUTY_TABLES),
+    key="input.stamp_duty_table",
+)
+non_resident = col2.checkbox("Non-UK resident buyer", key="input.non_resident")
+first_time_buyer = False
+
 if tax_treatment == "Limited company":
-    stamp_duty_val = stamp_duty_additional(houseprice)
+    additional_property = True
 else:
-    property_type = st.radio("Property Type:", ["Main Residence", "Additional Property"])
-    if property_type == "Main Residence":
-        stamp_duty_val = stamp_duty(houseprice)
-    else:
-        stamp_duty_val = stamp_duty_additional(houseprice)
-
-total = deposit + stamp_duty_val
+    property_type = st.radio("Property Type:", ["Main Residence", "Additional Property"], key="input.property_type")
+    additional_property = property_type == "Additional Property"
+    if not additional_property:
+        first_time_buyer = st.checkbox("First-time buyer")
+
+graph.set_inputs(
+    additional_property=additional_property,
+    first_time_buyer=first_time_buyer,
+    non_resident=non_resident,
+    stamp_duty_table=stamp_duty_table,
+)
+stamp_duty_val, total = graph["capital_requirements"]
 capital_requirements = pd.DataFrame({
-    "Capital": ["Deposit", "Stamp Duty", "Total"],
-    "Amount": [deposit, stamp_duty_val, total]
+    "Capital": ["Deposit", "Stamp Duty", "Arrangement Fee", "Total"],
+    "Amount": [deposit, stamp_duty_val, arrangement_fee, total]
 })
 
-# Format the 'Amount' column as currency
-capital_requirements['Amount'] = capital_requirements['Amount'].apply(lambda x: f"£{x:,.0f}")
+with profiler.section("table_styling"):
+    # Format the 'Amount' column as currency
+    capital_requirements['Amount'] = capital_requirements['Amount'].apply(lambda x: f"£{x:,.0f}")
 
-# Create a styled DataFrame
-styled_df = capital_requirements.style.set_properties(**{'font-weight': 'bold'}, subset=pd.IndexSlice[2, :])
-styled_df = styled_df.set_properties(**{'text-align': 'left'}, subset=['Capital'])
-styled_df = styled_df.set_properties(**{'text-align': 'right'}, subset=['Amount'])
-styled_df = styled_df.hide(axis="index")
+    # Create a styled DataFrame
+    styled_df = capital_requirements.style.set_properties(**{'font-weight': 'bold'}, subset=pd.IndexSlice[3, :])
+    styled_df = styled_df.set_properties(**{'text-align': 'left'}, subset=['Capital'])
+    styled_df = styled_df.set_properties(**{'text-align': 'right'}, subset=['Amount'])
+    styled_df = styled_df.hide(axis="index")
+    styled_html = styled_df.to_html()
 
 # Display the styled table
-st.write(styled_df.to_html(), unsafe_allow_html=True)
+st.write(styled_html, unsafe_allow_html=True)
 
 # Add a summary of the capital requirements
 st.info(f"""
 💰 Capital Requirements Summary:
-- Total capital required: {capital_requirements.loc[2, 'Amount']}
-- This includes a deposit of {capital_requirements.loc[0, 'Amount']} and stamp duty of {capital_requirements.loc[1, 'Amount']}
+- Total capital required: {capital_requirements.loc[3, 'Amount']}
+- This includes a deposit of {capital_requirements.loc[0, 'Amount']}, stamp duty of {capital_requirements.loc[1, 'Amount']} and arrangement fees of {capital_requirements.loc[2, 'Amount']}
 """)
 
+# Investment Returns
+st.header("Investment Returns")
+if mortgage is not None and houseprice > 0:
+    col1, col2, col3 = st.columns(3)
+    capital_gains_tax_rate = col1.number_input(
+        "Tax on Sale Gain (%)",
+        value=float(incometax) if tax_treatment == LIMITED_COMPANY else 24.0,
+        help="Capital Gains Tax for a personal sale, Corporation Tax for a company."
+    )
+    selling_costs = col2.number_input("Selling Costs (£)", key="input.selling_costs")
+    discount_rate = col3.number_input("Discount Rate (%)", key="input.discount_rate")
+
+    proceeds = sale_proceeds(
+        projection['valuation'].iloc[-1], projection['balance'].iloc[-1], houseprice,
+        capital_gains_tax_rate / 100, selling_costs
+    )
+    cashflows = investment_cash_flows(total, projection['net_income'].to_numpy(), proceeds)
+    investment_irr = irr(cashflows)[0]
+    investment_npv = npv(discount_rate / 100, cashflows)[0]
+    first_year_return = cash_on_cash(projection['net_income'].iloc[0], total)
+    payback_year = payback_period(cashflows)[0]
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("IRR", f"{investment_irr:.2%}" if np.isfinite(investment_irr) else "n/a")
+    col2.metric("NPV", f"£{investment_npv:,.0f}")
+    col3.metric("Year 1 Cash-on-Cash", f"{first_year_return:.2%}" if np.isfinite(first_year_return) else "n/a")
+    col4.metric("Payback Year", f"{payback_year:.0f}" if np.isfinite(payback_year) else f"> {years}")
+    st.caption(f"Assumes the property is sold at the end of year {years}, for £{proceeds:,.0f} after the mortgage, selling costs and tax.")
+else:
+    st.warning("Please enter all mortgage details to calculate investment returns.")
+
+# Remortgage Stress Test
+st.header("Remortgage Stress Test")
+if mortgage is not None and rent > 0:
+    col1, col2, col3 = st.columns(3)
+    fixed_period = col1.selectbox("Fixed Period (years)", [2, 3, 5, 10], index=2)
+    switch_rule = col1.selectbox(
+        "At the end of each fix", SWITCH_RULES, format_func=lambda rule: SWITCH_RULE_LABELS.get(rule, rule)
+    )
+    remortgage_fee = col2.number_input("Arrangement Fee at Each Remortgage (£)",
+                                       value=float(arrangement_fee) or 1999.0, min_value=0.0, step=100.0)
+    add_fee_to_loan = col2.checkbox("Add the fee to the loan", value=True)
+    svr_margin = col2.number_input("SVR above a new fix (%)", value=3.0, min_value=0.0)
+    rate_volatility = col3.number_input("Rate Volatility (% per year)", value=1.0, min_value=0.0)
+    stress_paths = col3.select_slider("Rate Paths", [100, 1000, 10000], value=1000)
+    icr_threshold = col3.number_input(
+        "Lender ICR Threshold (%)", value=125 if tax_treatment == LIMITED_COMPANY or tax_rate <= 0.2 else 145,
+        help="Rent as a percentage of the interest at the stressed rate that a lender requires to remortgage."
+    )
+    graph.set_inputs(
+        fixed_period=fixed_period,
+        switch_rule=switch_rule,
+        remortgage_fee=remortgage_fee,
+        add_fee_to_loan=add_fee_to_loan,
+        svr_margin=svr_margin,
+        icr_threshold=icr_threshold / 100,
+        rate_volatility=rate_volatility,
+        stress_paths=stress_paths,
+    )
+    with profiler.section("stress_test"):
+        simulated, shocked = graph["remortgage_stress"]
+
+    summary = {name: values[0] for name, values in simulated.summary.items()}
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Worst Monthly Repayment", f"£{summary['stressed_payment']:,.2f}",
+                help="95th percentile across rate paths of each path's highest repayment.")
+    col2.metric("Worst Net Monthly Income", f"£{summary['stressed_net_income']:,.2f}",
+                help="5th percentile across rate paths of each path's lowest net income.")
+    col3.metric("Lowest ICR", f"{summary['stressed_icr']:.0%}" if np.isfinite(summary['stressed_icr']) else "n/a",
+                help="5th percentile across rate paths of each path's lowest rent-to-interest ratio.")
+    col4.metric("Paths Breaching the ICR", f"{summary['icr_breach_probability']:.1%}")
+
+    stress_metric = st.radio("Show", ["Monthly Repayment", "Net Monthly Income"], horizontal=True)
+    graph.set_inputs(stress_metric=stress_metric)
+    with profiler.section("figure_build"):
+        fig_stress = graph["stress_figure"]
+    with profiler.section("plotly_chart"):
+        st.plotly_chart(fig_stress, use_container_width=True)
+
+    shocks = pd.DataFrame({
+        "shock": RATE_SHOCKS,
+        "worst_payment": shocked.paths["worst_payment"][0],
+        "worst_net_income": shocked.paths["worst_net_income"][0],
+        "min_icr": shocked.paths["min_icr"][0],
+        "total_interest": shocked.paths["total_interest"][0],
+        "total_fees": shocked.paths["total_fees"][0],
+    })
+    st.dataframe(
+        shocks,
+        hide_index=True,
+        column_config={
+            "shock": st.column_config.NumberColumn("Rate Shock (% points)", format="+%.1f"),
+            "worst_payment": st.column_config.NumberColumn("Worst Repayment", format="£%,.2f"),
+            "worst_net_income": st.column_config.NumberColumn("Worst Net Income", format="£%,.2f"),
+            "min_icr": st.column_config.NumberColumn("Lowest ICR", format="percent"),
+            "total_interest": st.column_config.NumberColumn("Total Interest", format="£%,.0f"),
+            "total_fees": st.column_config.NumberColumn("Total Fees", format="£%,.0f"),
+        },
+    )
+    st.caption(f"Each row assumes every new {fixed_period}-year fix is offered that many points above today's "
+               f"{interest_rate:.2f}%. Rent and costs grow as set in the sidebar.")
+else:
+    st.warning("Please enter all mortgage details and a valid rent to stress test remortgaging.")
+
+# Deal Structure Optimiser
+st.header("Deal Structure Optimiser")
+if houseprice > 0 and rent > 0 and interest_rate > 0:
+    col1, col2, col3, col4 = st.columns(4)
+    budget = col1.number_input("Capital Budget (£)", value=float(max(total, houseprice * 0.3)), step=5000.0)
+    target = col2.selectbox("Optimise for", list(DEAL_TARGETS), format_func=DEAL_TARGETS.get)
+    max_ltv = col3.slider("Maximum Loan to Value (%)", 50, 95, 75)
+    income_tax_rate = col4.number_input(
+        "Income Tax Rate (%)", value=tax_rate * 100 if tax_treatment == PERSONAL else 40.0,
+        help="Used for the personal route."
+    )
+    corporation_tax_rate = col4.number_input(
+        "Corporation Tax Rate (%)", value=float(incometax) if tax_treatment == LIMITED_COMPANY else 19.0,
+        help="Used for the limited company route."
+    )
+    graph.set_inputs(
+        budget=budget,
+        target=target,
+        max_ltv=max_ltv / 100,
+        income_tax_rate=income_tax_rate / 100,
+        corporation_tax_rate=corporation_tax_rate / 100,
+    )
+    deal_structures = graph["deal_structures"]
+    if deal_structures.best.empty:
+        st.warning("The budget does not cover the smallest deposit allowed plus stamp duty.")
+    else:
+        st.dataframe(
+            deal_structures.best,
+            hide_index=True,
+            column_config={
+                "tax_treatment": "Tax Treatment",
+                "deposit": st.column_config.NumberColumn("Deposit", format="£%,.0f"),
+                "ltv": st.column_config.NumberColumn("LTV", format="percent"),
+                "length_of_mortgage": st.column_config.NumberColumn("Term (years)", format="%d"),
+                "stamp_duty": st.column_config.NumberColumn("Stamp Duty", format="£%,.0f"),
+                "capital": st.column_config.NumberColumn("Capital Required", format="£%,.0f"),
+                "monthly_repayment": st.column_config.NumberColumn("Monthly Repayment", format="£%,.2f"),
+                "net_income": st.column_config.NumberColumn("Net Monthly Income", format="£%,.2f"),
+                "cash_on_cash": st.column_config.NumberColumn("Year 1 Cash-on-Cash", format="percent"),
+                "irr": st.column_config.NumberColumn("IRR", format="percent"),
+            },
+        )
+        st.caption(f"{len(deal_structures.candidates):,} structures evaluated over a {years}-year hold.")
+        with profiler.section("plotly_chart"):
+            st.plotly_chart(graph["deal_frontier_figure"], use_container_width=True)
+else:
+    st.warning("Please enter a house price, rent and interest rate to optimise the deal structure.")
+
+# Saved Scenarios
+st.header("Saved Scenarios")
 
+@st.cache_resource
+def get_scenario_store():
+    return ScenarioStore()
 
+scenario_store = get_scenario_store()
+
+def scenario_inputs():
+    # Every keyed input widget, so that loading a scenario can restore them all
+    return {key.removeprefix("input."): value for key, value in st.session_state.items() if key.startswith("input.")}
+
+def scenario_outputs():
+    outputs = {"stamp_duty": stamp_duty_val, "total_capital": total}
+    if mortgage is not None:
+        outputs.update(
+            monthly_repayment=mortgage.repay,
+            net_income=float(net_inc(rent, mortgage, tax_treatment, tax_rate, management_charge_percent, fixed_costs)),
+            break_even_rent=float(graph["break_even"]),
+        )
+        if houseprice > 0:
+            # Missing returns are stored as null rather than NaN
+            returns = {"irr": investment_irr, "npv": investment_npv, "cash_on_cash": first_year_return, "payback_year": payback_year}
+            outputs.update({name: float(value) if np.isfinite(value) else None for name, value in returns.items()})
+    return outputs
+
+def load_scenario(scenario_id):
+    for name, value in scenario_store.load(scenario_id).inputs.items():
+        st.session_state[f"input.{name}"] = value
+
+def delete_scenario(scenario_id, user):
+    scenario_store.delete(scenario_id, user)
+    st.session_state.pop("scenario_delete", None)
+
+col1, col2 = st.columns(2)
+scenario_user = col1.text_input("Saved by", key="scenario_user", help="Scenarios are listed per person.") or "anonymous"
+scenario_name = col2.text_input("Scenario name", key="scenario_name")
+if st.button("💾 Save scenario"):
+    scenario_id = scenario_store.save(scenario_inputs(), scenario_outputs(), user=scenario_user, name=scenario_name or None)
+    st.success(f"Saved as scenario {scenario_id}.")
+
+saved = scenario_store.list_scenarios(user=scenario_user, limit=1000)
+if saved:
+    saved_frame = pd.DataFrame(saved, columns=ScenarioSummary._fields).drop(columns="user")
+    saved_frame["saved_at"] = pd.to_datetime(saved_frame["saved_at"])
+    st.dataframe(
+        saved_frame,
+        hide_index=True,
+        column_config={
+            "id": st.column_config.NumberColumn("ID", format="%d"),
+            "name": "Name",
+            "saved_at": st.column_config.DatetimeColumn("Saved", format="D MMM YYYY, HH:mm"),
+            "houseprice": st.column_config.NumberColumn("House Price", format="£%,.0f"),
+            "rent": st.column_config.NumberColumn("Rent", format="£%,.0f"),
+            "net_income": st.column_config.NumberColumn("Net Income", format="£%,.2f"),
+            "break_even_rent": st.column_config.NumberColumn("Break-even Rent", format="£%,.2f"),
+            "total_capital": st.column_config.NumberColumn("Total Capital", format="£%,.0f"),
+            "irr": st.column_config.NumberColumn("IRR", format="percent"),
+            "npv": st.column_config.NumberColumn("NPV", format="£%,.0f"),
+        },
+    )
+    col1, col2, col3 = st.columns([2, 1, 1])
+    labels = {scenario.id: f"{scenario.id}: {scenario.name or 'Untitled'} ({scenario.saved_at[:10]})" for scenario in saved}
+    selected = col1.selectbox("Scenario", list(labels), format_func=labels.get)
+    col2.button("Load", on_click=load_scenario, args=(selected,))
+    # Deleting takes a second click to confirm
+    if col3.button("Delete"):
+        st.session_state["scenario_delete"] = selected
+    if st.session_state.get("scenario_delete") in labels:
+        pending = st.session_state["scenario_delete"]
+        st.warning(f"Delete scenario {labels[pending]}? This cannot be undone.")
+        confirm_col, cancel_col = st.columns(2)
+        confirm_col.button("Confirm delete", on_click=delete_scenario, args=(pending, scenario_user), type="primary")
+        cancel_col.button("Cancel", on_click=st.session_state.pop, args=("scenario_delete", None))
+
+    def export_scenarios():
+        buffer = io.StringIO()
+        scenario_store.export_jsonl(buffer, user=scenario_user)
+        return buffer.getvalue()
+
+    st.download_button(
+        "Export all as JSON Lines",
+        data=export_scenarios,
+        file_name=f"scenarios-{scenario_user}.jsonl",
+        mime="application/jsonl",
+    )
+else:
+    st.caption("No saved scenarios yet.")
 
+profiler.finish(cache=result_cache)
@@ -1,32 +1,31 @@
 import streamlit as st
-import numpy_financial as npf
 import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from streamlit_lottie import st_lottie
-import requests
-import json
-
-# Helper functions
-def load_lottie(source):
-    if source.startswith('http'):
-        # If the source is a URL
-        r = requests.get(source)
-        if r.status_code != 200:
-            return None
-        return r.json()
-    else:
-        # If the source is a local file path
-        with open(source, 'r') as f:
-            return json.load(f)
-
-
-def convert_cost_to_annual(cost, period):
-    return cost * 12 if period == 'Monthly' else cost
-
-def ltv(deposit, houseprice):
-    return (houseprice - deposit)/houseprice
+from btl_model import (
+    DEFAULT_TABLE,
+    EBIT,
+    LIMITED_COMPANY,
+    MortgageTerms,
+    NOPAT,
+    PERSONAL,
+    STAMP_DUTY_TABLES,
+    break_even_rent,
+    convert_cost_to_annual,
+    mortgage_terms,
+    net_inc,
+    rate_shock_paths,
+    stamp_duty_additional,
+    stress_test,
+)
+from btl_model.comparison import OPTIONAL_COLUMNS, REQUIRED_COLUMNS, TAX_RATE_COLUMNS, plan_transfers
+from btl_ui.assets import load_lottie
+from btl_ui.charts import line_trace
+from btl_ui.profiling import RerunProfiler
 
+profiler = RerunProfiler("tax_comparison")
 
 # Set up the page
 st.set_page_config(page_title="BTL Tax Comparison", layout="wide", page_icon="🏠")
@@ -69,7 +68,8 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Load the Lottie animation
-lottie_house = load_lottie("1725915498155.json")
+with profiler.section("asset_load"):
+    lottie_house = load_lottie("1725915498155.json")
 
 # Main content
 col1, col2 = st.columns([2, 1])
@@ -290,144 +290,180 @@ with col2:
         value=19,
         help="The current rate of corporation tax applied to company profits."
     )
-# Function definitions for calculations
-def get_mortgage_details_per():
-    mort_req = purchase_price - (purchase_price - mort_remaining)
-    interest_rate_monthly = (interest_rate_per / 100) / 12
-    length_of_mortgage_monthly = length_of_mortgage_per * 12
-    mortgage_principle_sum = npf.ppmt(interest_rate_monthly, 1, length_of_mortgage_monthly, mort_req)
-    mortgage_interest = npf.ipmt(interest_rate_monthly, 1, length_of_mortgage_monthly, mort_req)
-    total_monthly_repay = npf.pmt(interest_rate_monthly, length_of_mortgage_monthly, mort_req)
-    return abs(mortgage_principle_sum), abs(mortgage_interest), abs(total_monthly_repay)
-
-def get_mortgage_details_ltd():
-    mort_req = purchase_price - (purchase_price - mort_remaining)
-    interest_rate_monthly = (interest_rate_ltd / 100) / 12
-    length_of_mortgage_monthly = length_of_mortgage_ltd * 12
-    mortgage_principle_sum = npf.ppmt(interest_rate_monthly, 1, length_of_mortgage_monthly, mort_req)
-    mortgage_interest = npf.ipmt(interest_rate_monthly, 1, length_of_mortgage_monthly, mort_req)
-    total_monthly_repay = npf.pmt(interest_rate_monthly, length_of_mortgage_monthly, mort_req)
-    return abs(mortgage_principle_sum), abs(mortgage_interest), abs(total_monthly_repay)
-
-def total_costs_per(rent_val):
-    return (service_charge_annual/12) + (rent_val * (management_charge_percent / 100)) + \
-        (maintenance_cost_annual/12) + (landlord_insurance_annual/12) + \
-        (building_insurance_annual/12) + (accountancy_cost_annual_per/12)
-
-def total_costs_ltd(rent_val):
-    return (service_charge_annual/12) + (rent_val * (management_charge_percent / 100)) + \
-        (maintenance_cost_annual/12) + (landlord_insurance_annual/12) + \
-        (building_insurance_annual/12) + (accountancy_cost_annual_ltd/12)
-
-def EBIT_per(rent_val):
-    return rent_val - total_costs_per(rent_val)
-
-def EBIT_ltd(rent_val):
-    mort_principle, mort_interest, mort_repay = get_mortgage_details_ltd()
-    return rent_val - (total_costs_ltd(rent_val) + mort_interest)
-
-def tax_credit(interest):
-    return float(interest * 0.2)
-
-def NOPAT_per(rent_val, interest):
-    return (EBIT_per(rent_val) - (EBIT_per(rent_val) * incometax)) + tax_credit(interest)
-
-def NOPAT_ltd(rent_val):
-    return (EBIT_ltd(rent_val) - (EBIT_ltd(rent_val) * (corptax/100)))
-
-def net_inc_per(rent_val, interest):
-    mort_principle, mort_interest, mort_repay = get_mortgage_details_per()
-    return NOPAT_per(rent_val, interest) - mort_repay
+# Model inputs for the calculation core
+mort_req = purchase_price - (purchase_price - mort_remaining)
+with profiler.section("mortgage_calc"):
+    mortgage_per = mortgage_terms(mort_req, interest_rate_per, length_of_mortgage_per)
+    mortgage_ltd = mortgage_terms(mort_req, interest_rate_ltd, length_of_mortgage_ltd)
+
+shared_costs_annual = service_charge_annual + maintenance_cost_annual + landlord_insurance_annual + building_insurance_annual
+fixed_costs_per = (shared_costs_annual + accountancy_cost_annual_per) / 12
+fixed_costs_ltd = (shared_costs_annual + accountancy_cost_annual_ltd) / 12
+
+def net_inc_per(rent_val):
+    return net_inc(rent_val, mortgage_per, PERSONAL, incometax, management_charge_percent, fixed_costs_per)
 
 def net_inc_ltd(rent_val):
-    mort_principle, mort_interest, mort_repay = get_mortgage_details_ltd()
-    return NOPAT_ltd(rent_val) - mort_principle
+    return net_inc(rent_val, mortgage_ltd, LIMITED_COMPANY, corptax / 100, management_charge_percent, fixed_costs_ltd)
 
 # Calculate financials
-mort_principle_per, mort_interest_per, mort_repay_per = get_mortgage_details_per()
-mort_principle_ltd, mort_interest_ltd, mort_repay_ltd = get_mortgage_details_ltd()
+mort_principle_per, mort_interest_per, mort_repay_per = mortgage_per
+mort_principle_ltd, mort_interest_ltd, mort_repay_ltd = mortgage_ltd
 
-ebit_per = EBIT_per(rent)
-nopat_per = NOPAT_per(rent, mort_interest_per)
-net_inc_per_val = net_inc_per(rent, mort_interest_per)
+ebit_per = EBIT(rent, mortgage_per, PERSONAL, management_charge_percent, fixed_costs_per)
+nopat_per = NOPAT(rent, mortgage_per, PERSONAL, incometax, management_charge_percent, fixed_costs_per)
+net_inc_per_val = net_inc_per(rent)
 
-ebit_ltd = EBIT_ltd(rent)
-nopat_ltd = NOPAT_ltd(rent)
+ebit_ltd = EBIT(rent, mortgage_ltd, LIMITED_COMPANY, management_charge_percent, fixed_costs_ltd)
+nopat_ltd = NOPAT(rent, mortgage_ltd, LIMITED_COMPANY, corptax / 100, management_charge_percent, fixed_costs_ltd)
 net_inc_ltd_val = net_inc_ltd(rent)
 
 # Visualization: Compare Personal vs Limited Company
 st.header("📊 Financial Comparison Visualization")
 
 # Create a subplot with 2 rows and 1 column
-fig = make_subplots(rows=2, cols=1, subplot_titles=("Monthly Financial Comparison", "Annual Financial Comparison"))
-
-# Monthly comparison
-monthly_data = {
-    'Category': ['Mortgage Repayment', 'EBIT', 'NOPAT', 'Net Income'],
-    'Personal': [mort_repay_per, ebit_per, nopat_per, net_inc_per_val],
-    'Limited Company': [mort_repay_ltd, ebit_ltd, nopat_ltd, net_inc_ltd_val]
-}
-
-fig.add_trace(
-    go.Bar(x=monthly_data['Category'], y=monthly_data['Personal'], name='Personal', marker_color='#3498db'),
-    row=1, col=1
-)
-fig.add_trace(
-    go.Bar(x=monthly_data['Category'], y=monthly_data['Limited Company'], name='Limited Company', marker_color='#e74c3c'),
-    row=1, col=1
-)
+with profiler.section("figure_build"):
+    fig = make_subplots(rows=2, cols=1, subplot_titles=("Monthly Financial Comparison", "Annual Financial Comparison"))
+
+    # Monthly comparison
+    monthly_data = {
+        'Category': ['Mortgage Repayment', 'EBIT', 'NOPAT', 'Net Income'],
+        'Personal': [mort_repay_per, ebit_per, nopat_per, net_inc_per_val],
+        'Limited Company': [mort_repay_ltd, ebit_ltd, nopat_ltd, net_inc_ltd_val]
+    }
 
-# Annual comparison (multiply monthly values by 12)
-annual_data = {
-    'Category': ['Mortgage Repayment', 'EBIT', 'NOPAT', 'Net Income'],
-    'Personal': [mort_repay_per*12, ebit_per*12, nopat_per*12, net_inc_per_val*12],
-    'Limited Company': [mort_repay_ltd*12, ebit_ltd*12, nopat_ltd*12, net_inc_ltd_val*12]
-}
+    fig.add_trace(
+        go.Bar(x=monthly_data['Category'], y=monthly_data['Personal'], name='Personal', marker_color='#3498db'),
+        row=1, col=1
+    )
+    fig.add_trace(
+        go.Bar(x=monthly_data['Category'], y=monthly_data['Limited Company'], name='Limited Company', marker_color='#e74c3c'),
+        row=1, col=1
+    )
 
-fig.add_trace(
-    go.Bar(x=annual_data['Category'], y=annual_data['Personal'], name='Personal', marker_color='#3498db', showlegend=False),
-    row=2, col=1
-)
-fig.add_trace(
-    go.Bar(x=annual_data['Category'], y=annual_data['Limited Company'], name='Limited Company', marker_color='#e74c3c', showlegend=False),
-    row=2, col=1
-)
+    # Annual comparison (multiply monthly values by 12)
+    annual_data = {
+        'Category': ['Mortgage Repayment', 'EBIT', 'NOPAT', 'Net Income'],
+        'Personal': [mort_repay_per*12, ebit_per*12, nopat_per*12, net_inc_per_val*12],
+        'Limited Company': [mort_repay_ltd*12, ebit_ltd*12, nopat_ltd*12, net_inc_ltd_val*12]
+    }
 
-# Update layout
-fig.update_layout(
-    height=800, 
-    title_text="Personal vs Limited Company Financial Comparison",
-    barmode='group'
-)
+    fig.add_trace(
+        go.Bar(x=annual_data['Category'], y=annual_data['Personal'], name='Personal', marker_color='#3498db', showlegend=False),
+        row=2, col=1
+    )
+    fig.add_trace(
+        go.Bar(x=annual_data['Category'], y=annual_data['Limited Company'], name='Limited Company', marker_color='#e74c3c', showlegend=False),
+        row=2, col=1
+    )
 
-fig.update_yaxes(title_text="Amount (£)", row=1, col=1)
-fig.update_yaxes(title_text="Amount (£)", row=2, col=1)
+    # Update layout
+    fig.update_layout(
+        height=800, 
+        title_text="Personal vs Limited Company Financial Comparison",
+        barmode='group'
+    )
 
-st.plotly_chart(fig, use_container_width=True)
+    fig.update_yaxes(title_text="Amount (£)", row=1, col=1)
+    fig.update_yaxes(title_text="Amount (£)", row=2, col=1)
+
+with profiler.section("plotly_chart"):
+    st.plotly_chart(fig, use_container_width=True)
 
 # Visualization: Break-Even Analysis
 st.header("📈 Break-Even Analysis")
 
 # Calculate break-even points
 x = np.linspace(rent * 0.5, rent * 1.5, 100)
-y_personal = [net_inc_per(i, mort_interest_per) for i in x]
-y_ltd = [net_inc_ltd(i) for i in x]
+with profiler.section("sweep"):
+    y_personal = net_inc_per(x)
+    y_ltd = net_inc_ltd(x)
 
 # Create break-even plot
-fig_breakeven = go.Figure()
+with profiler.section("figure_build"):
+    fig_breakeven = go.Figure()
+
+    fig_breakeven.add_trace(line_trace(x, y_personal, mode='lines', name='Personal', line=dict(color='#3498db')))
+    fig_breakeven.add_trace(line_trace(x, y_ltd, mode='lines', name='Limited Company', line=dict(color='#e74c3c')))
+    fig_breakeven.add_hline(y=0, line_dash="dash", line_color="green", annotation_text="Break-even point")
+
+    fig_breakeven.update_layout(
+        title='Break-Even Analysis: Personal vs Limited Company',
+        xaxis_title='Monthly Rent (£)',
+        yaxis_title='Net Monthly Income (£)',
+        hovermode='x unified'
+    )
 
-fig_breakeven.add_trace(go.Scatter(x=x, y=y_personal, mode='lines', name='Personal', line=dict(color='#3498db')))
-fig_breakeven.add_trace(go.Scatter(x=x, y=y_ltd, mode='lines', name='Limited Company', line=dict(color='#e74c3c')))
-fig_breakeven.add_hline(y=0, line_dash="dash", line_color="green", annotation_text="Break-even point")
+with profiler.section("plotly_chart"):
+    st.plotly_chart(fig_breakeven, use_container_width=True)
+
+# Solve both ownership routes together
+with profiler.section("sweep"):
+    break_even_per, break_even_ltd = break_even_rent(
+        MortgageTerms(*np.array([mortgage_per, mortgage_ltd]).T),
+        [PERSONAL, LIMITED_COMPANY],
+        [incometax, corptax / 100],
+        management_charge_percent,
+        np.array([fixed_costs_per, fixed_costs_ltd]),
+    )
+st.success(f"""
+📌 Rent required for cost-neutrality after tax:
+- Personal: £{break_even_per:,.2f}
+- Limited Company: £{break_even_ltd:,.2f}
+""")
 
-fig_breakeven.update_layout(
-    title='Break-Even Analysis: Personal vs Limited Company',
-    xaxis_title='Monthly Rent (£)',
-    yaxis_title='Net Monthly Income (£)',
-    hovermode='x unified'
+# Remortgage Stress Test
+st.header("📉 Remortgage Stress Test")
+st.markdown("""
+Each fixed rate ends after a few years. This tests both routes against rates that are higher at every
+remortgage, paying each route's arrangement fee (added to the loan) whenever a new fix is taken.
+""")
+col1, col2, col3 = st.columns(3)
+fixed_period = col1.selectbox("Fixed Period (years)", [2, 3, 5, 10], index=2, key='stress_fixed_period')
+svr_margin = col2.number_input(
+    "SVR above a new fix (%)", value=3.0, min_value=0.0, key='stress_svr_margin',
+    help="Charged when a loan cannot remortgage and reverts to the lender's standard variable rate."
 )
+icr_threshold = col3.number_input(
+    "Lender ICR Threshold (%)", value=125, step=5, key='stress_icr_threshold',
+    help="Rent as a percentage of the interest at the stressed rate that a lender requires to remortgage. "
+         "A loan that fails stays on the SVR."
+) / 100
 
-st.plotly_chart(fig_breakeven, use_container_width=True)
+rate_shocks = np.array([0.0, 1.0, 2.0, 3.0, 5.0])
+with profiler.section("stress_test"):
+    # Both routes are evaluated together as two loans. Each path is one parallel
+    # shock, added to each route's current rate for every new fix.
+    months = int(np.ceil(max(length_of_mortgage_per, length_of_mortgage_ltd) * 12))
+    routes = [PERSONAL, LIMITED_COMPANY]
+    stress = stress_test(
+        mort_req, [interest_rate_per, interest_rate_ltd], [length_of_mortgage_per, length_of_mortgage_ltd], rent,
+        rate_shock_paths(0.0, rate_shocks, months), fixed_period=fixed_period,
+        fixed_margin=[interest_rate_per, interest_rate_ltd],
+        svr_margin=[interest_rate_per + svr_margin, interest_rate_ltd + svr_margin],
+        arrangement_fee=[mort_arrangement_fee_personal, mort_arrangement_fee_ltd], switch_rule='icr',
+        icr_threshold=icr_threshold, tax_treatment=routes, tax_rate=[incometax, corptax / 100],
+        management_charge_percent=management_charge_percent, fixed_costs=[fixed_costs_per, fixed_costs_ltd],
+        percentiles=(0, 100),
+    )
+stress_table = pd.DataFrame({"shock": rate_shocks})
+for i, key in enumerate(("personal", "company")):
+    stress_table[f"net_income_{key}"] = stress.paths["worst_net_income"][i]
+    stress_table[f"icr_{key}"] = stress.paths["min_icr"][i]
+    stress_table[f"svr_months_{key}"] = stress.paths["svr_months"][i]
+st.dataframe(
+    stress_table,
+    hide_index=True,
+    column_config={
+        "shock": st.column_config.NumberColumn("Rate Shock (% points)", format="+%.1f"),
+        "net_income_personal": st.column_config.NumberColumn("Worst Net Income (Personal)", format="£%,.2f"),
+        "net_income_company": st.column_config.NumberColumn("Worst Net Income (Company)", format="£%,.2f"),
+        "icr_personal": st.column_config.NumberColumn("Lowest ICR (Personal)", format="percent"),
+        "icr_company": st.column_config.NumberColumn("Lowest ICR (Company)", format="percent"),
+        "svr_months_personal": st.column_config.NumberColumn("Months on SVR (Personal)", format="%d"),
+        "svr_months_company": st.column_config.NumberColumn("Months on SVR (Company)", format="%d"),
+    },
+)
 
 # Transfer to Company Costs
 st.header("📈 Transfer to Company Costs")
@@ -450,17 +486,14 @@ st.write(f"Estimated Capital Gains Tax: £{capital_gains_tax:,.2f}")
 
 # Additional Stamp Duty
 st.subheader("Additional Stamp Duty")
-def stamp_duty_additional(houseprice):
-    if houseprice <= 250000:
-        return houseprice * 0.03
-    elif 250000 < houseprice <= 925000:
-        return (houseprice - 250000) * 0.08 + 7500
-    elif 925000 < houseprice <= 1500000:
-        return (houseprice - 925000) * 0.13 + 61500
-    else:
-        return (houseprice - 1500000) * 0.15 + 136250
-
-additional_stamp_duty = stamp_duty_additional(current_market_value)
+stamp_duty_tables = list(STAMP_DUTY_TABLES)
+stamp_duty_table = st.selectbox(
+    "Stamp Duty rates in force from",
+    stamp_duty_tables,
+    index=stamp_duty_tables.index(DEFAULT_TABLE),
+    help="The Stamp Duty Land Tax rates that apply on the date of transfer."
+)
+additional_stamp_duty = stamp_duty_additional(current_market_value, table=stamp_duty_table)
 st.write(f"Additional Stamp Duty: £{additional_stamp_duty:,.2f}")
 
 # Other costs
@@ -487,6 +520,95 @@ Transfer Cost Summary:
 - Total Transfer Cost: £{total_transfer_cost:,.2f}
 """)
 
+# Portfolio Transfer Planner
+st.header("🏘️ Portfolio Transfer Planner")
+st.markdown("""
+Weigh the transfer cost of each property against the yearly difference in net income from holding it
+in a company, and see which properties are worth transferring first. Start from the property above,
+add rows, or upload a CSV with one property per row (cost columns are annual amounts, and tax rates
+are fractions: 0.19 for 19%).
+""")
+uploaded_portfolio = st.file_uploader(
+    "Upload a portfolio (CSV)",
+    type="csv",
+    help=(
+        f"Required columns: {', '.join(REQUIRED_COLUMNS)}. Optional: {', '.join(OPTIONAL_COLUMNS)}. "
+        f"Costs are annual amounts in £. Tax rates ({', '.join(TAX_RATE_COLUMNS)}) are fractions, "
+        "such as 0.19 for 19%; management_charge_percent is a percentage."
+    )
+)
+if uploaded_portfolio is not None:
+    transfer_portfolio = pd.read_csv(uploaded_portfolio)
+else:
+    transfer_portfolio = pd.DataFrame([{
+        "current_market_value": current_market_value,
+        "purchase_price": purchase_price,
+        "mortgage_remaining": mort_remaining,
+        "rent": rent,
+        "interest_rate_personal": interest_rate_per,
+        "length_of_mortgage_personal": length_of_mortgage_per,
+        "interest_rate_company": interest_rate_ltd,
+        "length_of_mortgage_company": length_of_mortgage_ltd,
+        "income_tax_rate": incometax,
+        "corporation_tax_rate": corptax / 100,
+        "management_charge_percent": management_charge_percent,
+        "service_charge": service_charge_annual,
+        "maintenance_cost": maintenance_cost_annual,
+        "landlord_insurance": landlord_insurance_annual,
+        "building_insurance": building_insurance_annual,
+        "accountancy_cost_personal": accountancy_cost_annual_per,
+        "accountancy_cost_company": accountancy_cost_annual_ltd,
+        "capital_gains_tax_rate": capital_gains_tax_rate,
+        "legal_fees": legal_fees,
+        "mortgage_arrangement_fee_company": mort_arrangement_fee_ltd,
+    }])
+transfer_portfolio = st.data_editor(transfer_portfolio, num_rows="dynamic", key="transfer_portfolio")
+horizon = st.slider("Worth transferring if paid back within (years)", 1, 30, 10)
+
+try:
+    transfer_plan = plan_transfers(transfer_portfolio.dropna(how="all"), horizon, stamp_duty_table)
+except (KeyError, ValueError) as e:
+    st.error(f"Could not plan the transfers: {e}")
+else:
+    worthwhile = transfer_plan.summary.iloc[1]
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Worth Transferring", f"{worthwhile['properties']:,.0f} of {len(transfer_plan.properties):,}")
+    col2.metric("Their Transfer Cost", f"£{worthwhile['total_transfer_cost']:,.0f}")
+    col3.metric("Their Yearly Gain", f"£{worthwhile['annual_difference']:,.0f}")
+
+    display_columns = {
+        "rank": st.column_config.NumberColumn("Rank", format="%d"),
+        "total_transfer_cost": st.column_config.NumberColumn("Transfer Cost", format="£%,.0f"),
+        "annual_difference": st.column_config.NumberColumn("Yearly Gain in Company", format="£%,.0f"),
+        "payback_year": st.column_config.NumberColumn("Payback Year", format="%d"),
+        "worth_transferring": st.column_config.CheckboxColumn("Worth Transferring"),
+        "capital_gains_tax": st.column_config.NumberColumn("CGT", format="£%,.0f"),
+        "additional_stamp_duty": st.column_config.NumberColumn("Stamp Duty", format="£%,.0f"),
+        "current_market_value": st.column_config.NumberColumn("Market Value", format="£%,.0f"),
+        "rent": st.column_config.NumberColumn("Rent", format="£%,.0f"),
+    }
+    st.dataframe(
+        transfer_plan.properties,
+        hide_index=True,
+        column_order=list(display_columns),
+        column_config=display_columns,
+    )
+
+    with profiler.section("figure_build"):
+        ranked = transfer_plan.properties
+        fig_transfer = go.Figure()
+        fig_transfer.add_trace(line_trace(ranked["rank"], ranked["cumulative_transfer_cost"], mode='lines', name='Cumulative Transfer Cost', line=dict(color='#e74c3c')))
+        fig_transfer.add_trace(line_trace(ranked["rank"], ranked["cumulative_annual_difference"] * horizon, mode='lines', name=f'Cumulative Gain over {horizon} Years', line=dict(color='#3498db')))
+        fig_transfer.update_layout(
+            title='Transferring Properties in Ranked Order',
+            xaxis_title='Properties Transferred',
+            yaxis_title='Amount (£)',
+            hovermode='x unified'
+        )
+
+    with profiler.section("plotly_chart"):
+        st.plotly_chart(fig_transfer, use_container_width=True)
+
 # Explanation of results
 st.info("""
 ℹ️ **Interpretation of Results:**
@@ -506,3 +628,5 @@ st.warning("""
 The calculations are based on simplified models and may not account for all factors relevant to your specific situation. 
 Always consult with a qualified professional before making financial decisions.
 """)
+
+profiler.finish()
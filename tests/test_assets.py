@@ -0,0 +1,50 @@
+import pytest
+
+from btl_ui import assets
+
+URL = 'https://example.com/animation.json'
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, animation=None):
+        self.status_code = status_code
+        self.animation = animation
+
+    def raise_for_status(self):
+        if self.status_code != 200:
+            raise OSError(f"{self.status_code} error")
+
+    def json(self):
+        return self.animation
+
+
+@pytest.fixture
+def responses(monkeypatch, tmp_path):
+    requests = pytest.importorskip('requests')
+    responses = []
+    clock = [1000.0]
+    monkeypatch.setattr(requests, 'get', lambda url, timeout: responses.pop(0))
+    monkeypatch.setattr(assets.time, 'monotonic', lambda: clock[0])
+    monkeypatch.setattr(assets, 'CACHE_DIR', str(tmp_path))
+    for name in ('_pending', '_submitted', '_remote'):
+        monkeypatch.setattr(assets, name, {})
+    return responses, clock
+
+
+def test_failed_fetch_is_retried_after_the_interval(responses):
+    queue, clock = responses
+    queue.append(FakeResponse(503))
+    assert assets.load_lottie(URL, timeout=5) is None
+
+    # Within the interval the failure stands, without another request
+    queue.append(FakeResponse(200, {'v': 1}))
+    clock[0] += assets.RETRY_INTERVAL / 2
+    assert assets.load_lottie(URL, timeout=5) is None
+    assert len(queue) == 1
+
+    clock[0] += assets.RETRY_INTERVAL
+    assert assets.load_lottie(URL, timeout=5) == {'v': 1}
+    assert queue == []
+    # Then served from memory
+    assert assets.load_lottie(URL, timeout=5) == {'v': 1}
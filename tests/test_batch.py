@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from btl_model.batch import MODELS, RowError, parse_chunk, parse_row
+
+MODEL = MODELS['buy_to_let']
+
+VALID = {
+    'houseprice': 250000, 'deposit': 62500, 'rent': 1200, 'interest_rate': 4.5,
+    'length_of_mortgage': 25, 'tax_rate': 0.4,
+}
+
+
+def _records():
+    return [
+        dict(VALID, id='json'),
+        {key: str(value) for key, value in VALID.items()},
+        dict(VALID, tax_treatment=' limited company ', additional_property='no', service_charge=''),
+        dict(VALID, first_time_buyer=True, non_resident='Y', years=5),
+        dict(VALID, houseprice=True),
+        dict(VALID, deposit=False),
+        dict(VALID, service_charge=True),
+        dict(VALID, rent='abc'),
+        dict(VALID, interest_rate=float('nan')),
+        dict(VALID, tax_rate='inf'),
+        {key: value for key, value in VALID.items() if key != 'rent'},
+        dict(VALID, tax_treatment='Partnership'),
+        dict(VALID, additional_property='maybe'),
+        ['not', 'an', 'object'],
+        None,
+    ]
+
+
+def _parse_rows(batch):
+    parsed, failed = [], []
+    for line_number, record in batch:
+        try:
+            if record is None:
+                raise RowError("malformed line")
+            parsed.append((line_number, parse_row(record, MODEL)))
+        except RowError:
+            failed.append(line_number)
+    return parsed, failed
+
+
+def test_parse_chunk_matches_parse_row():
+    batch = list(enumerate(_records(), start=1))
+    errors = []
+    line_numbers, ids, columns = parse_chunk(batch, MODEL, lambda line_number, message, record: errors.append(line_number))
+    parsed, failed = _parse_rows(batch)
+
+    assert errors == failed
+    assert line_numbers == [line_number for line_number, _ in parsed]
+    assert len(ids) == len(line_numbers)
+    for column in (*MODEL.required, *MODEL.optional):
+        assert list(columns[column]) == [row[column] for _, row in parsed], column
+
+
+@pytest.mark.parametrize('column', ['houseprice', 'service_charge'])
+@pytest.mark.parametrize('flag', [True, False])
+def test_booleans_are_not_numbers(column, flag):
+    record = dict(VALID, **{column: flag})
+    with pytest.raises(RowError, match='expected a number'):
+        parse_row(record, MODEL)
+    errors = []
+    line_numbers, _, columns = parse_chunk([(1, record)], MODEL, lambda *error: errors.append(error))
+    assert line_numbers == []
+    assert [(line_number, message) for line_number, message, _ in errors] == [(1, f"{column}: expected a number, got {flag!r}")]
+    assert all(len(values) == 0 for values in columns.values())
+
+
+def test_all_valid_chunk():
+    batch = [(i, dict(VALID, houseprice=100000 + i)) for i in range(1, 101)]
+    line_numbers, _, columns = parse_chunk(batch, MODEL, lambda *error: pytest.fail(f"unexpected error {error}"))
+    assert line_numbers == list(range(1, 101))
+    np.testing.assert_array_equal(columns['houseprice'], 100000 + np.arange(1, 101))
+    assert set(columns['tax_treatment']) == {'Personal'}
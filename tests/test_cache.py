@@ -0,0 +1,133 @@
+import pickle
+import sqlite3
+
+import numpy as np
+import pytest
+
+from btl_model import cache as cache_module
+from btl_model.cache import CacheStats, ResultCache, scenario_key
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'results_cache.db')
+
+
+def _counters(path):
+    with sqlite3.connect(path) as conn:
+        return dict((namespace, (hits, misses)) for namespace, hits, misses in conn.execute('SELECT * FROM counters'))
+
+
+def test_scenario_key_is_canonical():
+    inputs = {'houseprice': 250000, 'rates': np.array([1.0, 2.0]), 'flags': (True, 'Personal')}
+    assert scenario_key('a', inputs) == scenario_key('a', {
+        'flags': [np.bool_(True), 'Personal'], 'rates': np.array([1.0, 2.0]), 'houseprice': 250000.0,
+    })
+    assert scenario_key('a', {'x': 0.0}) == scenario_key('a', {'x': -0.0})
+    assert scenario_key('a', inputs) != scenario_key('b', inputs)
+    assert scenario_key('a', {'rates': np.array([1.0, 2.0])}) != scenario_key('a', {'rates': np.array([1.0, 2.5])})
+    assert scenario_key('a', {'x': np.nan}) != scenario_key('a', {'x': np.inf})
+    with pytest.raises(TypeError):
+        scenario_key('a', {'x': object()})
+
+
+def test_get_and_set(path, clock):
+    cache = ResultCache(path)
+    assert cache.get('a', {'x': 1}) is None
+    cache.set('a', {'x': 1}, {'value': np.arange(3)})
+    np.testing.assert_array_equal(cache.get('a', {'x': 1.0})['value'], np.arange(3))
+    assert cache.get('b', {'x': 1}, 'missing') == 'missing'
+    assert cache.stats() == CacheStats(1, 2, 1, len(pickle.dumps({'value': np.arange(3)}, protocol=pickle.HIGHEST_PROTOCOL)))
+    assert cache.stats('a').hits == 1 and cache.stats('a').misses == 1
+
+
+def test_entries_expire(path, clock):
+    cache = ResultCache(path, ttl=60)
+    cache.set('a', {'x': 1}, 'old')
+    clock.now += 59
+    assert cache.get('a', {'x': 1}) == 'old'
+    clock.now += 2
+    assert cache.get('a', {'x': 1}) is None
+    # Expired entries are deleted by the next eviction, not by the lookup
+    assert cache.stats().entries == 1
+    cache.set('a', {'x': 2}, 'new')
+    assert cache.stats().entries == 1
+    assert cache.get('a', {'x': 2}) == 'new'
+
+
+def test_least_recently_used_are_evicted(path, clock):
+    value = b'x' * 1000
+    size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    cache = ResultCache(path, max_bytes=2 * size)
+    for name in 'ab':
+        cache.set('a', {'name': name}, value)
+        clock.now += 1
+    # Reading 'a' makes 'b' the least recently used, though only in memory until the next set
+    assert cache.get('a', {'name': 'a'}) == value
+    clock.now += 1
+    cache.set('a', {'name': 'c'}, value)
+    assert cache.get('a', {'name': 'b'}) is None
+    assert cache.get('a', {'name': 'a'}) == value
+    assert cache.get('a', {'name': 'c'}) == value
+    assert cache.stats().entries == 2
+
+    # A value larger than the whole cache is not stored
+    cache.set('a', {'name': 'd'}, b'x' * (3 * size))
+    assert cache.get('a', {'name': 'd'}) is None
+
+
+def test_lookups_do_not_write_until_flushed(path, clock):
+    cache = ResultCache(path, flush_every=3)
+    cache.set('a', {'x': 1}, 1)
+    cache.get('a', {'x': 1})
+    cache.get('a', {'x': 2})
+    assert _counters(path) == {}
+    cache.get('a', {'x': 1})
+    assert _counters(path) == {'a': (2, 1)}
+    cache.get('a', {'x': 2})
+    cache.flush()
+    assert _counters(path) == {'a': (2, 2)}
+
+
+def test_counters_are_shared(path, clock):
+    first, second = ResultCache(path), ResultCache(path)
+    first.set('a', {'x': 1}, 1)
+    assert second.get('a', {'x': 1}) == 1
+    assert first.get('a', {'x': 2}) is None
+    # Each process's counts reach the others when it flushes
+    second.flush()
+    assert first.stats() == second.stats() == CacheStats(1, 1, 1, first.stats().size)
+
+    second.clear()
+    assert first.stats() == CacheStats(0, 0, 0, 0)
+
+
+def test_memoize(path, clock):
+    cache = ResultCache(path)
+    calls = []
+
+    @cache.memoize
+    def add(a, b=2):
+        calls.append((a, b))
+        return a + b
+
+    assert add(1) == add(1, 2) == add(a=1.0, b=2) == 3
+    assert add(1, 3) == 4
+    assert calls == [(1, 2), (1, 3)]
+    assert cache.stats(f'{add.__module__}.{add.__qualname__}') == CacheStats(2, 2, 2, cache.stats().size)
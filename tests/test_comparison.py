@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from btl_model.comparison import TAX_RATE_COLUMNS, evaluate_comparison_columns, plan_transfers
+
+PROPERTY = {
+    'current_market_value': 300000, 'purchase_price': 200000, 'mortgage_remaining': 150000, 'rent': 1500,
+    'interest_rate_personal': 4.0, 'length_of_mortgage_personal': 20,
+    'interest_rate_company': 5.0, 'length_of_mortgage_company': 25,
+    'income_tax_rate': 0.4, 'corporation_tax_rate': 0.19,
+}
+
+
+def _columns(**overrides):
+    return {column: np.array([value, overrides.get(column, value)]) for column, value in PROPERTY.items()}
+
+
+@pytest.mark.parametrize('column', TAX_RATE_COLUMNS)
+@pytest.mark.parametrize('rate', [19, -0.1, 1.01])
+def test_tax_rates_must_be_fractions(column, rate):
+    columns = _columns()
+    columns[column] = np.array([0.2, rate])
+    with pytest.raises(ValueError, match=f"{column} must be a fraction between 0 and 1"):
+        evaluate_comparison_columns(columns)
+
+
+def test_tax_rate_bounds_are_allowed():
+    columns = _columns(income_tax_rate=0.0, corporation_tax_rate=1.0)
+    outputs = evaluate_comparison_columns(dict(columns, capital_gains_tax_rate=np.array([0.0, 1.0])))
+    np.testing.assert_allclose(outputs['capital_gains_tax'], [0.0, 100000.0])
+
+
+def test_plan_transfers():
+    # Unmortgaged, so net income is rent less tax: £600 a month personally at 40% and
+    # £810 in a company at 19%, on £1,000 rent. Transfers pay 3% stamp duty on £100k.
+    base = dict(
+        PROPERTY, current_market_value=100000, purchase_price=100000, mortgage_remaining=0, rent=1000,
+        legal_fees=0, capital_gains_tax_rate=0.24,
+    )
+    properties = pd.DataFrame([
+        dict(base, name='never', corporation_tax_rate=0.4),
+        dict(base, name='slow', purchase_price=50000),
+        dict(base, name='quick', legal_fees=2040),
+        dict(base, name='half rent', rent=500, legal_fees=1000),
+    ])
+    plan = plan_transfers(properties, horizon=5, stamp_duty_table='2022-09-23')
+    ranked = plan.properties
+
+    assert list(ranked['name']) == ['quick', 'half rent', 'slow', 'never']
+    assert list(ranked['rank']) == [1, 2, 3, 4]
+    np.testing.assert_allclose(ranked['total_transfer_cost'], [5040, 4000, 15000, 3000])
+    np.testing.assert_allclose(ranked['annual_difference'], [2520, 1260, 2520, 0])
+    # 5040 / 2520 = 2 years; 4000 / 1260 = 3.2; 15000 / 2520 = 6.0
+    np.testing.assert_array_equal(ranked['payback_year'], [2, 4, 6, np.nan])
+    assert list(ranked['worth_transferring']) == [True, True, False, False]
+    np.testing.assert_allclose(ranked['cumulative_transfer_cost'], [5040, 9040, 24040, 27040])
+
+    assert list(plan.summary.index) == ['All properties', 'Paying back within 5 years']
+    np.testing.assert_allclose(plan.summary.to_numpy(dtype=float), [
+        [4, 27040, 6300, 5],
+        [2, 9040, 3780, 3],
+    ])
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from benchmarks import reference
+from btl_model import PERSONAL, LIMITED_COMPANY, amortization_schedule, break_even_rent, first_month_terms, net_inc
+from btl_model.mortgage import outstanding_balance
+
+LOANS = [(90_000, 3.5, 25), (250_000, 6.25, 30), (40_000, 0.5, 5)]
+
+
+@pytest.mark.parametrize('principal, interest_rate, years', LOANS)
+def test_schedule_matches_numpy_financial(principal, interest_rate, years):
+    capital, interest, balance, cumulative_interest = reference.amortization_schedule(principal, interest_rate, years)
+    schedule = amortization_schedule(principal, interest_rate, years)
+    np.testing.assert_allclose(schedule.capital, capital, rtol=1e-9)
+    np.testing.assert_allclose(schedule.interest, interest, rtol=1e-9)
+    np.testing.assert_allclose(schedule.balance, balance, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(schedule.cumulative_interest, cumulative_interest, rtol=1e-9)
+    np.testing.assert_allclose(outstanding_balance(principal, interest_rate, years, np.arange(1, years * 12 + 1)),
+                               balance, rtol=1e-9, atol=1e-6)
+
+
+def test_schedule_for_many_loans_matches_one_at_a_time():
+    principal, interest_rate, years = (np.array(column, dtype=float) for column in zip(*LOANS))
+    schedules = amortization_schedule(principal, interest_rate, years)
+    assert schedules.payment.shape == (len(LOANS), 360)
+    for i, loan in enumerate(LOANS):
+        single = amortization_schedule(*loan)
+        months = len(single.month)
+        np.testing.assert_allclose(schedules.payment[i, :months], single.payment)
+        assert not schedules.payment[i, months:].any()
+
+
+def test_first_month_matches_numpy_financial():
+    terms = first_month_terms(*(np.array(column, dtype=float) for column in zip(*LOANS)))
+    np.testing.assert_allclose(np.column_stack(terms), [reference.get_mortgage_details(*loan) for loan in LOANS])
+
+
+@pytest.mark.parametrize('tax_treatment, tax_rate', [(PERSONAL, 0.4), (LIMITED_COMPANY, 0.19)])
+def test_break_even_rent_zeroes_net_income(tax_treatment, tax_rate):
+    mortgage = first_month_terms(90_000, 3.5, 25)
+    rent = break_even_rent(mortgage, tax_treatment, tax_rate, management_charge_percent=10, fixed_costs=150)
+    assert net_inc(rent, mortgage, tax_treatment, tax_rate, 10, 150) == pytest.approx(0, abs=1e-6)
+
+
+def test_break_even_rent_matches_polyfit():
+    mortgage = first_month_terms(90_000, 3.5, 25)
+    expected = reference.break_even_polyfit(
+        lambda rent: reference.net_inc_per(rent, mortgage, 0.4, 10, 150), 1_000,
+    )
+    assert break_even_rent(mortgage, PERSONAL, 0.4, 10, 150) == pytest.approx(expected, abs=0.01)
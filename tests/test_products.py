@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from btl_model import LIMITED_COMPANY, PERSONAL, amortization_schedule
+from btl_model.mortgage import outstanding_balance
+from btl_model.products import compare_products
+
+# £150k borrowed on a £200k purchase (75% LTV) over 25 years, let at £1,000 a month
+DEAL = dict(houseprice=200_000, deposit=50_000, rent=1000, length_of_mortgage=25)
+LOAN = 150_000
+
+PRODUCTS = pd.DataFrame([
+    dict(name='two year', rate=4.0, fixed_period=2, arrangement_fee=1500),
+    dict(name='five year', rate=4.5, fixed_period=5, arrangement_fee=0),
+    dict(name='interest only', rate=4.0, fixed_period=2, arrangement_fee=500, repayment_type='Interest-only'),
+    dict(name='low ltv', rate=3.5, fixed_period=2, arrangement_fee=0, max_ltv=60),
+    # Rent covers the interest at 8% only 1.0 times
+    dict(name='stressed', rate=3.5, fixed_period=2, arrangement_fee=0, icr_stress_rate=8.0),
+    dict(name='company only', rate=3.5, fixed_period=2, arrangement_fee=0, ownership=LIMITED_COMPANY),
+])
+
+
+def _by_name(result):
+    return result.set_index('name')
+
+
+def test_eligibility():
+    result = _by_name(compare_products(PRODUCTS, tax_treatment=PERSONAL, **DEAL))
+    assert result['reason'].to_dict() == {
+        'two year': '', 'five year': '', 'interest only': '',
+        'low ltv': "LTV above the product's maximum",
+        'stressed': "Rent below the lender's ICR",
+        'company only': 'Not available to personal buyers',
+    }
+    assert result.loc['stressed', 'icr_cover'] == pytest.approx(1.0)
+    assert result.loc['two year', 'ltv'] == pytest.approx(0.75)
+
+    company = _by_name(compare_products(PRODUCTS, tax_treatment=LIMITED_COMPANY, tax_rate=0.19, **DEAL))
+    assert company.loc['company only', 'eligible']
+
+
+def test_costs_over_the_fix():
+    result = _by_name(compare_products(PRODUCTS, **DEAL))
+    for name, rate, years in (('two year', 4.0, 2), ('five year', 4.5, 5)):
+        schedule = amortization_schedule(LOAN, rate, 25)
+        months = years * 12
+        row = result.loc[name]
+        assert row['interest_over_fix'] == pytest.approx(schedule.cumulative_interest[months - 1])
+        assert row['balance_after_fix'] == pytest.approx(schedule.balance[months - 1])
+        assert row['balance_after_fix'] == pytest.approx(outstanding_balance(LOAN, rate, 25, months))
+        assert row['monthly_payment'] == pytest.approx(schedule.capital[0] + schedule.interest[0])
+        assert row['true_cost'] == pytest.approx(row['interest_over_fix'] + row['fees'])
+        assert row['annual_cost'] == pytest.approx(row['true_cost'] / years)
+
+    interest_only = result.loc['interest only']
+    assert interest_only['monthly_payment'] == pytest.approx(LOAN * 0.04 / 12)
+    assert interest_only['interest_over_fix'] == pytest.approx(LOAN * 0.04 * 2)
+    assert interest_only['balance_after_fix'] == LOAN
+    assert interest_only['true_cost'] == pytest.approx(LOAN * 0.04 * 2 + 500)
+
+
+def test_rank():
+    result = compare_products(PRODUCTS, **DEAL)
+    eligible = result[result['eligible']]
+    # Cheapest per year of the fix first: the two-year fix has the lower rate,
+    # but its fee spread over two years costs more than the five-year's interest
+    assert list(eligible['name']) == ['interest only', 'five year', 'two year']
+    assert list(eligible['annual_cost']) == sorted(eligible['annual_cost'])
+    assert list(eligible['rank']) == [1, 2, 3]
+    assert result['rank'][~result['eligible']].isna().all()
+    assert list(result['eligible']) == [True] * 3 + [False] * 3
+
+    only = compare_products(PRODUCTS, eligible_only=True, **DEAL)
+    assert list(only['name']) == list(eligible['name'])
+
+
+def test_fee_added_to_loan():
+    result = _by_name(compare_products(PRODUCTS, add_fee_to_loan=True, **DEAL))
+    assert result.loc['two year', 'loan'] == LOAN + 1500
+    schedule = amortization_schedule(LOAN + 1500, 4.0, 25)
+    assert result.loc['two year', 'interest_over_fix'] == pytest.approx(schedule.cumulative_interest[23])
+    # The borrowed fee takes the loan over 75%
+    assert not result.loc['two year', 'eligible']
+    assert np.isclose(result.loc['five year', 'ltv'], 0.75)
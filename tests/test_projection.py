@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from btl_model import LIMITED_COMPANY, PERSONAL, amortization_schedule, net_inc
+from btl_model.mortgage import MortgageTerms
+from btl_model.projection import project
+
+DEAL = dict(houseprice=250_000, mort_req=187_500, rent=1200, interest_rate=4.5, length_of_mortgage=25)
+INCOME = dict(tax_rate=0.4, management_charge_percent=10, fixed_costs=150)
+
+
+def test_monthly_mortgage_matches_schedule():
+    frame = project(years=30, frequency='monthly', **DEAL)
+    schedule = amortization_schedule(DEAL['mort_req'], DEAL['interest_rate'], DEAL['length_of_mortgage'])
+    n = len(schedule.month)
+    np.testing.assert_allclose(frame['mortgage_interest'][:n], schedule.interest, rtol=1e-12)
+    np.testing.assert_allclose(frame['mortgage_capital'][:n], schedule.capital, rtol=1e-12)
+    np.testing.assert_allclose(frame['balance'][:n], schedule.balance, rtol=1e-12, atol=1e-9)
+    # Paid off after the term
+    assert (frame['balance'][n:] == 0).all() and (frame['mortgage_payment'][n:] == 0).all()
+
+    annual = project(years=30, **DEAL)
+    np.testing.assert_allclose(annual['mortgage_interest'][:25], schedule.interest.reshape(25, 12).sum(axis=1))
+    np.testing.assert_allclose(annual['balance'][:25], schedule.balance[11::12], atol=1e-9)
+
+
+@pytest.mark.parametrize('tax_treatment', [PERSONAL, LIMITED_COMPANY])
+def test_first_year_net_income(tax_treatment):
+    # Unmortgaged and without inflation every month is the same: 12 x the first month
+    frame = project(**dict(DEAL, mort_req=0), years=3, tax_treatment=tax_treatment, **INCOME)
+    first_month = net_inc(DEAL['rent'], MortgageTerms(0.0, 0.0, 0.0), tax_treatment, **INCOME)
+    np.testing.assert_allclose(frame['net_income'], 12 * first_month)
+
+    # With a mortgage, the months differ only by the interest and capital of the schedule
+    frame = project(years=1, tax_treatment=tax_treatment, **DEAL, **INCOME)
+    schedule = amortization_schedule(DEAL['mort_req'], DEAL['interest_rate'], DEAL['length_of_mortgage'])
+    months = MortgageTerms(schedule.capital[:12], schedule.interest[:12], schedule.payment[:12])
+    assert frame['net_income'][0] == pytest.approx(net_inc(DEAL['rent'], months, tax_treatment, **INCOME).sum())
@@ -0,0 +1,40 @@
+import numpy as np
+import numpy_financial as npf
+import pytest
+
+from btl_model import irr, npv, payback_period
+
+
+def _cash_flows(n=200, years=10, seed=0):
+    rng = np.random.default_rng(seed)
+    outlay = rng.uniform(20_000, 200_000, n)
+    income = rng.uniform(-5_000, 20_000, (n, years))
+    proceeds = rng.uniform(0, 300_000, n)
+    flows = np.concatenate([-outlay[:, None], income], axis=1)
+    flows[:, -1] += proceeds
+    return flows
+
+
+def test_npv_matches_numpy_financial():
+    flows = _cash_flows()
+    rates = np.linspace(-0.05, 0.2, len(flows))
+    np.testing.assert_allclose(npv(rates, flows), [npf.npv(rate, row) for rate, row in zip(rates, flows)], rtol=1e-9)
+    assert npv(0.05, flows[0]) == pytest.approx(npf.npv(0.05, flows[0]))
+
+
+def test_irr_matches_numpy_financial():
+    flows = _cash_flows()
+    expected = np.array([npf.irr(row) for row in flows])
+    np.testing.assert_allclose(irr(flows), expected, rtol=1e-7, atol=1e-9, equal_nan=True)
+    assert irr(flows[0]) == pytest.approx(expected[0])
+
+
+def test_irr_without_a_sign_change_is_nan():
+    assert np.isnan(irr([100.0, 10.0, 10.0]))
+    assert np.isnan(irr([-100.0, -10.0, -10.0]))
+
+
+def test_payback_period():
+    np.testing.assert_array_equal(
+        payback_period([[-100, 50, 50, 50], [-100, 10, 10, 10]]), [2, np.nan],
+    )
@@ -0,0 +1,137 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from btl_model import portfolio
+from btl_model.batch import MODELS, Model, parse_row
+from btl_model.service import ENDPOINTS, CalculationService
+
+SCENARIO = {
+    'houseprice': 250000, 'deposit': 62500, 'rent': 1200, 'interest_rate': 4.5,
+    'length_of_mortgage': 25, 'tax_rate': 0.4,
+}
+
+
+def _dispatch(*requests):
+    # Requests sent together are coalesced, as they would be under load
+    async def send():
+        service = CalculationService(max_workers=1)
+        try:
+            return await asyncio.gather(*(service.dispatch(method, path, body) for method, path, body in requests))
+        finally:
+            service.close()
+
+    return [(status, json.loads(text)) for status, text in asyncio.run(send())]
+
+
+def _post(path, payload):
+    return 'POST', path, json.dumps(payload).encode()
+
+
+def test_health_and_routing():
+    assert _dispatch(('GET', '/health', b''), ('GET', '/mortgage?x=1', b''), ('POST', '/nowhere', b'{}')) == [
+        (200, {'status': 'ok'}),
+        (405, {'error': 'Use POST'}),
+        (404, {'error': 'No endpoint /nowhere'}),
+    ]
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/mortgage', b'{not json'),
+    ('/mortgage', b'[1, 2]'),
+    ('/mortgage', b'{"principal": 1000, "interest_rate": 4}'),
+    ('/mortgage', b'{"principal": true, "interest_rate": 4, "length_of_mortgage": 25}'),
+    ('/stamp-duty', b'{"houseprice": 250000, "stamp_duty_table": ["x"]}'),
+    ('/stamp-duty', b'{"houseprice": 250000, "stamp_duty_table": "1066"}'),
+    ('/batch', b'{"scenarios": {}}'),
+    ('/batch', b'{"endpoint": ["/mortgage"], "scenarios": []}'),
+    ('/batch', b'{"endpoint": {"a": 1}, "scenarios": []}'),
+    ('/batch', b'{"endpoint": "/nowhere", "scenarios": []}'),
+    ('/batch', b'{"endpoint": "/stamp-duty", "scenarios": [], "stamp_duty_table": {"a": 1}}'),
+])
+def test_bad_requests(path, body):
+    [(status, response)] = _dispatch(('POST', path, body))
+    assert status == 400
+    assert set(response) == {'error'}
+
+
+def test_single_requests_match_portfolio():
+    scenarios = [dict(SCENARIO, houseprice=price) for price in (80_000, 250_000, 1_200_000)]
+    responses = _dispatch(*(_post('/buy-to-let', scenario) for scenario in scenarios))
+    rows = [parse_row(scenario, MODELS['buy_to_let']) for scenario in scenarios]
+    expected = portfolio.evaluate_columns({column: np.array([row[column] for row in rows]) for column in rows[0]})
+    for i, (status, response) in enumerate(responses):
+        assert status == 200
+        assert set(response) == set(portfolio.OUTPUT_COLUMNS)
+        for name, value in response.items():
+            if value is None:
+                assert not np.isfinite(expected[name][i])
+            else:
+                assert value == pytest.approx(expected[name][i])
+
+    [(status, response)] = _dispatch(_post('/net-income', SCENARIO))
+    assert status == 200 and set(response) == {'monthly_repayment', 'net_income'}
+
+
+def test_batch_reports_results_and_errors():
+    scenarios = [SCENARIO, dict(SCENARIO, rent='abc'), 'not an object', dict(SCENARIO, houseprice=400000)]
+    [(status, response)] = _dispatch(_post('/batch', {'endpoint': '/buy-to-let', 'scenarios': scenarios}))
+    assert status == 200
+    assert [result['index'] for result in response['results']] == [0, 3]
+    assert [error['index'] for error in response['errors']] == [1, 2]
+
+    [(_, single)] = _dispatch(_post('/buy-to-let', scenarios[3]))
+    assert response['results'][1]['net_income'] == pytest.approx(single['net_income'])
+
+
+def test_failing_request_does_not_fail_its_neighbours(monkeypatch):
+    calls = []
+
+    def evaluate(columns, stamp_duty_table=None):
+        calls.append(len(columns['x']))
+        if (columns['x'] < 0).any():
+            raise ValueError("x must not be negative")
+        return {'y': columns['x'] * 2}
+
+    monkeypatch.setitem(ENDPOINTS, '/double', (Model(evaluate, ('x',), {}, ('y',)), ('y',)))
+    responses = _dispatch(*(_post('/double', {'x': x}) for x in (1, -1, 3)))
+    assert responses == [(200, {'y': 2.0}), (400, {'error': 'x must not be negative'}), (200, {'y': 6.0})]
+    # Evaluated together, then one at a time after the failure
+    assert calls == [3, 1, 1, 1]
+
+
+def _exchange(request):
+    # One raw request over a real connection; the response as bytes
+    async def send():
+        service = CalculationService(max_workers=1)
+        server = await asyncio.start_server(service.handle, '127.0.0.1', 0)
+        try:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            writer.write(request)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+        finally:
+            server.close()
+            service.close()
+
+    return asyncio.run(send())
+
+
+@pytest.mark.parametrize('length', ['-5', 'abc', '1e3', '+5'])
+def test_invalid_content_length(length):
+    response = _exchange(f'POST /mortgage HTTP/1.1\r\nContent-Length: {length}\r\n\r\n{{}}'.encode())
+    head, _, body = response.partition(b'\r\n\r\n')
+    assert head.startswith(b'HTTP/1.1 400 Bad Request')
+    assert json.loads(body) == {'error': 'Invalid Content-Length'}
+
+
+def test_keep_alive_connection():
+    body = json.dumps({'principal': 100000, 'interest_rate': 5, 'length_of_mortgage': 25}).encode()
+    request = b'POST /mortgage HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s' % (len(body), body)
+    response = _exchange(request + request + b'GET /health HTTP/1.1\r\nConnection: close\r\n\r\n')
+    assert response.count(b'HTTP/1.1 200 OK') == 3
+    assert response.endswith(b'{"status": "ok"}')
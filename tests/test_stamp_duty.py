@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from benchmarks import reference
+from btl_model import STAMP_DUTY_TABLES, sdlt, stamp_duty, stamp_duty_additional
+
+BOUNDARY_PRICES = [0, 1, 10_000, 39_999.99, 40_000, 40_000.01, 125_000, 250_000, 250_000.01, 925_000, 1_500_000,
+                   2_000_000]
+
+
+def test_stamp_duty_matches_reference():
+    prices = np.array(BOUNDARY_PRICES)
+    np.testing.assert_allclose(stamp_duty(prices), [reference.stamp_duty(p) for p in prices], atol=1e-6)
+
+
+def test_stamp_duty_additional_matches_reference():
+    prices = np.array(BOUNDARY_PRICES)
+    np.testing.assert_allclose(
+        stamp_duty_additional(prices), [reference.stamp_duty_additional_minimum(p) for p in prices], atol=1e-6,
+    )
+
+
+@pytest.mark.parametrize('table', sorted(STAMP_DUTY_TABLES))
+def test_no_surcharge_below_additional_minimum(table):
+    minimum = STAMP_DUTY_TABLES[table].additional_minimum
+    below = np.array([1, 10_000, minimum - 0.01])
+    np.testing.assert_array_equal(sdlt(below, additional_property=True, table=table), sdlt(below, table=table))
+    surcharge = STAMP_DUTY_TABLES[table].additional_surcharge
+    assert sdlt(minimum, additional_property=True, table=table) == pytest.approx(
+        sdlt(minimum, table=table) + minimum * surcharge
+    )
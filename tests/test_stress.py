@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from benchmarks import reference
+from btl_model import PERSONAL, SWITCH_RULES, random_rate_paths
+from btl_model.stress import _stress_chunk
+
+PRINCIPAL = np.array([90_000.0, 250_000.0])
+INTEREST_RATE = np.array([5.0, 3.5])
+YEARS = 25
+RENT = np.array([800.0, 1_100.0])
+PERIOD = 24
+FIXED_MARGIN = np.array([1.0, 0.5])
+SVR_MARGIN = np.array([4.0, 3.5])
+ARRANGEMENT_FEE = np.array([1_000.0, 0.0])
+
+
+@pytest.mark.parametrize('switch_rule', SWITCH_RULES)
+def test_stress_chunk_matches_scalar_loop(switch_rule):
+    months = YEARS * 12
+    paths = random_rate_paths(4.0, months, paths=20, volatility=1.0, seed=1)
+    metrics, _ = _stress_chunk(
+        PRINCIPAL, INTEREST_RATE, np.full(2, months), RENT, paths, months, PERIOD, FIXED_MARGIN, SVR_MARGIN,
+        ARRANGEMENT_FEE, 1.0, True, switch_rule, 1.25, 5.5,
+        {'tax_treatment': np.full(2, PERSONAL), 'tax_rate': np.full(2, 0.2),
+         'management_charge_percent': np.zeros(2), 'fixed_costs': np.zeros(2)},
+        0, 0, [50],
+    )
+    for loan in range(2):
+        expected = [
+            reference.remortgage_path(
+                PRINCIPAL[loan], INTEREST_RATE[loan], YEARS, RENT[loan], path, PERIOD, FIXED_MARGIN[loan],
+                SVR_MARGIN[loan], ARRANGEMENT_FEE[loan], 1.0, switch_rule,
+            )
+            for path in paths
+        ]
+        for name in expected[0]:
+            np.testing.assert_allclose(
+                metrics[name][loan], [path[name] for path in expected], rtol=1e-9, atol=1e-6, err_msg=name,
+            )